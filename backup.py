@@ -0,0 +1,43 @@
+# backup.py
+"""
+Backup & restore data maintenance lewat COPY paralel (tanpa pg_dump).
+
+    python backup.py export backup/2024-full
+    python backup.py export backup/q1 --start 2024-01-01 --end 2024-03-31 --workers 6
+    python backup.py restore backup/2024-full
+    python backup.py restore backup/2024-full --start 2024-02-01 --end 2024-02-29 --append
+"""
+import argparse
+import json
+from database.db_manager import DBManager
+from services.maintenance_service import MaintenanceService
+from services.backup_service import BackupService
+from bot.bot_config import DB_CONFIG, BACKUP_WORKERS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backup/restore maintenance_records & fault_references")
+    parser.add_argument("action", choices=["export", "restore"])
+    parser.add_argument("directory", help="Folder backup (berisi manifest.json)")
+    parser.add_argument("--start", help="Tanggal awal YYYY-MM-DD (default: semua)")
+    parser.add_argument("--end", help="Tanggal akhir YYYY-MM-DD (default: semua)")
+    parser.add_argument("--workers", type=int, default=BACKUP_WORKERS, help="Jumlah COPY paralel")
+    parser.add_argument("--append", action="store_true",
+                        help="Restore tanpa menghapus data yang sudah ada di rentang tanggal")
+    args = parser.parse_args()
+
+    db_manager = DBManager(DB_CONFIG)
+    try:
+        backup_service = BackupService(MaintenanceService(db_manager), workers=args.workers)
+        if args.action == "export":
+            result = backup_service.export(args.directory, args.start, args.end)
+            result = {key: result[key] for key in ("start_date", "end_date", "total_rows", "seconds")}
+        else:
+            result = backup_service.restore(args.directory, args.start, args.end, replace=not args.append)
+        print(json.dumps(result, indent=2, default=str))
+    finally:
+        db_manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark render grafik: Matplotlib vs renderer cepat Pillow.
+
+Contoh:
+    python benchmark_graph.py
+    python benchmark_graph.py --iterations 50 --preset document --save output
+"""
+import argparse
+import os
+import statistics
+import time
+from services.graph_service import ChartSpec, GraphService, RENDER_PRESETS, RENDERERS
+
+
+def sample_spec(bars: int = 20) -> ChartSpec:
+    labels = [f"2024-{month:02d}-{day:02d}" for month in range(1, 13) for day in (10, 20, 28)][:bars]
+    values = [(i * 7) % 23 + (3 if i % 4 else 0) for i in range(bars)]
+    return ChartSpec(
+        crane_id=3, start_date="2024-01-01", end_date="2024-12-31", labels=labels, values=values,
+        total_faults=sum(values) * 5, average_per_day=sum(values) * 5 / 366,
+        most_common_fault="主起升变频器故障 Hoist inverter fault", most_common_count=max(values),
+    )
+
+
+def timed(function, iterations: int):
+    durations = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - started)
+    return result, durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark renderer grafik fault")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--preset", default="preview", choices=sorted(RENDER_PRESETS))
+    parser.add_argument("--bars", type=int, default=20)
+    parser.add_argument("--save", help="Folder untuk menyimpan hasil tiap renderer (perbandingan visual)")
+    args = parser.parse_args()
+
+    spec = sample_spec(args.bars)
+    dpi = RENDER_PRESETS[args.preset]["dpi"]
+    results = {}
+    for renderer in RENDERERS:
+        service = GraphService(None, renderer=renderer)
+        service.render_chart(spec, args.preset)  # pemanasan: cache font & template
+        image, durations = timed(lambda: service.render_chart(spec, args.preset), args.iterations)
+        results[renderer] = statistics.median(durations)
+        print(f"{renderer:<11} render+encode: median {statistics.median(durations) * 1000:7.1f} ms, "
+              f"min {min(durations) * 1000:7.1f} ms, {len(image) // 1024} KB")
+        if renderer == "pillow":
+            _, raw = timed(lambda: service._fast_renderer.render(spec, dpi), args.iterations)
+            print(f"{'':<11} hanya render : median {statistics.median(raw) * 1000:7.1f} ms")
+        if args.save:
+            os.makedirs(args.save, exist_ok=True)
+            path = os.path.join(args.save, f"benchmark_{renderer}_{args.preset}.{RENDER_PRESETS[args.preset]['format']}")
+            with open(path, "wb") as file:
+                file.write(image)
+            print(f"{'':<11} disimpan     : {path}")
+
+    print(f"Pillow {results['matplotlib'] / results['pillow']:.1f}x lebih cepat dari Matplotlib ({args.preset})")
+
+
+if __name__ == "__main__":
+    main()
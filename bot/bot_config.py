@@ -13,3 +13,57 @@ DB_CONFIG = {
 }
 
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+
+# Event yang lebih tua dari ini (hari) dipindah ke tabel arsip oleh /arsip jalankan
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 180))
+
+# Maintenance database (ANALYZE setelah bulk write, cek bloat berkala)
+DB_ANALYZE_DELAY_SECONDS = int(os.getenv("DB_ANALYZE_DELAY_SECONDS", 30))
+DB_BLOAT_CHECK_HOURS = int(os.getenv("DB_BLOAT_CHECK_HOURS", 6))
+
+# Batas waktu statement per kelas query (ms, 0 = tanpa batas)
+STATEMENT_TIMEOUTS = {
+    "menu": int(os.getenv("QUERY_TIMEOUT_MENU_MS", 3000)),
+    "interactive": int(os.getenv("QUERY_TIMEOUT_INTERACTIVE_MS", 20000)),
+    "export": int(os.getenv("QUERY_TIMEOUT_EXPORT_MS", 300000)),
+    "admin": int(os.getenv("QUERY_TIMEOUT_ADMIN_MS", 0)),
+}
+
+# Backup/restore COPY paralel (/backup, /restore, backup.py)
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backup")
+BACKUP_WORKERS = int(os.getenv("BACKUP_WORKERS", 4))
+
+# Jendela event terbaru yang disimpan di memori bot (hari, 0 = nonaktif)
+HOT_WINDOW_DAYS = int(os.getenv("HOT_WINDOW_DAYS", 0))
+
+# Folder cache file kolom per crane per bulan ('' = nonaktif)
+MONTH_CACHE_DIR = os.getenv("MONTH_CACHE_DIR", "cache/months")
+
+# Preset render grafik: preview (PNG HP), preview_jpeg, document (3600x2100 sebagai file)
+GRAPH_PRESET = os.getenv("GRAPH_PRESET", "preview")
+
+# Renderer grafik: matplotlib (default) atau pillow (jalur cepat, fallback ke Matplotlib jika gagal)
+GRAPH_RENDERER = os.getenv("GRAPH_RENDERER", "matplotlib")
+
+
+# Pool proses render grafik (0 worker = render di thread bot)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", 2))
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", 8))
+RENDER_TIMEOUT_SECONDS = float(os.getenv("RENDER_TIMEOUT_SECONDS", 30))
+RENDER_TASKS_PER_WORKER = int(os.getenv("RENDER_TASKS_PER_WORKER", 200))
+
+# Cache grafik yang sudah dirender + file_id Telegram ('' = nonaktif)
+CHART_CACHE_DIR = os.getenv("CHART_CACHE_DIR", "cache/charts")
+CHART_CACHE_MAX_MB = int(os.getenv("CHART_CACHE_MAX_MB", 200))
+
+# Permintaan grafik banyak grup: grafik per album (maks. 10) dan jumlah grup teratas yang dipertimbangkan
+GRAPH_PAGE_SIZE = min(10, int(os.getenv("GRAPH_PAGE_SIZE", 10)))
+GRAPH_MAX_GROUPS = int(os.getenv("GRAPH_MAX_GROUPS", 200))
+
+# Laporan grafik terjadwal untuk chat pelanggan (/langganan): jam kirim "HH:MM,HH:MM" ('' = tidak dikirim)
+REPORT_TIMES = [value.strip() for value in os.getenv("REPORT_TIMES", "07:00").split(",") if value.strip()]
+REPORT_UTC_OFFSET = float(os.getenv("REPORT_UTC_OFFSET", 7))
+# Jeda setelah upload data sebelum laporan yang dilanggan di-pre-render (detik)
+REPORT_PRERENDER_DELAY_SECONDS = int(os.getenv("REPORT_PRERENDER_DELAY_SECONDS", 120))
+# Pre-render harian sekian menit sebelum setiap jam kirim (periode 'hari ini' berganti saat tengah malam)
+REPORT_PRERENDER_LEAD_MINUTES = int(os.getenv("REPORT_PRERENDER_LEAD_MINUTES", 15))
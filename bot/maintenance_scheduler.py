@@ -0,0 +1,74 @@
+# bot/maintenance_scheduler.py
+import asyncio
+import logging
+from datetime import timedelta
+from telegram.ext import ContextTypes
+from bot.admin_auth import get_admin_ids
+from services.db_maintenance_service import DBMaintenanceService
+
+logger = logging.getLogger(__name__)
+
+
+class MaintenanceScheduler:
+    """
+    Menjadwalkan perawatan database di job queue bot:
+    - after_bulk_write() -> ANALYZE sekali setelah jeda singkat (beberapa upload/hapus
+      berturut-turut digabung menjadi satu ANALYZE)
+    - cek bloat berkala -> VACUUM / REINDEX CONCURRENTLY, hasilnya dikirim ke admin
+    """
+
+    ANALYZE_JOB = "db_analyze"
+    BLOAT_JOB = "db_bloat_check"
+
+    def __init__(self, application, db_maintenance: DBMaintenanceService,
+                 analyze_delay_seconds: int = 30, bloat_interval_hours: int = 6):
+        self.job_queue = application.job_queue
+        self.db_maintenance = db_maintenance
+        self.analyze_delay_seconds = analyze_delay_seconds
+        self._pending_tables = set()
+
+        if self.job_queue is None:
+            logger.warning("JobQueue tidak tersedia (install python-telegram-bot[job-queue]); maintenance database dinonaktifkan.")
+            return
+
+        self.job_queue.run_repeating(
+            self._bloat_job,
+            interval=timedelta(hours=bloat_interval_hours),
+            first=timedelta(minutes=10),
+            name=self.BLOAT_JOB,
+        )
+
+    def after_bulk_write(self, tables=("maintenance_records",)) -> None:
+        """Panggil setelah upload atau penghapusan besar"""
+        self._pending_tables.update(tables)
+        if self.job_queue is None:
+            return
+        if self.job_queue.get_jobs_by_name(self.ANALYZE_JOB):
+            return  # sudah terjadwal, tabel baru ikut di-ANALYZE di job yang sama
+        self.job_queue.run_once(self._analyze_job, when=self.analyze_delay_seconds, name=self.ANALYZE_JOB)
+
+    async def _analyze_job(self, context: ContextTypes.DEFAULT_TYPE):
+        tables, self._pending_tables = sorted(self._pending_tables), set()
+        try:
+            await asyncio.to_thread(self.db_maintenance.analyze, tables)
+        except Exception as e:
+            logger.error("ANALYZE gagal:", exc_info=True)
+            await self._report(context, f"❌ ANALYZE {', '.join(tables)} gagal: {e}")
+
+    async def _bloat_job(self, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            actions = await asyncio.to_thread(self.db_maintenance.check_and_repair)
+        except Exception as e:
+            logger.error("Cek bloat database gagal:", exc_info=True)
+            await self._report(context, f"❌ Cek bloat database gagal: {e}")
+            return
+        if actions:
+            await self._report(context, "🧹 MAINTENANCE DATABASE\n\n" + "\n".join(f"• {action}" for action in actions))
+
+    async def _report(self, context: ContextTypes.DEFAULT_TYPE, text: str):
+        # Teks polos: nama tabel/index mengandung underscore yang merusak Markdown
+        for admin_id in get_admin_ids():
+            try:
+                await context.bot.send_message(chat_id=admin_id, text=text)
+            except Exception as e:
+                logger.error(f"Gagal mengirim laporan maintenance ke admin {admin_id}: {e}")
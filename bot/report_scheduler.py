@@ -0,0 +1,221 @@
+# bot/report_scheduler.py
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes
+from services.graph_service import RENDER_PRESETS
+from services.subscription_service import REPORT_PERIODS, SubscriptionService, report_period
+
+logger = logging.getLogger(__name__)
+
+# Penanda "semua fault" di key cache grafik laporan per crane
+ALL_FAULTS = "*"
+
+
+class ReportScheduler:
+    """
+    Laporan grafik standar (lihat REPORT_PERIODS) per crane di job queue bot:
+
+    - after_ingest() -> pre-render semua laporan yang dilanggan setelah jeda
+      singkat (upload berturut-turut digabung), hasilnya masuk ChartCache
+      sehingga /grafik dan pengiriman pagi tidak merender lagi.
+    - `prerender_lead_minutes` sebelum setiap jam kirim -> pre-render dengan
+      periode hari kirim. Tanpa ini laporan yang periodenya bergeser saat
+      tanggal berganti (mis. 'kemarin') baru dirender ketika dikirim.
+    - setiap jam di `times` -> kirim ke semua chat pelanggan. Satu grafik
+      di-upload sekali; chat berikutnya menerima file_id yang sama.
+    """
+
+    PRERENDER_JOB = "report_prerender"
+    DAILY_PRERENDER_JOB = "report_daily_prerender"
+    DELIVER_JOB = "report_deliver"
+
+    def __init__(self, application, maintenance_service, subscriptions: SubscriptionService, chart_cache,
+                 build_spec: Callable[..., Awaitable], render: Callable[..., Awaitable], send: Callable[..., Awaitable],
+                 preset: str, times: List[str], utc_offset_hours: float = 7, prerender_delay_seconds: int = 120,
+                 prerender_lead_minutes: int = 15):
+        self.job_queue = application.job_queue
+        self.maintenance_service = maintenance_service
+        self.subscriptions = subscriptions
+        self.chart_cache = chart_cache
+        self.build_spec = build_spec
+        self.render = render
+        self.send = send
+        self.preset = preset
+        self.timezone = timezone(timedelta(hours=utc_offset_hours))
+        self.prerender_delay_seconds = prerender_delay_seconds
+        self.prerender_lead = timedelta(minutes=max(0, prerender_lead_minutes))
+
+        if self.job_queue is None:
+            logger.warning("JobQueue tidak tersedia (install python-telegram-bot[job-queue]); laporan terjadwal dinonaktifkan.")
+            return
+
+        for value in times:
+            hour, minute = (int(part) for part in value.split(":"))
+            self.job_queue.run_daily(
+                self._deliver_job,
+                time=time(hour, minute, tzinfo=self.timezone),
+                name=f"{self.DELIVER_JOB}_{hour:02d}{minute:02d}",
+            )
+            if self.prerender_lead:
+                prerender_at = (datetime.combine(date(2000, 1, 2), time(hour, minute)) - self.prerender_lead).time()
+                self.job_queue.run_daily(
+                    self._daily_prerender_job,
+                    time=prerender_at.replace(tzinfo=self.timezone),
+                    name=f"{self.DAILY_PRERENDER_JOB}_{hour:02d}{minute:02d}",
+                )
+
+    def today(self):
+        return datetime.now(self.timezone).date()
+
+    # ======================= TARGET =======================
+    def _targets(self) -> Dict[Tuple[str, int], List[int]]:
+        """{(laporan, crane): [chat_id]}; langganan 'all' diperluas ke semua crane"""
+        subscriptions = self.subscriptions.all_subscriptions()
+        all_cranes = None
+        targets = defaultdict(list)
+        for chat_id, report, crane_id in subscriptions:
+            if report not in REPORT_PERIODS:
+                continue
+            if crane_id is None:
+                if all_cranes is None:
+                    all_cranes = [row['crane_id'] for row in self.maintenance_service.get_all_crane_id()
+                                  if row['crane_id'] is not None]
+                cranes = all_cranes
+            else:
+                cranes = [crane_id]
+            for crane in cranes:
+                if chat_id not in targets[(report, crane)]:
+                    targets[(report, crane)].append(chat_id)
+        return targets
+
+    # ======================= RENDER =======================
+    async def _chart(self, crane_id: int, start_date: str, end_date: str):
+        """(cache_key, file_id, bytes) satu laporan crane: dari cache, atau dirender sekarang"""
+        cache_key = None
+        if self.chart_cache is not None:
+            cache_key = await self.maintenance_service.db_manager.run_async(
+                "menu", self.chart_cache.key_for, crane_id, ALL_FAULTS, start_date, end_date, self.preset
+            )
+            entry = self.chart_cache.get(cache_key)
+            if entry is not None:
+                if entry.file_id:
+                    return cache_key, entry.file_id, None
+                image = await asyncio.to_thread(self.chart_cache.read, entry)
+                if image is not None:
+                    return cache_key, None, image
+
+        spec = await self.build_spec(crane_id, start_date, end_date)
+        image = await self.render(spec, self.preset) if spec is not None else None
+        if image and cache_key is not None:
+            await asyncio.to_thread(
+                self.chart_cache.put, cache_key, image, crane_id, ALL_FAULTS, start_date, end_date,
+                self.preset, RENDER_PRESETS[self.preset]["format"]
+            )
+        return cache_key, None, image
+
+    async def prerender(self, day=None) -> dict:
+        """Pastikan semua laporan yang dilanggan (periode untuk `day`, default hari ini) sudah ada di cache"""
+        targets = await asyncio.to_thread(self._targets)
+        today = day or self.today()
+        cached = empty = 0
+        for report, crane_id in targets:
+            start_date, end_date = report_period(report, today)
+            _, file_id, image = await self._chart(crane_id, start_date, end_date)
+            if file_id or image:
+                cached += 1
+            else:
+                empty += 1
+        logger.info(f"Pre-render laporan: {len(targets)} grafik ({cached} siap, {empty} tanpa data)")
+        return {"charts": len(targets), "ready": cached, "empty": empty}
+
+    # ======================= KIRIM =======================
+    async def deliver(self, context) -> dict:
+        """Kirim semua laporan ke pelanggan: upload sekali per grafik, lalu file_id"""
+        targets = await asyncio.to_thread(self._targets)
+        today = self.today()
+        uploads = resends = failed = 0
+        for (report, crane_id), chat_ids in targets.items():
+            start_date, end_date = report_period(report, today)
+            try:
+                cache_key, file_id, image = await self._chart(crane_id, start_date, end_date)
+            except Exception as e:
+                logger.error(f"Laporan {report} crane {crane_id} gagal dibuat: {e}")
+                failed += len(chat_ids)
+                continue
+            if not file_id and not image:
+                continue  # tidak ada fault di periode ini
+
+            caption = f"📊 {REPORT_PERIODS[report][0]} • Crane {crane_id} ({start_date} s/d {end_date})"
+            name = f"laporan_{report}_{crane_id}_{end_date}"
+            for chat_id in chat_ids:
+                try:
+                    try:
+                        message = await self.send(context, chat_id, file_id or image, self.preset, name, caption=caption)
+                    except BadRequest as e:
+                        if not file_id:
+                            raise
+                        # file_id kedaluwarsa/ditolak: kirim bytes dari disk, chat berikutnya memakai file_id baru
+                        logger.warning(f"file_id laporan {report} crane {crane_id} ditolak Telegram ({e}), kirim ulang dari disk")
+                        await asyncio.to_thread(self.chart_cache.forget_file_id, cache_key)
+                        cache_key, file_id, image = await self._chart(crane_id, start_date, end_date)
+                        if not image:
+                            raise
+                        message = await self.send(context, chat_id, image, self.preset, name, caption=caption)
+                except Exception as e:
+                    logger.error(f"Gagal mengirim laporan {report} crane {crane_id} ke chat {chat_id}: {e}")
+                    failed += 1
+                    continue
+                if file_id:
+                    resends += 1
+                    continue
+                uploads += 1
+                file_id = self._file_id(message)
+                if file_id and cache_key is not None:
+                    await asyncio.to_thread(self.chart_cache.set_file_id, cache_key, file_id)
+                # Batas Telegram ~30 pesan/detik untuk seluruh bot
+                await asyncio.sleep(0.05)
+        logger.info(f"Laporan terkirim: {uploads} upload, {resends} kirim ulang file_id, {failed} gagal")
+        return {"uploads": uploads, "resends": resends, "failed": failed}
+
+    @staticmethod
+    def _file_id(message) -> Optional[str]:
+        if message is None:
+            return None
+        if message.photo:
+            return message.photo[-1].file_id
+        if message.document:
+            return message.document.file_id
+        return None
+
+    # ======================= JOB =======================
+    def after_ingest(self) -> None:
+        """Panggil setelah upload data; beberapa upload berturut-turut digabung jadi satu pre-render"""
+        if self.job_queue is None:
+            return
+        if self.job_queue.get_jobs_by_name(self.PRERENDER_JOB):
+            return
+        self.job_queue.run_once(self._prerender_job, when=self.prerender_delay_seconds, name=self.PRERENDER_JOB)
+
+    async def _prerender_job(self, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            await self.prerender()
+        except Exception:
+            logger.error("Pre-render laporan gagal:", exc_info=True)
+
+    async def _daily_prerender_job(self, context: ContextTypes.DEFAULT_TYPE):
+        # Hari kirim: pre-render 23:50 untuk kiriman 00:05 memakai periode hari berikutnya
+        day = (datetime.now(self.timezone) + self.prerender_lead).date()
+        try:
+            await self.prerender(day)
+        except Exception:
+            logger.error("Pre-render laporan sebelum jam kirim gagal:", exc_info=True)
+
+    async def _deliver_job(self, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            await self.deliver(context)
+        except Exception:
+            logger.error("Pengiriman laporan terjadwal gagal:", exc_info=True)
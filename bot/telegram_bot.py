@@ -1,6 +1,5 @@
 # bot/telegram_bot.py
 
-from collections import defaultdict
 import os
 import re
 import telegram
@@ -9,8 +8,9 @@ import json
 import math
 import uuid
 import calendar
-from datetime import date, datetime
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+import time
+from datetime import date, datetime, timedelta
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, InputMediaDocument
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -19,15 +19,31 @@ from telegram.ext import (
     CallbackQueryHandler,
     filters,
 )
-from telegram.error import TimedOut, RetryAfter
-from bot.bot_config import BOT_TOKEN, DB_CONFIG
+from telegram.error import TimedOut, RetryAfter, BadRequest
+from bot.bot_config import (
+    BOT_TOKEN, DB_CONFIG, ARCHIVE_AFTER_DAYS,
+    DB_ANALYZE_DELAY_SECONDS, DB_BLOAT_CHECK_HOURS, STATEMENT_TIMEOUTS,
+    BACKUP_DIR, BACKUP_WORKERS, HOT_WINDOW_DAYS, MONTH_CACHE_DIR, GRAPH_PRESET, GRAPH_RENDERER,
+    RENDER_WORKERS, RENDER_QUEUE_SIZE, RENDER_TIMEOUT_SECONDS, RENDER_TASKS_PER_WORKER,
+    CHART_CACHE_DIR, CHART_CACHE_MAX_MB, GRAPH_PAGE_SIZE, GRAPH_MAX_GROUPS,
+    REPORT_TIMES, REPORT_UTC_OFFSET, REPORT_PRERENDER_DELAY_SECONDS, REPORT_PRERENDER_LEAD_MINUTES,
+)
 from services.rar_parser_service import RarParserService
 from services.zip_parser_service import ZipParserService
 from services.maintenance_service import MaintenanceService
-from services.graph_service import GraphService
-from database.db_manager import DBManager
+from services.graph_service import GraphService, RENDER_PRESETS, choose_granularity
+from services.db_maintenance_service import DBMaintenanceService
+from services.backup_service import BackupService
+from services.render_pool import ChartRenderPool, RenderPoolBusy, RenderTimeout
+from services.chart_cache import ChartCache
+from services.chart_navigator import ChartNavigator, NAV_ACTIONS
+from services.subscription_service import REPORT_PERIODS, SubscriptionService
+from services.fleet_report_service import FleetReportService
+from database.db_manager import DBManager, QueryTooExpensive
 from database.models import MaintenanceRecord, FaultReference
 from bot.admin_auth import admin_only, is_admin
+from bot.maintenance_scheduler import MaintenanceScheduler
+from bot.report_scheduler import ReportScheduler
 import logging
 
 # Logging
@@ -45,11 +61,28 @@ logger = logging.getLogger(__name__)
 #  INITIALIZATION
 # ==============================
 print("Menginisialisasi services...")
-db_manager = DBManager(DB_CONFIG)
+db_manager = DBManager(DB_CONFIG, STATEMENT_TIMEOUTS)
 maintenance_service = MaintenanceService(db_manager)
 rar_parser_service = RarParserService(maintenance_service)
 zip_parser_service = ZipParserService(maintenance_service)
-graph_service = GraphService(maintenance_service)
+graph_service = GraphService(maintenance_service, renderer=GRAPH_RENDERER)
+db_maintenance_service = DBMaintenanceService(db_manager)
+backup_service = BackupService(maintenance_service, workers=BACKUP_WORKERS)
+subscription_service = SubscriptionService(db_manager)
+fleet_report_service = FleetReportService(maintenance_service, graph_service)
+chart_navigator = ChartNavigator(maintenance_service, graph_service)
+if MONTH_CACHE_DIR:
+    maintenance_service.enable_month_cache(MONTH_CACHE_DIR)
+render_pool = ChartRenderPool(
+    workers=RENDER_WORKERS,
+    max_pending=RENDER_QUEUE_SIZE,
+    timeout=RENDER_TIMEOUT_SECONDS,
+    tasks_per_worker=RENDER_TASKS_PER_WORKER,
+    renderer=GRAPH_RENDERER,
+) if RENDER_WORKERS > 0 else None
+chart_cache = ChartCache(
+    maintenance_service, CHART_CACHE_DIR, max_bytes=CHART_CACHE_MAX_MB * 1024 * 1024
+) if CHART_CACHE_DIR else None
 
 class TelegramBot:
     def __init__(self, token, maintenance_service):
@@ -63,7 +96,28 @@ class TelegramBot:
             .read_timeout(7) \
             .get_updates_read_timeout(42) \
             .build()
-        self._re_data = re.compile(r"^(all|\d+)\s+(\d{2}-\d{2}-\d{4})\s+(\d{2}-\d{2}-\d{4})\s+(all|\d+|.+)$")
+        # crane: all | 1 | 1,2,5   fault: all | keyword | keyword1,keyword2
+        self.maintenance_scheduler = MaintenanceScheduler(
+            self.application,
+            db_maintenance_service,
+            analyze_delay_seconds=DB_ANALYZE_DELAY_SECONDS,
+            bloat_interval_hours=DB_BLOAT_CHECK_HOURS,
+        )
+        self.report_scheduler = ReportScheduler(
+            self.application,
+            maintenance_service,
+            subscription_service,
+            chart_cache,
+            build_spec=self.build_crane_spec,
+            render=self.render_spec,
+            send=self.send_chart,
+            preset=GRAPH_PRESET,
+            times=REPORT_TIMES,
+            utc_offset_hours=REPORT_UTC_OFFSET,
+            prerender_delay_seconds=REPORT_PRERENDER_DELAY_SECONDS,
+            prerender_lead_minutes=REPORT_PRERENDER_LEAD_MINUTES,
+        )
+        self._re_data = re.compile(r"^(all|\d+(?:\s*,\s*\d+)*)\s+(\d{2}-\d{2}-\d{4})\s+(\d{2}-\d{2}-\d{4})\s+(all|.+)$")
         self.setup_handlers()
 
     # ==============================
@@ -77,11 +131,45 @@ class TelegramBot:
             CommandHandler("data", self.handle_data_command),
             CommandHandler("hapus", self.admin_delete),
             CommandHandler("id", self.get_user_id),
+            CommandHandler("arsip", self.admin_archive),
+            CommandHandler("backup", self.admin_backup),
+            CommandHandler("restore", self.admin_restore),
+            CommandHandler("langganan", self.handle_subscription),
+            CommandHandler("laporan", self.handle_fleet_report),
+            CommandHandler("heatmap", self.handle_heatmap),
             MessageHandler(filters.Document.ALL, self.handle_document),
             CallbackQueryHandler(self.update_callback_query)
         ]
         for handler in handlers:
             self.application.add_handler(handler)
+        self.application.add_error_handler(self.error_handler)
+
+    # ==============================
+    #  QUERY EXECUTION & ERRORS
+    # ==============================
+    async def run_query(self, query_class, func, *args, **kwargs):
+        """
+        Jalankan fungsi database di thread dengan statement timeout kelasnya
+        ('menu', 'interactive', 'export', 'admin'). Query dibatalkan di server
+        jika handler dibatalkan atau melewati batas waktu.
+        """
+        return await self.maintenance_service.db_manager.run_async(query_class, func, *args, **kwargs)
+
+    @staticmethod
+    def _query_too_expensive_text(error: QueryTooExpensive) -> str:
+        return (
+            f"⏱️ Query terlalu berat (batas {error.timeout_ms / 1000:.0f} detik) dan sudah dibatalkan.\n"
+            "Persempit rentang tanggal atau pilih crane/fault tertentu."
+        )
+
+    async def error_handler(self, update: object, context: ContextTypes.DEFAULT_TYPE):
+        error = context.error
+        if not isinstance(error, QueryTooExpensive):
+            logger.error("Error tidak tertangani:", exc_info=error)
+            return
+        logger.warning(f"Query dibatalkan: {error}")
+        if isinstance(update, Update) and update.effective_chat:
+            await context.bot.send_message(chat_id=update.effective_chat.id, text=self._query_too_expensive_text(error))
     
 
     # ==============================
@@ -136,6 +224,7 @@ class TelegramBot:
         if match:
             # Jika cocok, proses seperti biasa
             crane_input, start_date_str, end_date_str, fault_input = match.groups()
+            crane_input = re.sub(r"\s+", "", crane_input)
             try:
                 start_date_obj = datetime.strptime(start_date_str, "%d-%m-%Y")
                 end_date_obj = datetime.strptime(end_date_str, "%d-%m-%Y")
@@ -148,28 +237,16 @@ class TelegramBot:
                 await update.message.reply_text("❌ Format tanggal salah. Gunakan format DD-MM-YYYY")
                 return
             
-            # Logika handling berdasarkan input (all/spesifik)
-            if crane_input == "all" and fault_input == "all":
-                records = self.maintenance_service.get_all_records_by_date_range(start_date, end_date)
-                await self.handle_bulk_action(update, context, query_func, records, start_date, end_date, "all", "all")
-            elif crane_input == "all":
-                matches = self.maintenance_service.search_faults_by_keyword(fault_input)
-                if len(matches) == 1:
-                    records = self.maintenance_service.get_all_records_by_date_and_fault(start_date, end_date, matches[0].fault_id)
-                    await self.handle_bulk_action(update, context, query_func, records, start_date, end_date, "all", matches[0].fault_id)
-                else:
-                    await self.handle_fault_selection(update, context, query_func, "all", start_date, end_date, fault_input)
-            elif fault_input == "all":
-                records = self.maintenance_service.get_all_records_by_date_and_crane(start_date, end_date, crane_input)
-                await self.handle_bulk_action(update, context, query_func, records, start_date, end_date, crane_input, "all")
+            # Logika handling berdasarkan input (all/spesifik, boleh daftar dipisah koma)
+            if fault_input == "all":
+                fault_ids = "all"
             else:
-                matches = self.maintenance_service.search_faults_by_keyword(fault_input)
-                if len(matches) == 1:
-                    records = self.maintenance_service.get_records_by_date_and_id_crane_and_id_fault(
-                        start_date, end_date, crane_input, matches[0].fault_id)
-                    await self.handle_bulk_action(update, context, query_func, records, start_date, end_date, crane_input, matches[0].fault_id)
-                else:
-                    await self.handle_fault_selection(update, context, query_func, crane_input, start_date, end_date, fault_input)
+                fault_ids = await self.resolve_fault_list(update, context, query_func, crane_input, start_date, end_date, fault_input)
+                if fault_ids is None:
+                    return
+
+            query = self.maintenance_service.filter([(start_date, end_date)], crane_ids=crane_input, fault_ids=fault_ids)
+            await self.handle_bulk_action(update, context, query_func, query, start_date, end_date, crane_input, fault_ids)
             return
 
         # --- LOGIKA BARU: Alur Interaktif untuk Perintah Parsial ---
@@ -212,32 +289,55 @@ class TelegramBot:
             parse_mode=telegram.constants.ParseMode.MARKDOWN
         )
     
-    async def handle_bulk_action(self, update, context, action, records, start_date, end_date, crane_id, fault_id):
-        print(f"Handling bulk action: {action} for crane {crane_id}, fault {fault_id}, records count: {len(records)}")
-        # Batasi operasi bulk maksimal 500 record
-        if len(records) > 500000000:
-            await update.message.reply_text("⚠️ Operasi bulk terbatas untuk 500 record maksimal. Silakan persempit rentang waktu atau kriteria.")
-            return
-        
-        if not records:
-            await update.message.reply_text("❌ Tidak ada data ditemukan.")
-            return
-        
+    async def handle_bulk_action(self, update, context, action, query, start_date, end_date, crane_id, fault_id):
+        print(f"Handling bulk action: {action} for {query}")
+
         if action == "show_data":
-            await self.show_bulk_data(update, records)
+            await self.show_bulk_data(update, query)
         elif action == "show_graph":
-            await self.show_graph(update, context, records, start_date, end_date)
+            await self.show_graph(update, context, query, start_date, end_date)
         elif action == "delete_data":
-            await self.delete_bulk_confirmation(update, context, records, crane_id, start_date, end_date, fault_id)
+            await self.delete_bulk_confirmation(update, context, query, crane_id, start_date, end_date, fault_id)
+
+    async def resolve_fault_list(self, update, context, query_func, crane_id, start_date, end_date, fault_input):
+        """
+        Ubah input fault (satu keyword atau beberapa dipisah koma) menjadi
+        string id "3" / "3,7,9". Mengembalikan None jika user perlu memilih
+        fault dulu atau keyword tidak ditemukan (pesan sudah dikirim).
+        """
+        fault_index = self.maintenance_service.fault_index
+        # Nama fault bisa mengandung koma, jadi coba keyword utuh dulu
+        best = fault_index.best_match(fault_input)
+        if best is not None:
+            return str(best.fault_id)
+
+        keywords = [kw.strip() for kw in fault_input.split(",") if kw.strip()]
+        if len(keywords) <= 1:
+            await self.handle_fault_selection(update, context, query_func, crane_id, start_date, end_date, fault_input)
+            return None
+
+        fault_ids = []
+        for keyword in keywords:
+            best = fault_index.best_match(keyword)
+            if best is None:
+                matches = fault_index.search(keyword, fuzzy=False)
+                await update.message.reply_text(
+                    f"❌ Fault '{keyword}' {'tidak ditemukan' if not matches else f'cocok dengan {len(matches)} fault'}. "
+                    "Gunakan ID fault untuk daftar beberapa fault."
+                )
+                return None
+            fault_ids.append(str(best.fault_id))
+        return ",".join(fault_ids)
 
     async def handle_fault_selection(self, update, context, query_func, crane_id, start_date, end_date, fault_input):
-        matches = self.maintenance_service.search_faults_by_keyword(fault_input)
+        # Hasil berperingkat: cocok persis, prefix, substring, lalu mirip (salah ketik)
+        matches = self.maintenance_service.fault_index.search(fault_input, limit=10)
         if not matches:
             await update.message.reply_text(f"❌ Tidak ditemukan fault '{fault_input}'.")
             return
         
         keyboard = []
-        for fault in matches[:10]:
+        for fault in matches:
             cb_data = f"{query_func}|{crane_id}|{start_date}|{end_date}|{fault.fault_id}"
             keyboard.append([InlineKeyboardButton(f"{fault.code_fault}-{fault.fault_name}", callback_data=cb_data)])
         
@@ -247,15 +347,20 @@ class TelegramBot:
     # ==============================
     #  DATA DISPLAY METHODS
     # ==============================
-    async def show_bulk_data(self, update, records):
-        # Group by crane dan fault untuk summary
+    async def show_bulk_data(self, update, query):
+        # Group by crane dan fault untuk summary (dihitung di database)
         summary = {}
-        for r in records:
-            key = f"fc0{r.crane_id}|{r.fault_reference.fault_name}"
-            summary[key] = summary.get(key, 0) + 1
-        
+        for row in await self.run_query("interactive", query.group_counts, "crane_id", "fault_ref_name"):
+            key = f"fc0{row['crane_id']}|{row['fault_ref_name']}"
+            summary[key] = summary.get(key, 0) + row['jumlah']
+        total = sum(summary.values())
+
+        if not total:
+            await update.message.reply_text("❌ Tidak ada data ditemukan.")
+            return
+
         # Format compact
-        text = f"📊 **SUMMARY DATA ({len(records)} total)**\n\n"
+        text = f"📊 **SUMMARY DATA ({total} total)**\n\n"
         for key, count in sorted(summary.items())[:20]:
             crane, fault = key.split("|", 1)
             text += f"`{crane}` {fault[:30]}{'...' if len(fault)>30 else ''}: **{count}**\n"
@@ -264,9 +369,9 @@ class TelegramBot:
             text += f"\n...dan {len(summary)-20} fault lainnya"
         
         # Sample data (5 records)
-        text += f"\n\n📋 **SAMPLE DATA (5/{len(records)})**\n```json\n"
+        text += f"\n\n📋 **SAMPLE DATA (5/{total})**\n```json\n"
         sample = []
-        for r in records[:5]:
+        for r in await self.run_query("interactive", query.sample, 5):
             sample.append({
                 "tanggal": r.tanggal.isoformat(),
                 "crane": f"fc0{r.crane_id}",
@@ -277,31 +382,27 @@ class TelegramBot:
         
         await update.message.reply_text(text, parse_mode=telegram.constants.ParseMode.MARKDOWN)
 
-    async def show_data(self, update, records: list[MaintenanceRecord]):
+    async def show_data(self, update, query):
+        records = await self.run_query("interactive", query.sample, 20)
         if not records:
             text = "❌ Tidak ada data untuk fault pada periode tersebut."
             print("Data kosong:", text)
         else:
             def serialize_row(row):
                 serialized_data = {}
-                for attribute_name, attribute_value in row.__dict__.items():
-                    if attribute_name.startswith('_'):
-                        continue  # Skip internal SQLAlchemy attributes
+                for attribute_name, attribute_value in row.to_dict().items():
                     if isinstance(attribute_value, date):
                         serialized_data[attribute_name] = attribute_value.isoformat()
                     elif isinstance(attribute_value, FaultReference):
-                        serialized_data[attribute_name] = {
-                            'fault_id': attribute_value.fault_id,
-                            'fault_name': attribute_value.fault_name,
-                            'code_fault': attribute_value.code_fault
-                        }
+                        serialized_data[attribute_name] = attribute_value.to_dict()
                     else:
                         serialized_data[attribute_name] = attribute_value
                 return serialized_data
 
-            serialized = [serialize_row(row) for row in records[:20]]
+            serialized = [serialize_row(row) for row in records]
             json_data = json.dumps(serialized, indent=2, ensure_ascii=False)
-            text = f"📄 Ditemukan {len(records)} data:\n\n```json\n{json_data}\n```"
+            total = len(records) if len(records) < 20 else await self.run_query("interactive", query.count)
+            text = f"📄 Ditemukan {total} data:\n\n```json\n{json_data}\n```"
             
             if len(text) > 4000:
                 text = text[:3990] + "\n...lanjutnya data terpotong.```"
@@ -320,58 +421,431 @@ class TelegramBot:
     # ==============================
     #  GRAPH HANDLING
     # ==============================
-    async def show_graph(self, update_or_query, context, records, start_date, end_date):
-        logger.info(f"Starting graph generation for {len(records)} records")
-        grouped_records = defaultdict(list)
-        for record in records:
-            key = f"{record.crane_id}|{record.fault_name}"
-            grouped_records[key].append(record)
+    async def send_chart(self, context, chat_id, image: bytes, preset: str, name: str, caption: str = None,
+                         reply_markup=None):
+        """Kirim gambar grafik dari memori: foto untuk pratinjau, dokumen untuk resolusi penuh"""
+        options = RENDER_PRESETS[preset]
+        while True:
+            try:
+                if options["send_as"] == "document":
+                    return await context.bot.send_document(
+                        chat_id=chat_id, document=image, filename=f"{name}.{options['format']}", caption=caption,
+                        reply_markup=reply_markup,
+                    )
+                return await context.bot.send_photo(chat_id=chat_id, photo=image, caption=caption, reply_markup=reply_markup)
+            except RetryAfter as e:
+                wait = getattr(e, "retry_after", 5)
+                logger.warning(f"Flood control, retry after {wait}s")
+                await asyncio.sleep(wait)
 
-        logger.info(f"Grouped records into {len(grouped_records)} groups")
+    @staticmethod
+    def _sent_file_id(message):
+        """file_id Telegram dari pesan foto/dokumen yang baru dikirim"""
+        if message is None:
+            return None
+        if message.photo:
+            return message.photo[-1].file_id
+        if message.document:
+            return message.document.file_id
+        return None
 
-        for key, group in grouped_records.items():
-            logger.info(f"Processing graph for group: {key} with {len(group)} records")
+    async def send_cached_chart(self, context, chat_id, cache_key: str, preset: str, name: str,
+                                caption: str = None, reply_markup=None) -> bool:
+        """Kirim grafik dari cache: file_id jika ada (tanpa upload), selain itu bytes di disk"""
+        entry = chart_cache.get(cache_key)
+        if entry is None:
+            return False
+        if entry.file_id:
             try:
-                if isinstance(update_or_query, Update):
-                    chat_id = update_or_query.effective_chat.id
-                else:
-                    chat_id = update_or_query.message.chat_id
+                await self.send_chart(context, chat_id, entry.file_id, preset, name, caption, reply_markup)
+                return True
+            except BadRequest as e:
+                logger.warning(f"file_id cache grafik ditolak Telegram ({e}), kirim ulang dari disk")
+                await asyncio.to_thread(chart_cache.forget_file_id, cache_key)
+        image = await asyncio.to_thread(chart_cache.read, entry)
+        if image is None:
+            return False
+        message = await self.send_chart(context, chat_id, image, preset, name, caption, reply_markup)
+        await asyncio.to_thread(chart_cache.set_file_id, cache_key, self._sent_file_id(message))
+        return True
+
+    @staticmethod
+    def group_query(query, row):
+        """
+        Query record satu grup crane/fault. Jika nama fault mentah grup ini satu-satunya
+        nama untuk fault_id-nya (lihat show_graph), filter memakai fault_id sehingga hot
+        store & cache bulan (yang hanya menyimpan fault_id) bisa melayaninya.
+        """
+        if row.get('group_fault_id') is not None:
+            return query.narrow(crane_ids=[row['crane_id']], fault_ids=[row['group_fault_id']])
+        return query.narrow(crane_ids=[row['crane_id']], fault_name=row['fault_name'])
+
+    async def build_group_spec(self, query, row, start_date, end_date):
+        """
+        Isi grafik satu grup crane/fault. Rentang pendek: record diambil lalu
+        dihitung per hari (vektor, di thread). Rentang panjang: total per
+        minggu/bulan/kuartal langsung dari database (lihat choose_granularity).
+        """
+        key = f"{row['crane_id']}|{row['fault_name']}"
+        fault_name = row['fault_name'] or ""
+        group_query = self.group_query(query, row)
+        granularity = choose_granularity(start_date, end_date)
+        if granularity != "day":
+            return await self.run_query(
+                "interactive", graph_service.build_bucket_spec, group_query, start_date, end_date, granularity, fault_name
+            )
+        group = await self.run_query("interactive", group_query.batch)
+        if group is None or not len(group):
+            return None
+        return await asyncio.to_thread(graph_service.build_chart_spec, group, start_date, end_date, key, fault_name)
+
+    async def build_crane_spec(self, crane_id: int, start_date: str, end_date: str):
+        """Isi grafik laporan satu crane (semua fault, per hari), dipakai ReportScheduler"""
+        query = self.maintenance_service.query(start_date, end_date, crane_id)
+        batch = await self.run_query("interactive", query.batch)
+        if batch is None or not len(batch):
+            return None
+        return await asyncio.to_thread(graph_service.build_chart_spec, batch, start_date, end_date, str(crane_id))
+
+    async def render_spec(self, spec, preset: str = GRAPH_PRESET):
+        """Render di pool proses; tanpa pool, render langsung di thread seperti sebelumnya"""
+        if spec is None:
+            return None
+        if render_pool is None:
+            return await asyncio.to_thread(graph_service.render, spec, preset)
+        logger.info(f"Render {spec} di pool proses ({preset})")
+        return await render_pool.render(spec, preset)
+
+    async def render_specs(self, specs: list, preset: str = GRAPH_PRESET) -> list:
+        """
+        Render banyak grafik paralel (urutan hasil = urutan specs). Paling banyak
+        satu render per worker sekaligus, sisa antrean pool tetap untuk chat lain.
+        """
+        slots = asyncio.Semaphore(render_pool.workers if render_pool is not None else 1)
+
+        async def render(spec):
+            async with slots:
+                return await self.render_spec(spec, preset)
+
+        return await asyncio.gather(*(render(spec) for spec in specs))
+
+    async def _chart_for_group(self, query, row, start_date, end_date, cache_key, fetch_slots):
+        """
+        (cache_key, file_id, bytes) grafik satu grup: dari cache jika ada, selain itu
+        query + render. cache_key sudah dihitung pemanggil untuk satu halaman sekaligus.
+        """
+        if cache_key is not None:
+            entry = chart_cache.get(cache_key)
+            if entry is not None:
+                if entry.file_id:
+                    return cache_key, entry.file_id, None
+                image = await asyncio.to_thread(chart_cache.read, entry)
+                if image is not None:
+                    return cache_key, None, image
+
+        # Batasi query record yang berjalan bersamaan agar pool koneksi tidak habis
+        async with fetch_slots:
+            spec = await self.build_group_spec(query, row, start_date, end_date)
+        image = await self.render_spec(spec)
+        if image and cache_key is not None:
+            await asyncio.to_thread(
+                chart_cache.put, cache_key, image, row['crane_id'], row['fault_name'],
+                start_date, end_date, GRAPH_PRESET, RENDER_PRESETS[GRAPH_PRESET]["format"]
+            )
+        return cache_key, None, image
+
+    async def send_album(self, context, chat_id, items: list, preset: str):
+        """
+        Kirim hingga 10 grafik sebagai satu album (send_media_group).
+        items: [(cache_key, file_id, bytes, caption, name)]. file_id yang
+        ditolak Telegram dibuang dari cache lalu album dikirim ulang dari bytes.
+        """
+        options = RENDER_PRESETS[preset]
+        reloaded_from_disk = False
+        while True:
+            try:
+                if len(items) == 1:
+                    # Album minimal 2 media
+                    cache_key, file_id, image, caption, name = items[0]
+                    messages = [await self.send_chart(context, chat_id, file_id or image, preset, name, caption=caption)]
+                    break
+                media = []
+                for cache_key, file_id, image, caption, name in items:
+                    source = file_id or image
+                    if options["send_as"] == "document":
+                        media.append(InputMediaDocument(source, caption=caption, filename=f"{name}.{options['format']}"))
+                    else:
+                        media.append(InputMediaPhoto(source, caption=caption))
+                messages = await context.bot.send_media_group(chat_id=chat_id, media=media)
+                break
+            except RetryAfter as e:
+                wait = getattr(e, "retry_after", 5)
+                logger.warning(f"Flood control, retry after {wait}s")
+                await asyncio.sleep(wait)
+            except BadRequest as e:
+                if reloaded_from_disk or chart_cache is None or not any(item[1] for item in items):
+                    raise
+                logger.warning(f"file_id di album ditolak Telegram ({e}), kirim ulang dari disk")
+                reloaded_from_disk = True
+                reloaded = []
+                for cache_key, file_id, image, caption, name in items:
+                    if file_id:
+                        await asyncio.to_thread(chart_cache.forget_file_id, cache_key)
+                        entry = chart_cache.get(cache_key)
+                        image = await asyncio.to_thread(chart_cache.read, entry) if entry else None
+                        if image is None:
+                            continue
+                    reloaded.append((cache_key, None, image, caption, name))
+                items = reloaded
+                if not items:
+                    return []
+
+        if chart_cache is not None:
+            for (cache_key, file_id, image, caption, name), message in zip(items, messages):
+                if cache_key is not None and not file_id:
+                    await asyncio.to_thread(chart_cache.set_file_id, cache_key, self._sent_file_id(message))
+        return messages
+
+    async def send_graph_page(self, context, chat_id, query, groups, start_date, end_date, offset: int):
+        """
+        Render satu halaman grup (GRAPH_PAGE_SIZE grafik) secara paralel lalu
+        kirim sebagai album. Grup sisanya disimpan di chat_data dan ditawarkan
+        lewat tombol "berikutnya" (callback: graph_more|token|offset).
+        """
+        page = groups[offset:offset + GRAPH_PAGE_SIZE]
+        status_message = await context.bot.send_message(
+            chat_id=chat_id,
+            text=f"📊 Memproses grafik {offset + 1}-{offset + len(page)} dari {len(groups)} grup... Mohon tunggu."
+        )
+
+        # Key cache semua grafik halaman ini dari satu query versi data, bukan satu query per grup
+        cache_keys = [None] * len(page)
+        if chart_cache is not None:
+            cached = [index for index, row in enumerate(page) if row['crane_id'] is not None]
+            keys = await self.run_query(
+                "menu", chart_cache.keys_for,
+                [(page[index]['crane_id'], page[index]['fault_name'], start_date, end_date, GRAPH_PRESET) for index in cached],
+            )
+            for index, key in zip(cached, keys):
+                cache_keys[index] = key
+
+        fetch_slots = asyncio.Semaphore(3)
+        results = await asyncio.gather(
+            *(self._chart_for_group(query, row, start_date, end_date, cache_key, fetch_slots)
+              for row, cache_key in zip(page, cache_keys)),
+            return_exceptions=True,
+        )
+
+        items, failed = [], []
+        for row, result in zip(page, results):
+            key = f"{row['crane_id']}|{row['fault_name']}"
+            if isinstance(result, QueryTooExpensive):
+                raise result
+            if isinstance(result, Exception):
+                logger.error(f"Error saat membuat grafik untuk key {key}: {result}")
+                failed.append(key)
+                continue
+            cache_key, file_id, image = result
+            if not file_id and not image:
+                failed.append(key)
+                continue
+            caption = f"Crane {row['crane_id']} • {row['fault_name'] or '-'} ({row['jumlah']} event)"[:1024]
+            items.append((cache_key, file_id, image, caption, f"grafik_{row['crane_id']}_{start_date}_{end_date}"))
+
+        if items:
+            await self.send_album(context, chat_id, items, GRAPH_PRESET)
+        await context.bot.delete_message(chat_id=chat_id, message_id=status_message.message_id)
+        if failed:
+            await context.bot.send_message(chat_id=chat_id, text=f"⚠️ {len(failed)} grafik gagal dibuat: {', '.join(failed)}")
+
+        next_offset = offset + len(page)
+        remaining = len(groups) - next_offset
+        if remaining <= 0:
+            return
+        pages = context.chat_data.setdefault("graph_pages", {})
+        token = uuid.uuid4().hex[:8]
+        pages[token] = {"query": query, "groups": groups, "start_date": start_date, "end_date": end_date}
+        while len(pages) > 10:  # simpan hanya permintaan terbaru per chat
+            pages.pop(next(iter(pages)))
+        button = InlineKeyboardButton(
+            f"➡️ {min(GRAPH_PAGE_SIZE, remaining)} grafik berikutnya (sisa {remaining})",
+            callback_data=f"graph_more|{token}|{next_offset}",
+        )
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text=f"Ditampilkan {next_offset} dari {len(groups)} grup.",
+            reply_markup=InlineKeyboardMarkup([[button]]),
+        )
+
+    async def handle_graph_more(self, update, context, token: str, offset: int):
+        callback_query = update.callback_query
+        state = context.chat_data.get("graph_pages", {}).get(token)
+        if state is None:
+            await callback_query.edit_message_text("⌛ Halaman grafik sudah kedaluwarsa. Ulangi perintah /grafik.")
+            return
+        await callback_query.edit_message_reply_markup(reply_markup=None)
+        await self.send_graph_page(
+            context, update.effective_chat.id, state["query"], state["groups"],
+            state["start_date"], state["end_date"], offset
+        )
+
+    @staticmethod
+    def _chart_caption(crane_id, fault_name, start_date, end_date) -> str:
+        return f"Crane {crane_id} • {fault_name or '-'} • {start_date} s/d {end_date}"[:1024]
+
+    @staticmethod
+    def _chart_nav_keyboard(token: str) -> InlineKeyboardMarkup:
+        """Tombol di bawah grafik (callback: graph_nav|token|aksi)"""
+        return InlineKeyboardMarkup([
+            [InlineKeyboardButton("🔍 Zoom in", callback_data=f"graph_nav|{token}|in"),
+             InlineKeyboardButton("🔎 Zoom out", callback_data=f"graph_nav|{token}|out")],
+            [InlineKeyboardButton("◀️ Sebelumnya", callback_data=f"graph_nav|{token}|prev"),
+             InlineKeyboardButton("Berikutnya ▶️", callback_data=f"graph_nav|{token}|next")],
+        ])
+
+    async def handle_graph_nav(self, update, context, token: str, action: str):
+        """
+        Zoom/geser grafik: seri harian diambil dari ChartNavigator (hanya hari
+        yang belum dimuat yang di-query), lalu foto yang sama diganti lewat
+        edit_message_media, bukan pesan baru.
+        """
+        callback_query = update.callback_query
+        view = chart_navigator.get(token)
+        if view is None or action not in NAV_ACTIONS:
+            await callback_query.edit_message_reply_markup(reply_markup=None)
+            await context.bot.send_message(chat_id=update.effective_chat.id,
+                                           text="⌛ Navigasi grafik sudah kedaluwarsa. Ulangi perintah /grafik.")
+            return
+        start_date, end_date = chart_navigator.window(view.start_date, view.end_date, action)
+        if (start_date, end_date) == (view.start_date, view.end_date):
+            return  # sudah di batas zoom
+
+        options = RENDER_PRESETS[GRAPH_PRESET]
+        cache_key, media, image = None, None, None
+        if chart_cache is not None:
+            cache_key = await self.run_query(
+                "menu", chart_cache.key_for, view.crane_id, view.fault_name, start_date, end_date,
+                chart_navigator.cache_preset(GRAPH_PRESET),
+            )
+            entry = chart_cache.get(cache_key)
+            if entry is not None:
+                media = entry.file_id or await asyncio.to_thread(chart_cache.read, entry)
+        if media is None:
+            await self.run_query("interactive", chart_navigator.load, view, start_date, end_date)
+            spec = await asyncio.to_thread(chart_navigator.build_spec, view, start_date, end_date)
+            try:
+                image = await self.render_spec(spec)
+            except (RenderPoolBusy, RenderTimeout) as e:
+                logger.warning(f"Navigasi grafik {token} tidak dirender: {e}")
+                await context.bot.send_message(chat_id=update.effective_chat.id,
+                                               text="⏳ Server grafik sedang sibuk. Coba lagi sebentar lagi.")
+                return
+            if not image:
+                return
+            media = image
+            if cache_key is not None:
+                await asyncio.to_thread(
+                    chart_cache.put, cache_key, image, view.crane_id, view.fault_name,
+                    start_date, end_date, chart_navigator.cache_preset(GRAPH_PRESET), options["format"]
+                )
+
+        caption = self._chart_caption(view.crane_id, view.fault_name, start_date, end_date)
+        name = f"grafik_{view.crane_id}_{start_date}_{end_date}.{options['format']}"
+        while True:
+            if options["send_as"] == "document":
+                input_media = InputMediaDocument(media, caption=caption, filename=name)
+            else:
+                input_media = InputMediaPhoto(media, caption=caption)
+            try:
+                message = await callback_query.edit_message_media(
+                    media=input_media, reply_markup=self._chart_nav_keyboard(token)
+                )
+                break
+            except BadRequest as e:
+                if "not modified" in str(e).lower():
+                    message = None
+                    break
+                if not isinstance(media, str):
+                    raise
+                # file_id cache ditolak Telegram: ganti dengan bytes di disk sekali
+                logger.warning(f"file_id cache grafik ditolak Telegram ({e}), kirim ulang dari disk")
+                await asyncio.to_thread(chart_cache.forget_file_id, cache_key)
+                entry = chart_cache.get(cache_key)
+                media = image = await asyncio.to_thread(chart_cache.read, entry) if entry is not None else None
+                if media is None:
+                    raise
+        chart_navigator.commit(view, start_date, end_date)
+        if cache_key is not None and image is not None and isinstance(message, telegram.Message):
+            await asyncio.to_thread(chart_cache.set_file_id, cache_key, self._sent_file_id(message))
+
+    async def show_graph(self, update_or_query, context, query, start_date, end_date):
+        logger.info(f"Starting graph generation for {query}")
+        # Hanya hitung grup di database; record per grup diambil saat grafiknya dibuat
+        # Satu baris lebih dari batas hanya untuk tahu apakah ada grup yang tidak ditampilkan
+        rows = await self.run_query("interactive", query.chart_groups, limit=GRAPH_MAX_GROUPS + 1)
+        groups = rows[:GRAPH_MAX_GROUPS]
+        logger.info(f"Grouped records into {len(groups)} groups")
+
+        if isinstance(update_or_query, Update):
+            chat_id = update_or_query.effective_chat.id
+        else:
+            chat_id = update_or_query.message.chat_id
+
+        if not groups:
+            await context.bot.send_message(chat_id=chat_id, text="❌ Tidak ada data ditemukan.")
+            return
+
+        if len(groups) > 1:
+            # Banyak grup: album per halaman, grup terbanyak dulu, sisanya lewat tombol
+            if len(rows) > GRAPH_MAX_GROUPS:
+                await context.bot.send_message(
+                    chat_id=chat_id, text=f"ℹ️ Hanya {GRAPH_MAX_GROUPS} grup crane/fault terbanyak yang ditampilkan."
+                )
+            await self.send_graph_page(context, chat_id, query, groups, start_date, end_date, 0)
+            return
+
+        for row in groups:
+            key = f"{row['crane_id']}|{row['fault_name']}"
+            logger.info(f"Processing graph for group: {key} with {row['jumlah']} records")
+            name = f"grafik_{row['crane_id']}_{start_date}_{end_date}"
+            caption = self._chart_caption(row['crane_id'], row['fault_name'], start_date, end_date)
+            reply_markup = None
+            if row['crane_id'] is not None:
+                # Tombol zoom/geser: grafik berikutnya dibangun dari seri harian grup ini
+                token = chart_navigator.open(
+                    self.group_query(query, row), row['crane_id'], row['fault_name'], start_date, end_date,
+                )
+                reply_markup = self._chart_nav_keyboard(token)
+            try:
+                cache_key = None
+                if chart_cache is not None and row['crane_id'] is not None:
+                    cache_key = await self.run_query(
+                        "menu", chart_cache.key_for, row['crane_id'], row['fault_name'], start_date, end_date, GRAPH_PRESET
+                    )
+                    if await self.send_cached_chart(context, chat_id, cache_key, GRAPH_PRESET, name, caption, reply_markup):
+                        logger.info(f"Graph for key {key} sent from cache")
+                        await asyncio.sleep(1)
+                        continue
+
+                spec = await self.build_group_spec(query, row, start_date, end_date)
 
                 loading_message = await context.bot.send_message(chat_id=chat_id, text="📊 Sedang memproses grafik... Mohon tunggu.")
                 logger.info(f"Sent loading message for chat_id: {chat_id}")
 
-                logger.info(f"Calling graph_service.generate_graph for key: {key}")
-                file_path = await asyncio.to_thread(
-                    graph_service.generate_graph, 
-                    group, 
-                    start_date, 
-                    end_date,
-                    key
-                )
-                logger.info(f"Graph generation completed. File path: {file_path}")
-
-                if file_path and os.path.exists(file_path):
-                    logger.info(f"Graph file exists at: {file_path}")
-                    with open(file_path, "rb") as photo:
-                        sent = False
-                        while not sent:
-                            try:
-                                await context.bot.send_photo(chat_id=chat_id, photo=photo)
-                                sent = True
-                                logger.info(f"Successfully sent graph for key: {key}")
-                            except RetryAfter as e:
-                                wait = getattr(e, "retry_after", 5)
-                                logger.warning(f"Flood control, retry after {wait}s")
-                                await asyncio.sleep(wait)
-                    
+                image = await self.render_spec(spec)
+
+                if image:
+                    message = await self.send_chart(context, chat_id, image, GRAPH_PRESET, name, caption, reply_markup)
+                    if cache_key is not None:
+                        await asyncio.to_thread(
+                            chart_cache.put, cache_key, image, row['crane_id'], row['fault_name'],
+                            start_date, end_date, GRAPH_PRESET, RENDER_PRESETS[GRAPH_PRESET]["format"]
+                        )
+                        await asyncio.to_thread(chart_cache.set_file_id, cache_key, self._sent_file_id(message))
+                    logger.info(f"Successfully sent graph for key: {key} ({len(image) // 1024} KB)")
                     await context.bot.delete_message(chat_id=chat_id, message_id=loading_message.message_id)
-                    try:
-                        os.remove(file_path)
-                        logger.info(f"Cleaned up graph file: {file_path}")
-                    except Exception as e:
-                        logger.error(f"Failed to remove graph file: {e}")
                 else:
-                    logger.warning(f"Graph file not found or empty: {file_path}")
+                    logger.warning(f"Graph is empty for key: {key}")
                     await context.bot.edit_message_text(
                         chat_id=chat_id,
                         message_id=loading_message.message_id,
@@ -381,6 +855,11 @@ class TelegramBot:
                 # Tambahkan delay antar pengiriman gambar jika perlu
                 await asyncio.sleep(1)
 
+            except QueryTooExpensive:
+                raise
+            except (RenderPoolBusy, RenderTimeout) as e:
+                logger.warning(f"Grafik {key} tidak dirender: {e}")
+                await context.bot.send_message(chat_id=chat_id, text=f"⏳ Server grafik sedang sibuk ({e}). Coba lagi sebentar lagi.")
             except Exception as e:
                 logger.error(f"Error saat membuat grafik untuk key {key}:", exc_info=True)
                 try:
@@ -396,18 +875,29 @@ class TelegramBot:
         """Handler untuk /hapus yang sudah diproteksi"""
         await self.query_handler(update, context, "delete_data")
         
-    async def delete_bulk_confirmation(self, update, context, records, crane_id, start_date, end_date, fault_id):
-        count = len(records)
+    async def delete_bulk_confirmation(self, update, context, query, crane_id, start_date, end_date, fault_id):
+        count = await self.run_query("interactive", query.count)
+        if not count:
+            await update.message.reply_text("❌ Tidak ada data ditemukan.")
+            return
+        callback_data = f"bulk_delete|{crane_id}|{start_date}|{end_date}|{fault_id}"
+        if len(callback_data.encode()) > 64:
+            await update.message.reply_text("⚠️ Daftar crane/fault terlalu panjang untuk satu penghapusan. Silakan dibagi menjadi beberapa perintah.")
+            return
         start_display = datetime.strptime(start_date, "%Y-%m-%d").strftime("%d-%m-%Y")
         end_display = datetime.strptime(end_date, "%Y-%m-%d").strftime("%d-%m-%Y")
         
-        crane_text = "ALL CRANES" if crane_id == "all" else f"fc0{crane_id}"
-        fault_text = "ALL FAULTS" if fault_id == "all" else records[0].fault_reference.fault_name
+        crane_text = "ALL CRANES" if crane_id == "all" else ", ".join(f"fc0{c}" for c in query.crane_ids)
+        if fault_id == "all":
+            fault_text = "ALL FAULTS"
+        else:
+            fault_rows = await self.run_query("interactive", query.group_counts, "fault_ref_name", limit=5)
+            fault_text = ", ".join(row['fault_ref_name'] for row in fault_rows)
         
         text = f"⚠️ **BULK DELETE CONFIRMATION**\n\n🏗️{crane_text}\n📅{start_display}-{end_display}\n🔧{fault_text}\n📊**{count} RECORDS**\n\n❗**IRREVERSIBLE!**"
         
         keyboard = [[
-            InlineKeyboardButton("✅DELETE", callback_data=f"bulk_delete|{crane_id}|{start_date}|{end_date}|{fault_id}"),
+            InlineKeyboardButton("✅DELETE", callback_data=callback_data),
             InlineKeyboardButton("❌CANCEL", callback_data="cancel_delete")
         ]]
         
@@ -417,14 +907,10 @@ class TelegramBot:
         try:
             loading = await update.callback_query.edit_message_text("🗑️ Deleting...")
             
-            if crane_id == "all" and fault_id == "all":
-                deleted = self.maintenance_service.delete_all_records_by_date_range(start_date, end_date)
-            elif crane_id == "all":
-                deleted = self.maintenance_service.delete_all_records_by_date_and_fault(start_date, end_date, fault_id)
-            elif fault_id == "all":
-                deleted = self.maintenance_service.delete_all_records_by_crane_and_date_range(crane_id, start_date, end_date)
-            else:
-                deleted = self.maintenance_service.delete_records_by_date_and_id_crane_and_id_fault(start_date, end_date, crane_id, fault_id)
+            query = self.maintenance_service.query(start_date, end_date, crane_id, fault_id)
+            deleted = await self.run_query("admin", query.delete)
+            if deleted:
+                self.maintenance_scheduler.after_bulk_write(("maintenance_records", "maintenance_records_archive"))
             
             start_display = datetime.strptime(start_date, "%Y-%m-%d").strftime("%d-%m-%Y")
             end_display = datetime.strptime(end_date, "%Y-%m-%d").strftime("%d-%m-%Y")
@@ -443,11 +929,18 @@ class TelegramBot:
             # Kirim pesan loading
             loading_message = await update.callback_query.edit_message_text("🗑️ Sedang menghapus data... Mohon tunggu.")
             
-            # Dapatkan records yang akan dihapus untuk menghitung jumlahnya
-            records_to_delete = self.maintenance_service.get_records_by_date_and_id_crane_and_id_fault(
-                start_date, end_date, crane_id, fault_id
-            )
-            
+            # Ambil contoh record dan hapus dalam satu transaksi agar jumlahnya konsisten
+            query = self.maintenance_service.query(start_date, end_date, crane_id, fault_id)
+
+            def sample_and_delete():
+                with self.maintenance_service.db_manager.transaction() as tx:
+                    sample = query.sample(1, tx)
+                    return sample, (query.delete(tx) if sample else 0)
+
+            records_to_delete, deleted_count = await self.run_query("admin", sample_and_delete)
+            if deleted_count:
+                self.maintenance_scheduler.after_bulk_write(("maintenance_records", "maintenance_records_archive"))
+
             if not records_to_delete:
                 await context.bot.edit_message_text(
                     chat_id=chat_id,
@@ -456,13 +949,6 @@ class TelegramBot:
                 )
                 return
             
-            record_count = len(records_to_delete)
-            
-            # Lakukan penghapusan data
-            deleted_count = self.maintenance_service.delete_records_by_date_and_id_crane_and_id_fault(
-                start_date, end_date, crane_id, fault_id
-            )
-            
             # Format tanggal untuk tampilan
             start_display = datetime.strptime(start_date, "%Y-%m-%d").strftime("%d-%m-%Y")
             end_display = datetime.strptime(end_date, "%Y-%m-%d").strftime("%d-%m-%Y")
@@ -500,6 +986,304 @@ class TelegramBot:
             except:
                 await context.bot.send_message(chat_id=chat_id, text=f"❌ Terjadi kesalahan saat menghapus data: {e}")
 
+    # ==============================
+    #  ARCHIVE (ADMIN)
+    # ==============================
+    @staticmethod
+    def _format_bytes(size) -> str:
+        size = float(size or 0)
+        for unit in ("B", "KB", "MB", "GB"):
+            if size < 1024 or unit == "GB":
+                return f"{size:.1f} {unit}"
+            size /= 1024
+
+    @admin_only
+    async def admin_archive(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        /arsip                  -> laporan ukuran data hot & arsip
+        /arsip jalankan [hari]  -> pindahkan event lebih tua dari [hari] ke arsip
+        """
+        args = context.args or []
+        archive = self.maintenance_service.archive
+        text = ""
+
+        if args and args[0].lower() == "jalankan":
+            days = int(args[1]) if len(args) > 1 and args[1].isdigit() else ARCHIVE_AFTER_DAYS
+            await update.message.reply_text(f"🗄️ Mengarsip data lebih tua dari {days} hari... Mohon tunggu.")
+            result = await self.run_query("admin", archive.archive_older_than, days)
+            self.maintenance_scheduler.after_bulk_write(("maintenance_records", "maintenance_records_archive"))
+            text += (
+                f"✅ **ARSIP SELESAI**\n"
+                f"📅 Sebelum: {result['cutoff'].strftime('%d-%m-%Y')}\n"
+                f"📦 {result['events']} event → {result['groups']} baris arsip\n\n"
+            )
+
+        report = await self.run_query("admin", archive.storage_report)
+        first_month = report['first_month'].strftime('%m-%Y') if report['first_month'] else "-"
+        last_month = report['last_month'].strftime('%m-%Y') if report['last_month'] else "-"
+        text += (
+            f"📊 **STORAGE**\n"
+            f"🔥 Hot: {self._format_bytes(report['hot_bytes'])} (~{report['hot_rows']} event)\n"
+            f"🧊 Arsip: {self._format_bytes(report['cold_bytes'])} ({report['cold_rows']} event, {first_month} s/d {last_month})"
+        )
+        hot_store = self.maintenance_service.hot_store
+        if hot_store is not None:
+            hot = hot_store.memory_report()
+            text += (
+                f"\n⚡ Memori: {hot['days']} hari terakhir, {hot['rows']} event, "
+                f"{self._format_bytes(hot['bytes'])} ({hot['hits']} query dilayani)"
+            )
+        month_cache = self.maintenance_service.month_cache
+        if month_cache is not None:
+            disk = month_cache.disk_report()
+            text += (
+                f"\n🗂️ Cache bulan: {disk['files']} file, {self._format_bytes(disk['bytes'])} "
+                f"(hit {disk['hits']}, dibuat {disk['misses']})"
+            )
+        if chart_cache is not None:
+            charts = chart_cache.report()
+            text += (
+                f"\n🖼️ Cache grafik: {charts['entries']} grafik, {self._format_bytes(charts['bytes'])} "
+                f"(file_id {charts['file_id_hits']}, disk {charts['hits']}, render {charts['misses']})"
+            )
+        await update.message.reply_text(text, parse_mode=telegram.constants.ParseMode.MARKDOWN)
+
+    @staticmethod
+    def _parse_date_args(args):
+        """[dd-mm-yyyy dd-mm-yyyy] -> ('YYYY-MM-DD', 'YYYY-MM-DD') atau (None, None)"""
+        if len(args) < 2:
+            return None, None
+        start = datetime.strptime(args[0], "%d-%m-%Y").strftime("%Y-%m-%d")
+        end = datetime.strptime(args[1], "%d-%m-%Y").strftime("%Y-%m-%d")
+        return start, end
+
+    @admin_only
+    async def admin_backup(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        /backup                          -> backup semua data
+        /backup dd-mm-yyyy dd-mm-yyyy    -> backup rentang tanggal
+        """
+        try:
+            start_date, end_date = self._parse_date_args(context.args or [])
+        except ValueError:
+            await update.message.reply_text("❌ Format: /backup [dd-mm-yyyy dd-mm-yyyy]")
+            return
+
+        name = datetime.now().strftime("%Y%m%d_%H%M%S")
+        await update.message.reply_text(f"💾 Membuat backup `{name}`... Mohon tunggu.",
+                                        parse_mode=telegram.constants.ParseMode.MARKDOWN)
+        manifest = await self.run_query("admin", backup_service.export,
+                                        os.path.join(BACKUP_DIR, name), start_date, end_date)
+        total_bytes = manifest["fault_references"]["bytes"] + sum(part["bytes"] for part in manifest["records"])
+        await update.message.reply_text(
+            f"✅ **BACKUP SELESAI**\n"
+            f"📁 Nama: `{name}`\n"
+            f"📅 {len(manifest['records'])} bulan, {manifest['total_rows']} record\n"
+            f"📦 {self._format_bytes(total_bytes)} dalam {manifest['seconds']} detik\n\n"
+            f"Pulihkan dengan: `/restore {name}`",
+            parse_mode=telegram.constants.ParseMode.MARKDOWN
+        )
+
+    @admin_only
+    async def admin_restore(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        /restore                                -> daftar backup
+        /restore <nama> [dd-mm-yyyy dd-mm-yyyy] -> pulihkan (data di rentang itu diganti isi backup)
+        """
+        args = context.args or []
+        if not args:
+            backups = backup_service.list_backups(BACKUP_DIR)
+            text = "\n".join(f"• `{name}`" for name in backups[-20:]) or "Belum ada backup."
+            await update.message.reply_text(f"💾 **DAFTAR BACKUP**\n{text}\n\n"
+                                            "Format: /restore <nama> [dd-mm-yyyy dd-mm-yyyy]",
+                                            parse_mode=telegram.constants.ParseMode.MARKDOWN)
+            return
+
+        name = args[0]
+        if name not in backup_service.list_backups(BACKUP_DIR):
+            await update.message.reply_text(f"❌ Backup '{name}' tidak ditemukan.")
+            return
+        try:
+            start_date, end_date = self._parse_date_args(args[1:])
+        except ValueError:
+            await update.message.reply_text("❌ Format: /restore <nama> [dd-mm-yyyy dd-mm-yyyy]")
+            return
+
+        await update.message.reply_text(f"♻️ Memulihkan backup `{name}`... Mohon tunggu.",
+                                        parse_mode=telegram.constants.ParseMode.MARKDOWN)
+        result = await self.run_query("admin", backup_service.restore,
+                                      os.path.join(BACKUP_DIR, name), start_date, end_date)
+        self.maintenance_scheduler.after_bulk_write(("maintenance_records", "maintenance_records_archive", "fault_references"))
+        self.report_scheduler.after_ingest()
+        await update.message.reply_text(
+            f"✅ **RESTORE SELESAI**\n"
+            f"📅 {result['months']} bulan, {result['rows']} record\n"
+            f"🔧 {result['faults']} fault baru\n"
+            f"⏱️ {result['seconds']} detik",
+            parse_mode=telegram.constants.ParseMode.MARKDOWN
+        )
+
+    # ==============================
+    #  LAPORAN PDF ARMADA
+    # ==============================
+    @staticmethod
+    def _report_period_args(args):
+        """
+        [] -> bulan lalu, [mm-yyyy] -> bulan itu, [dd-mm-yyyy dd-mm-yyyy] -> rentang.
+        Kembalikan ('YYYY-MM-DD', 'YYYY-MM-DD'); ValueError jika format salah.
+        """
+        if len(args) >= 2:
+            start_date = datetime.strptime(args[0], "%d-%m-%Y").date()
+            end_date = datetime.strptime(args[1], "%d-%m-%Y").date()
+            if end_date < start_date:
+                raise ValueError("tanggal akhir sebelum tanggal mulai")
+        else:
+            if args:
+                start_date = datetime.strptime(args[0], "%m-%Y").date()
+            else:
+                first_of_month = date.today().replace(day=1)
+                start_date = (first_of_month - timedelta(days=1)).replace(day=1)
+            end_date = start_date.replace(day=calendar.monthrange(start_date.year, start_date.month)[1])
+        return start_date.isoformat(), end_date.isoformat()
+
+    async def handle_fleet_report(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        /laporan                          -> PDF armada bulan lalu
+        /laporan mm-yyyy                  -> PDF armada bulan itu
+        /laporan dd-mm-yyyy dd-mm-yyyy    -> PDF armada rentang tanggal
+        """
+        try:
+            start_date, end_date = self._report_period_args(context.args or [])
+        except ValueError:
+            await update.message.reply_text("❌ Format: /laporan [mm-yyyy] atau /laporan dd-mm-yyyy dd-mm-yyyy")
+            return
+
+        chat_id = update.effective_chat.id
+        started = time.perf_counter()
+        status = await update.message.reply_text(f"📑 Menyusun laporan armada {start_date} s/d {end_date}... Mohon tunggu.")
+        report = await self.run_query("export", fleet_report_service.collect, start_date, end_date)
+        if report is None:
+            await status.edit_text("❌ Tidak ada data fault pada periode ini.")
+            return
+
+        try:
+            charts = await self.render_specs(report.specs, "report")
+        except (RenderPoolBusy, RenderTimeout) as e:
+            logger.warning(f"Laporan armada gagal dirender: {e}")
+            await status.edit_text("⏳ Server grafik sedang sibuk. Coba lagi beberapa saat lagi.")
+            return
+        pdf = await asyncio.to_thread(fleet_report_service.build_pdf, report, charts, "report")
+
+        caption = (f"📑 Laporan armada {start_date} s/d {end_date}\n"
+                   f"🏗️ {len(report.rows)} crane • {report.total_faults} fault • "
+                   f"{time.perf_counter() - started:.1f} detik")
+        while True:
+            try:
+                await context.bot.send_document(
+                    chat_id=chat_id, document=pdf, filename=f"laporan_armada_{start_date}_{end_date}.pdf", caption=caption
+                )
+                break
+            except RetryAfter as e:
+                wait = getattr(e, "retry_after", 5)
+                logger.warning(f"Flood control, retry after {wait}s")
+                await asyncio.sleep(wait)
+        await status.delete()
+
+    async def handle_heatmap(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        /heatmap [hari|fault] [dd-mm-yyyy dd-mm-yyyy]
+        Heatmap seluruh armada (crane x hari atau crane x fault), default 30 hari terakhir.
+        """
+        args = list(context.args or [])
+        mode = "day"
+        if args and args[0].lower() in ("hari", "fault"):
+            mode = "fault" if args.pop(0).lower() == "fault" else "day"
+        try:
+            start_date, end_date = self._parse_date_args(args)
+        except ValueError:
+            start_date = None
+        if start_date is None:
+            if args:
+                await update.message.reply_text("❌ Format: /heatmap [hari|fault] [dd-mm-yyyy dd-mm-yyyy]")
+                return
+            today = date.today()
+            start_date, end_date = (today - timedelta(days=29)).isoformat(), today.isoformat()
+
+        chat_id = update.effective_chat.id
+        spec = await self.run_query("interactive", fleet_report_service.heatmap, start_date, end_date, mode)
+        if spec is None:
+            await update.message.reply_text("❌ Tidak ada data fault pada periode ini.")
+            return
+        try:
+            image = await self.render_spec(spec)
+        except (RenderPoolBusy, RenderTimeout) as e:
+            logger.warning(f"Heatmap gagal dirender: {e}")
+            await update.message.reply_text("⏳ Server grafik sedang sibuk. Coba lagi beberapa saat lagi.")
+            return
+        if not image:
+            await update.message.reply_text("❌ Gagal membuat heatmap.")
+            return
+        await self.send_chart(context, chat_id, image, GRAPH_PRESET, f"heatmap_{mode}_{start_date}_{end_date}",
+                              caption=f"🗺️ {len(spec.cranes)} crane • {spec.total_faults} fault • {start_date} s/d {end_date}")
+
+    # ==============================
+    #  LANGGANAN LAPORAN
+    # ==============================
+    async def handle_subscription(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        /langganan                               -> daftar langganan chat ini
+        /langganan <laporan> <crane|all>         -> berlangganan laporan grafik
+        /langganan stop [laporan] [crane|all]    -> berhenti berlangganan
+        """
+        args = [arg.lower() for arg in (context.args or [])]
+        chat_id = update.effective_chat.id
+        reports = ", ".join(f"`{name}` ({title})" for name, (title, _) in REPORT_PERIODS.items())
+        usage = (
+            f"Laporan: {reports}\n"
+            f"Dikirim setiap hari pukul {', '.join(REPORT_TIMES) or '-'}\n\n"
+            "Format: `/langganan <laporan> <crane|all>`\n"
+            "Berhenti: `/langganan stop [laporan] [crane|all]`"
+        )
+
+        if not args:
+            rows = await self.run_query("menu", subscription_service.list_for_chat, chat_id)
+            lines = "\n".join(
+                f"• {REPORT_PERIODS[report][0] if report in REPORT_PERIODS else report} — "
+                f"{'semua crane' if crane_id is None else f'crane {crane_id}'}"
+                for report, crane_id in rows
+            ) or "Belum ada langganan."
+            await update.message.reply_text(f"📬 **LANGGANAN LAPORAN**\n{lines}\n\n{usage}",
+                                            parse_mode=telegram.constants.ParseMode.MARKDOWN)
+            return
+
+        stop = args[0] == "stop"
+        if stop:
+            args = args[1:]
+        report = args[0] if args else None
+        crane_arg = args[1] if len(args) > 1 else None
+        if (report is not None and report not in REPORT_PERIODS) or \
+                (crane_arg is not None and crane_arg != "all" and not crane_arg.isdigit()) or \
+                (not stop and crane_arg is None):
+            await update.message.reply_text(f"❌ Format salah.\n\n{usage}",
+                                            parse_mode=telegram.constants.ParseMode.MARKDOWN)
+            return
+        crane_id = int(crane_arg) if crane_arg and crane_arg.isdigit() else None
+        target = "semua crane" if crane_id is None else f"crane {crane_id}"
+
+        if stop:
+            removed = await self.run_query("menu", subscription_service.unsubscribe, chat_id, report,
+                                           crane_id, crane_arg == "all")
+            await update.message.reply_text(f"🔕 {removed} langganan dihapus.")
+            return
+
+        created = await self.run_query("menu", subscription_service.subscribe, chat_id, report, crane_id)
+        title = REPORT_PERIODS[report][0]
+        if created:
+            self.report_scheduler.after_ingest()
+            await update.message.reply_text(f"✅ Berlangganan laporan '{title}' untuk {target}.")
+        else:
+            await update.message.reply_text(f"ℹ️ Chat ini sudah berlangganan laporan '{title}' untuk {target}.")
+
     # ==============================
     #  CALLBACK HANDLING
     # ==============================
@@ -535,9 +1319,20 @@ class TelegramBot:
             elif query_data == "cancel_delete":
                 await callback_query.edit_message_text("❌ Cancelled.")
                 return
+            elif query_data.startswith("graph_more|"):
+                _, token, offset = query_data.split("|")
+                await self.handle_graph_more(update, context, token, int(offset))
+                return
+            elif query_data.startswith("graph_nav|"):
+                _, token, action = query_data.split("|")
+                await self.handle_graph_nav(update, context, token, action)
+                return
             
             await callback_query.edit_message_reply_markup(reply_markup=None)
             await self.handle_buttons(update, context, query_data)
+        except QueryTooExpensive as e:
+            logger.warning(f"Query dibatalkan: {e}")
+            await context.bot.send_message(chat_id=update.effective_chat.id, text=self._query_too_expensive_text(e))
         except Exception as e:
             logger.error("Error pada callback query:", exc_info=True)
             await context.bot.send_message(
@@ -555,26 +1350,14 @@ class TelegramBot:
                 page = int(parts[4].split("=")[1])
                 return await self.fault_button_handler(update, context, "|".join(parts[:4]), page)
 
-            # Pilih fungsi servis yang sesuai berdasarkan crane_id
-            if str(crane_id).lower() == 'all':
-                # Jika 'all', panggil fungsi yang mengambil data untuk fault spesifik di semua crane
-                records = self.maintenance_service.get_all_records_by_date_and_fault(
-                    start_date, end_date, fault
-                )
-            else:
-                # Jika crane_id spesifik, gunakan fungsi yang sudah ada
-                records = self.maintenance_service.get_records_by_date_and_id_crane_and_id_fault(
-                    start_date, end_date, crane_id, fault
-                )
-            # Periksa jika records kosong
-            if not records:
-                return await update.callback_query.edit_message_text("❌ Tidak ada data ditemukan untuk fault tersebut.")
+            # Query lazy: crane 'all' atau spesifik ditangani oleh filter yang sama
+            query = self.maintenance_service.query(start_date, end_date, crane_id, fault)
 
             # Memproses aksi
             if action == "show_data":
-                await self.show_data(update, records)
+                await self.show_data(update.callback_query, query)
             elif action == "show_graph":
-                await self.show_graph(update, context, records, start_date, end_date)
+                await self.show_graph(update, context, query, start_date, end_date)
             elif action == "delete_data":
                 return
             else:
@@ -627,11 +1410,17 @@ class TelegramBot:
                 
                 "2. *Melihat Data Maintenance* - Gunakan perintah:\n"
                 "   `/data <crane_id> <start_date> <end_date> <fault_keyword>`\n"
-                "   Contoh: `/data 1 01-03-2024 31-03-2024 175`\n\n"
+                "   Contoh: `/data 1 01-03-2024 31-03-2024 175`\n"
+                "   Beberapa crane/fault: `/data 1,2,5 01-03-2024 31-03-2024 175,176`\n\n"
                 
                 "3. *Melihat Grafik* - Gunakan perintah:\n"
                 "   `/grafik <crane_id> <start_date> <end_date> <fault_keyword>`\n"
-                "   Contoh: `/grafik 2 01-01-2024 31-01-2024 Brake`\n\n"
+                "   Contoh: `/grafik 2 01-01-2024 31-01-2024 Brake`\n"
+                "   Beberapa crane/fault: `/grafik 1,2 01-01-2024 31-01-2024 all`\n"
+                "   Grafik satu crane/fault punya tombol Zoom in/out dan Sebelumnya/Berikutnya\n"
+                "   Laporan grafik otomatis tiap hari: `/langganan 7hari all`\n"
+                "   Laporan PDF semua crane: `/laporan 03-2024`\n"
+                "   Heatmap armada: `/heatmap fault 01-03-2024 31-03-2024`\n\n"
                 
                 "4. *Menghapus Data* - Gunakan perintah:\n"
                 "   `/hapus <crane_id> <start_date> <end_date> <fault_keyword>`\n"
@@ -664,7 +1453,7 @@ class TelegramBot:
     #  BUTTON HANDLERS
     # ==============================
     async def crane_button_handler(self, update, context, action):
-        rows = self.maintenance_service.get_all_crane_id()
+        rows = await self.run_query("menu", self.maintenance_service.get_all_crane_id)
         cranes = sorted({r['crane_id'] for r in rows})
         keyboard = [
             [InlineKeyboardButton(f"fc0{c}", callback_data=f"{action}|{c}")]
@@ -682,7 +1471,7 @@ class TelegramBot:
             )
 
     async def year_button_handler(self, update, context, crane_id, parts):
-        rows = self.maintenance_service.get_all_year(crane_id)
+        rows = await self.run_query("menu", self.maintenance_service.get_all_year, crane_id)
         opts = sorted({f"{r['tahun']}" for r in rows })
         keyboard = [
         [InlineKeyboardButton(opt, callback_data=f"{parts}|{opt}")]
@@ -743,7 +1532,7 @@ class TelegramBot:
         page = int(page)
         _, crane_id, start_date, end_date = parts.split("|")
         print(parts)
-        faults = self.maintenance_service.get_all_faults(crane_id, start_date, end_date)
+        faults = await self.run_query("menu", self.maintenance_service.get_all_faults, crane_id, start_date, end_date)
 
         total_pages = math.ceil(len(faults) / per_page)
         start_index = (page - 1) * per_page
@@ -827,13 +1616,18 @@ class TelegramBot:
 
             # Gunakan thread untuk operasi blocking
             if mime == "application/zip":
-                await asyncio.to_thread(self.zip_parser_service.parse_zip, file_path)
+                await self.run_query("admin", self.zip_parser_service.parse_zip, file_path)
+                self.maintenance_scheduler.after_bulk_write()
+                self.report_scheduler.after_ingest()
                 await update.message.reply_text("Data dari file ZIP berhasil diproses dan disimpan ke database.")
             elif mime in ("application/x-rar-compressed", "application/vnd.rar"):
-                await asyncio.to_thread(self.rar_parser_service.parse_rar, file_path)
+                await self.run_query("admin", self.rar_parser_service.parse_rar, file_path)
+                self.maintenance_scheduler.after_bulk_write()
+                self.report_scheduler.after_ingest()
                 await update.message.reply_text("Data dari file RAR berhasil diproses dan disimpan ke database.")
             elif mime == "text/csv":
-                await asyncio.to_thread(self.maintenance_service.add_fault, file_path)
+                await self.run_query("admin", self.maintenance_service.add_fault, file_path)
+                self.maintenance_scheduler.after_bulk_write(("fault_references",))
                 await update.message.reply_text("Data dari EventLib berhasil diproses dan disimpan ke database.")
             else:
                 await update.message.reply_text("Mohon kirimkan file dalam format ZIP, RAR, atau CSV.")
@@ -852,8 +1646,22 @@ class TelegramBot:
     #  BOT EXECUTION
     # ==============================
     def run(self):
+        # Worker render di-fork sebelum thread listener/hot store berjalan
+        if render_pool is not None:
+            render_pool.start()
+        # Dengarkan perubahan data dari proses lain (upload/hapus/arsip lewat skrip)
+        self.maintenance_service.changes.start()
+        self.maintenance_service.fault_index.load()
+        if HOT_WINDOW_DAYS and self.maintenance_service.hot_store is None:
+            print(f"Memuat hot store {HOT_WINDOW_DAYS} hari...")
+            self.maintenance_service.enable_hot_store(HOT_WINDOW_DAYS)
         print("Menjalankan polling...")
-        self.application.run_polling()
+        try:
+            self.application.run_polling()
+        finally:
+            self.maintenance_service.changes.stop()
+            if render_pool is not None:
+                render_pool.stop()
 
 
 if __name__ == "__main__":
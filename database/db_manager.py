@@ -1,18 +1,97 @@
 #db_manager.py
 import psycopg2
+import psycopg2.errors
 from psycopg2 import pool
-from typing import Any, List, Tuple
+from psycopg2 import extras
+import asyncio
+import contextvars
+import threading
+import uuid
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 from psycopg2.extras import RealDictCursor
 
+# Batas waktu statement (ms) per kelas query. 0 = tanpa batas.
+DEFAULT_STATEMENT_TIMEOUTS = {
+    "menu": 3000,          # tombol pilihan crane/tahun/fault
+    "interactive": 20000,  # /data, /grafik, konfirmasi hapus
+    "export": 300000,      # backup, laporan besar
+    "admin": 0,            # arsip, maintenance
+}
+
+# QueryScope aktif untuk thread/task saat ini (ikut tersalin oleh asyncio.to_thread)
+_current_scope: contextvars.ContextVar[Optional["QueryScope"]] = contextvars.ContextVar("query_scope", default=None)
+
+
+class QueryTooExpensive(Exception):
+    """Query dibatalkan karena melewati batas waktu kelasnya"""
+
+    def __init__(self, query_class: str, timeout_ms: int):
+        self.query_class = query_class
+        self.timeout_ms = timeout_ms
+        super().__init__(f"Query '{query_class}' melebihi batas {timeout_ms} ms")
+
+
+class QueryScope:
+    """
+    Satu permintaan user: semua koneksi yang dipakai di dalam scope memakai
+    statement_timeout kelasnya, dan bisa dibatalkan di server lewat cancel().
+    """
+
+    def __init__(self, query_class: str, timeout_ms: int):
+        self.query_class = query_class
+        self.timeout_ms = timeout_ms
+        self._connections = set()
+        self._lock = threading.Lock()
+        self.cancelled = False
+
+    def attach(self, conn) -> None:
+        with self._lock:
+            self._connections.add(conn)
+
+    def detach(self, conn) -> None:
+        with self._lock:
+            self._connections.discard(conn)
+
+    def cancel(self) -> None:
+        """Kirim cancel request ke server untuk semua query yang sedang berjalan"""
+        self.cancelled = True
+        with self._lock:
+            connections = list(self._connections)
+        for conn in connections:
+            try:
+                conn.cancel()
+            except Exception as e:
+                print(f"Gagal membatalkan query: {e}")
+
+    def run(self, func: Callable, *args, **kwargs):
+        token = _current_scope.set(self)
+        try:
+            return func(*args, **kwargs)
+        except psycopg2.errors.QueryCanceled as e:
+            raise QueryTooExpensive(self.query_class, self.timeout_ms) from e
+        finally:
+            _current_scope.reset(token)
+
+
 class DBManager:
-    def __init__(self, db_config: dict):
+    def __init__(self, db_config: dict, statement_timeouts: Optional[Dict[str, int]] = None,
+                 max_connections: int = 10):
         self.db_config = db_config
-        self.pool: pool.SimpleConnectionPool = None
+        self.max_connections = max_connections
+        self.statement_timeouts = {**DEFAULT_STATEMENT_TIMEOUTS, **(statement_timeouts or {})}
+        self.pool: pool.ThreadedConnectionPool = None
+        # statement_timeout yang sedang aktif per koneksi (None = default server).
+        # Weak key: entri ikut hilang saat koneksi ditutup pool, dan koneksi baru
+        # tidak mewarisi nilai koneksi lama yang kebetulan memakai id() yang sama.
+        self._conn_timeouts: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
         self.initialize_pool()
     
     def initialize_pool(self) -> None:
         try:
-            self.pool = psycopg2.pool.SimpleConnectionPool(1, 10, **self.db_config)
+            # Threaded: query dijalankan dari beberapa thread (asyncio.to_thread)
+            self.pool = psycopg2.pool.ThreadedConnectionPool(1, self.max_connections, **self.db_config)
             if not self.pool:
                 print("Gagal membuat connection pool")
                 self.pool = None
@@ -26,10 +105,64 @@ class DBManager:
             self.initialize_pool()
             if self.pool is None:
                 raise Exception("Database connection pool is not available. Pastikan database sudah berjalan.")
-        return self.pool.getconn()
+        scope = _current_scope.get()
+        if scope is not None and scope.cancelled:
+            raise QueryTooExpensive(scope.query_class, scope.timeout_ms)
+        conn = self.pool.getconn()
+        try:
+            self._apply_timeout(conn, scope.timeout_ms if scope else None)
+        except Exception:
+            self.pool.putconn(conn)
+            raise
+        if scope is not None:
+            scope.attach(conn)
+        return conn
     
     def put_conn(self, conn) -> None:
+        scope = _current_scope.get()
+        if scope is not None:
+            scope.detach(conn)
         self.pool.putconn(conn)
+
+    def _apply_timeout(self, conn, timeout_ms: Optional[int]) -> None:
+        """Set statement_timeout di level sesi, hanya jika berbeda dari yang terakhir di-set"""
+        if self._conn_timeouts.get(conn) == timeout_ms:
+            return
+        autocommit = conn.autocommit
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                if timeout_ms is None:
+                    cursor.execute("SET statement_timeout TO DEFAULT;")
+                else:
+                    cursor.execute("SET statement_timeout = %s;", (int(timeout_ms),))
+        finally:
+            conn.autocommit = autocommit
+        self._conn_timeouts[conn] = timeout_ms
+
+    # ======================= TIMEOUT & PEMBATALAN =======================
+    def scope(self, query_class: str) -> QueryScope:
+        if query_class not in self.statement_timeouts:
+            raise ValueError(f"Kelas query tidak dikenal: {query_class}")
+        return QueryScope(query_class, self.statement_timeouts[query_class])
+
+    async def run_async(self, query_class: str, func: Callable, *args, **kwargs):
+        """
+        Jalankan fungsi database di thread dengan statement_timeout kelasnya.
+        Jika task pemanggil dibatalkan atau melewati batas waktu, query yang
+        sedang berjalan ikut dibatalkan di server.
+        """
+        scope = self.scope(query_class)
+        # Fungsi bisa menjalankan beberapa statement; beri kelonggaran di atas batas per statement
+        deadline = scope.timeout_ms / 1000 * 2 + 1 if scope.timeout_ms else None
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(scope.run, func, *args, **kwargs), timeout=deadline)
+        except asyncio.TimeoutError as e:
+            scope.cancel()
+            raise QueryTooExpensive(query_class, scope.timeout_ms) from e
+        except asyncio.CancelledError:
+            scope.cancel()
+            raise
         
     def execute(self, query: str, params: Tuple[Any, ...] = ()) -> Any:
         conn = self.get_conn()
@@ -44,6 +177,20 @@ class DBManager:
         finally:
             self.put_conn(conn)
 
+    def execute_autocommit(self, query: str, params: Tuple[Any, ...] = ()) -> None:
+        """
+        Jalankan statement di luar blok transaksi, untuk perintah yang tidak
+        boleh berada di dalam transaksi (VACUUM, REINDEX CONCURRENTLY, ...).
+        """
+        conn = self.get_conn()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+        finally:
+            conn.autocommit = False
+            self.put_conn(conn)
+
     def fetchone(self, query: str, params: Tuple[Any, ...] = ()) -> Tuple[Any, ...] | None:
         cursor = self.execute(query, params)
         result = cursor.fetchone()
@@ -57,6 +204,63 @@ class DBManager:
         return results
     
 
+    def iter_rows(self, query: str, params: Tuple[Any, ...] = (), batch_size: int = 2000,
+                  as_dict: bool = False) -> Iterator[Any]:
+        """
+        Stream hasil query lewat server-side cursor sehingga baris tidak
+        dimuat semua ke memori. Koneksi dipegang sampai iterasi selesai.
+        """
+        conn = self.get_conn()
+        try:
+            cursor_factory = RealDictCursor if as_dict else None
+            with conn.cursor(name=f"iter_{uuid.uuid4().hex}", cursor_factory=cursor_factory) as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(query, params)
+                for row in cursor:
+                    yield row
+        finally:
+            # Server-side cursor hanya hidup di dalam transaksi; tutup transaksinya
+            conn.rollback()
+            self.put_conn(conn)
+
+    def copy_out(self, query: str, params: Tuple[Any, ...], file, options: str = "FORMAT binary") -> int:
+        """
+        `COPY (query) TO STDOUT` ke file object. COPY tidak menerima parameter,
+        jadi query di-mogrify dulu di cursor yang sama. Kembalikan jumlah baris.
+        """
+        conn = self.get_conn()
+        try:
+            with conn.cursor() as cursor:
+                select = cursor.mogrify(query, params).decode()
+                cursor.copy_expert(f"COPY ({select}) TO STDOUT WITH ({options})", file)
+                return cursor.rowcount
+        finally:
+            conn.rollback()
+            self.put_conn(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator["Transaction"]:
+        """
+        Unit of work: satu koneksi, banyak statement, satu commit.
+        Jika terjadi exception, semua perubahan di-rollback.
+
+            with db_manager.transaction() as tx:
+                tx.execute_values(query, rows)
+                tx.execute(query_lain, params)
+        """
+        conn = self.get_conn()
+        tx = Transaction(conn)
+        try:
+            yield tx
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            tx.close()
+            self.put_conn(conn)
+        tx.run_commit_hooks()
+
     def fetchall_dict(self, query: str, params: Tuple[Any, ...] = ()) -> List[dict]:
         conn = self.get_conn()
         try:
@@ -77,3 +281,55 @@ class DBManager:
             self.pool.closeall()
 
 
+
+
+class Transaction:
+    """Wrapper koneksi yang sedang berada di dalam DBManager.transaction()"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self._commit_hooks: List[Callable[[], None]] = []
+
+    def execute(self, query: str, params: Tuple[Any, ...] = ()) -> Any:
+        self.cursor.execute(query, params)
+        return self.cursor
+
+    def execute_batch(self, query: str, params_list: Sequence[Tuple[Any, ...]], page_size: int = 500) -> None:
+        """Jalankan query yang sama untuk banyak parameter dalam beberapa round trip saja"""
+        extras.execute_batch(self.cursor, query, params_list, page_size=page_size)
+
+    def execute_values(self, query: str, values: Sequence[Tuple[Any, ...]], template: str = None,
+                       page_size: int = 1000, fetch: bool = False) -> List[Tuple[Any, ...]]:
+        """INSERT multi-baris: `query` harus berisi satu placeholder `VALUES %s`"""
+        return extras.execute_values(self.cursor, query, values, template=template,
+                                     page_size=page_size, fetch=fetch)
+
+    def fetchone(self, query: str, params: Tuple[Any, ...] = ()) -> Tuple[Any, ...] | None:
+        return self.execute(query, params).fetchone()
+
+    def fetchall(self, query: str, params: Tuple[Any, ...] = ()) -> List[Tuple[Any, ...]]:
+        return self.execute(query, params).fetchall()
+
+    def copy_expert(self, sql: str, file) -> int:
+        """COPY ... FROM STDIN / TO STDOUT lewat file object, kembalikan jumlah baris"""
+        self.cursor.copy_expert(sql, file)
+        return self.cursor.rowcount
+
+    def fetchall_dict(self, query: str, params: Tuple[Any, ...] = ()) -> List[dict]:
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    def on_commit(self, callback: Callable[[], None]) -> None:
+        """Daftarkan callback yang dijalankan setelah commit berhasil"""
+        self._commit_hooks.append(callback)
+
+    def run_commit_hooks(self) -> None:
+        hooks, self._commit_hooks = self._commit_hooks, []
+        for hook in hooks:
+            hook()
+
+    def close(self) -> None:
+        if not self.cursor.closed:
+            self.cursor.close()
@@ -1,4 +1,7 @@
 class MaintenanceRecord:
+    # __slots__: tanpa __dict__ per objek, penting saat memuat ratusan ribu record
+    __slots__ = ("tanggal", "waktu", "act", "fault_name", "crane_id", "fault_reference")
+
     def __init__(self, tanggal, waktu, act, fault_name, crane_id, fault_reference=None):
         self.tanggal = tanggal
         self.waktu = waktu
@@ -21,6 +24,9 @@ class MaintenanceRecord:
             self.fault_id 
         )
 
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
     def __repr__(self):
         return (f"MaintenanceRecord(tanggal='{self.tanggal}', waktu='{self.waktu}', "
                 f"act='{self.act}', fault_name='{self.fault_name}', "
@@ -28,6 +34,8 @@ class MaintenanceRecord:
 
     
 class FaultReference:
+    __slots__ = ("fault_id", "code_fault", "fault_name")
+
     def __init__(self,fault_id, code_fault, fault_name):
         self.fault_id = fault_id
         self.code_fault = code_fault
@@ -35,6 +43,9 @@ class FaultReference:
         
     def to_tuple(self):
         return (self.fault_id, self.code_fault, self.fault_name)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
     
     def __repr__(self):
         return (f"FaultReference(fault_id='{self.fault_id}', code_fault='{self.code_fault}', fault_name='{self.fault_name}')")
@@ -0,0 +1,225 @@
+# database/record_batch.py
+import numpy as np
+from typing import Dict, Iterable, List, Optional
+
+# Timestamp COPY binary: int64 mikrodetik sejak 2000-01-01 (epoch PostgreSQL)
+PG_EPOCH_OFFSET_US = 946684800 * 1_000_000
+COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+
+# Satu tuple COPY binary dari RecordBatch.COPY_SELECT: jumlah field lalu (panjang, nilai) per kolom
+_COPY_TUPLE = np.dtype([
+    ("nfields", ">i2"),
+    ("ts_len", ">i4"), ("ts", ">i8"),
+    ("crane_len", ">i4"), ("crane_id", ">i2"),
+    ("fault_len", ">i4"), ("fault_id", ">i4"),
+    ("act_len", ">i4"), ("act", ">i2"),
+])
+
+
+def greedy_dedup_mask(times: np.ndarray, group_start: np.ndarray, dedup_minutes: int = 1) -> np.ndarray:
+    """
+    Aturan dedup grafik untuk event urut waktu (int64 mikrodetik) yang dibagi
+    ke kelompok berurutan (group_start=True di event pertama setiap kelompok,
+    mis. per hari atau per crane per hari): event dihitung jika >= `dedup_minutes`
+    menit setelah event terakhir yang DIHITUNG di kelompoknya.
+
+    Event yang berjarak >= jendela dari event sebelumnya pasti dihitung, jadi
+    hanya di dalam "cluster" rapat yang perlu dilompati; lompatan semua cluster
+    dikerjakan bersamaan dengan searchsorted.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    n = len(times)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    window = int(dedup_minutes) * 60 * 1_000_000
+    starts = np.flatnonzero(group_start)
+    # Geser setiap kelompok agar waktu naik monoton di seluruh array dan antar kelompok
+    # berjarak >= jendela; searchsorted tidak pernah melompat ke kelompok lain
+    ends = np.append(starts[1:], n)
+    spans = times[ends - 1] - times[starts]
+    offsets = np.concatenate(([0], np.cumsum(spans + window + 1)[:-1])) - times[starts]
+    shifted = times + np.repeat(offsets, ends - starts)
+
+    cluster_start = np.asarray(group_start, dtype=bool).copy()
+    cluster_start[1:] |= shifted[1:] - shifted[:-1] >= window
+    current = np.flatnonzero(cluster_start)
+    cluster_end = np.append(current[1:], n)
+    keep[current] = True
+    while len(current):
+        following = np.searchsorted(shifted, shifted[current] + window, side="left")
+        inside = following < cluster_end
+        current, cluster_end = following[inside], cluster_end[inside]
+        keep[current] = True
+    return keep
+
+
+def greedy_group_counts(group_times: List[Iterable[int]], dedup_minutes: int = 1) -> np.ndarray:
+    """
+    Jumlah event terhitung (greedy_dedup_mask) per kelompok, dari waktu event
+    per kelompok (int64 mikrodetik, urut naik; mis. array_agg per crane per hari).
+    """
+    lengths = np.fromiter((len(times) for times in group_times), dtype=np.int64, count=len(group_times))
+    if not len(lengths):
+        return np.zeros(0, dtype=np.int64)
+    times = np.fromiter((t for group in group_times for t in group), dtype=np.int64, count=int(lengths.sum()))
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    group_start = np.zeros(len(times), dtype=bool)
+    group_start[starts[lengths > 0]] = True
+    keep = greedy_dedup_mask(times, group_start, dedup_minutes).astype(np.int64)
+    counts = np.zeros(len(lengths), dtype=np.int64)
+    nonempty = lengths > 0
+    counts[nonempty] = np.add.reduceat(keep, starts[nonempty]) if len(times) else 0
+    return counts
+
+
+class RecordBatch:
+    """
+    Record maintenance dalam bentuk kolom (NumPy), untuk analitik tanpa objek per baris.
+
+    - timestamps : datetime64[us]  (tanggal + waktu, waktu NULL = 00:00)
+    - crane_ids  : int16           (-1 = NULL)
+    - fault_ids  : int32           (-1 = NULL)
+    - act        : int8            (NULL = 0)
+    - fault_names: {fault_id: nama di fault_references}
+
+    Baris selalu urut timestamp.
+    """
+
+    __slots__ = ("timestamps", "crane_ids", "fault_ids", "act", "fault_names")
+
+    # Kolom yang dipilih untuk mengisi batch; lebar tetap agar COPY binary bisa dibaca sebagai array
+    COPY_SELECT = """
+        SELECT mr.tanggal + COALESCE(mr.waktu, '00:00'::time) AS ts,
+               COALESCE(mr.crane_id, -1)::SMALLINT,
+               COALESCE(mr.fault_id, -1)::INTEGER,
+               COALESCE(mr.act, 0)::SMALLINT
+    """
+
+    def __init__(self, timestamps, crane_ids, fault_ids, act, fault_names: Optional[Dict[int, str]] = None):
+        self.timestamps = np.asarray(timestamps, dtype="datetime64[us]")
+        self.crane_ids = np.asarray(crane_ids, dtype=np.int16)
+        self.fault_ids = np.asarray(fault_ids, dtype=np.int32)
+        self.act = np.asarray(act, dtype=np.int8)
+        self.fault_names = fault_names or {}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __repr__(self):
+        return f"RecordBatch(rows={len(self)}, faults={len(self.fault_names)}, nbytes={self.nbytes})"
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.crane_ids.nbytes + self.fault_ids.nbytes + self.act.nbytes
+
+    @property
+    def dates(self):
+        """Tanggal per baris (datetime64[D])"""
+        return self.timestamps.astype("datetime64[D]")
+
+    def fault_name(self, fault_id: int, default: str = "-") -> str:
+        return self.fault_names.get(int(fault_id), default)
+
+    # ======================= PEMBUAT =======================
+    @classmethod
+    def empty(cls, fault_names: Optional[Dict[int, str]] = None) -> "RecordBatch":
+        return cls(np.empty(0, "datetime64[us]"), np.empty(0, np.int16), np.empty(0, np.int32),
+                   np.empty(0, np.int8), fault_names)
+
+    @classmethod
+    def from_copy_binary(cls, buffer: bytes, fault_names: Optional[Dict[int, str]] = None) -> "RecordBatch":
+        """Parse output `COPY (COPY_SELECT ...) TO STDOUT WITH (FORMAT binary)` langsung ke array"""
+        view = memoryview(buffer)
+        if bytes(view[:11]) != COPY_SIGNATURE:
+            raise ValueError("Bukan data COPY binary PostgreSQL")
+        extension_length = int.from_bytes(view[15:19], "big")
+        body = view[19 + extension_length:len(view) - 2]  # tanpa header & trailer (-1)
+        if len(body) % _COPY_TUPLE.itemsize:
+            raise ValueError("Panjang data COPY tidak sesuai format RecordBatch")
+
+        rows = np.frombuffer(body, dtype=_COPY_TUPLE)
+        if len(rows) and not (
+            np.all(rows["nfields"] == 4) and np.all(rows["ts_len"] == 8) and np.all(rows["crane_len"] == 2)
+            and np.all(rows["fault_len"] == 4) and np.all(rows["act_len"] == 2)
+        ):
+            raise ValueError("Tuple COPY berisi NULL atau kolom dengan lebar berbeda")
+
+        timestamps = (rows["ts"].astype(np.int64) + PG_EPOCH_OFFSET_US).astype("datetime64[us]")
+        return cls(timestamps, rows["crane_id"], rows["fault_id"], rows["act"], fault_names)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple], fault_names: Optional[Dict[int, str]] = None) -> "RecordBatch":
+        """Isi dari tuple cursor (ts, crane_id, fault_id, act) hasil COPY_SELECT"""
+        rows = list(rows)
+        if not rows:
+            return cls.empty(fault_names)
+        timestamps, crane_ids, fault_ids, act = zip(*rows)
+        return cls(np.array(timestamps, dtype="datetime64[us]"), crane_ids, fault_ids, act, fault_names)
+
+    @classmethod
+    def concat(cls, batches: List["RecordBatch"]) -> "RecordBatch":
+        """Gabungkan beberapa batch dan urutkan ulang berdasarkan timestamp"""
+        batches = [batch for batch in batches if batch is not None]
+        fault_names = {}
+        for batch in batches:
+            fault_names.update(batch.fault_names)
+        if not batches:
+            return cls.empty()
+        merged = cls(
+            np.concatenate([b.timestamps for b in batches]),
+            np.concatenate([b.crane_ids for b in batches]),
+            np.concatenate([b.fault_ids for b in batches]),
+            np.concatenate([b.act for b in batches]),
+            fault_names,
+        )
+        order = np.argsort(merged.timestamps, kind="stable")
+        return merged.take(order)
+
+    # ======================= SELEKSI =======================
+    def take(self, index) -> "RecordBatch":
+        """Subset baris dari mask boolean atau array index"""
+        return RecordBatch(self.timestamps[index], self.crane_ids[index], self.fault_ids[index],
+                           self.act[index], self.fault_names)
+
+    # ======================= ANALITIK =======================
+    def dedup_mask(self, dedup_minutes: int = 1):
+        """
+        Mask event yang dihitung dengan aturan grafik: per hari, event dihitung
+        jika >= `dedup_minutes` menit setelah event terakhir yang DIHITUNG.
+        Batch harus urut timestamp (selalu benar untuk batch dari database).
+        """
+        n = len(self)
+        if n == 0:
+            return np.zeros(0, dtype=bool)
+        days = self.timestamps.astype("datetime64[D]").astype(np.int64)
+        day_start = np.ones(n, dtype=bool)
+        day_start[1:] = days[1:] != days[:-1]
+        return greedy_dedup_mask(self.timestamps.astype(np.int64), day_start, dedup_minutes)
+
+    def daily_counts(self, start_date: str, end_date: str, dedup_minutes: int = 1):
+        """
+        (hari datetime64[D], jumlah int64) untuk setiap hari di [start_date, end_date],
+        hari tanpa event = 0. dedup_minutes=0 menghitung semua event.
+        """
+        days = np.arange(np.datetime64(start_date, "D"), np.datetime64(end_date, "D") + 1)
+        counted = self.dates if not dedup_minutes else self.dates[self.dedup_mask(dedup_minutes)]
+        offsets = (counted - days[0]).astype(np.int64) if len(days) else np.empty(0, np.int64)
+        offsets = offsets[(offsets >= 0) & (offsets < len(days))]
+        return days, np.bincount(offsets, minlength=len(days)).astype(np.int64)
+
+    def mask(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+             crane_ids=None, fault_ids=None):
+        """Mask boolean untuk rentang tanggal (inklusif) dan kumpulan crane/fault (None = semua)"""
+        mask = np.ones(len(self), dtype=bool)
+        if start_date is not None or end_date is not None:
+            dates = self.dates
+            if start_date is not None:
+                mask &= dates >= np.datetime64(start_date, "D")
+            if end_date is not None:
+                mask &= dates <= np.datetime64(end_date, "D")
+        if crane_ids is not None:
+            mask &= np.isin(self.crane_ids, list(crane_ids))
+        if fault_ids is not None:
+            mask &= np.isin(self.fault_ids, list(fault_ids))
+        return mask
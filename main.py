@@ -1,6 +1,5 @@
 from database.db_manager import DBManager
 from services.maintenance_service import MaintenanceService
-from bot.telegram_bot import TelegramBot
 from utils.config import TELEGRAM_TOKEN, DB_PATH
 from telegram.error import NetworkError
 import asyncio
@@ -13,6 +12,10 @@ setup_logger()
 
 
 def main():
+    # Diimpor di sini: worker render (spawn/forkserver) menjalankan ulang modul ini
+    # dan tidak boleh ikut membuat service bot beserta koneksi database
+    from bot.telegram_bot import TelegramBot
+
     db_manager = DBManager(DB_PATH)
     maintenance_service = MaintenanceService(db_manager)
     bot = TelegramBot(TELEGRAM_TOKEN, maintenance_service)
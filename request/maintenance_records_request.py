@@ -35,7 +35,7 @@ class MaintenanceDataRequestValidator:
         if fault.isdigit():
             return self.maintenance_service.get_fault_by_id(int(fault)) is not None
         else:
-            return bool(self.maintenance_service.search_faults_by_keyword(fault))
+            return bool(self.maintenance_service.fault_index.search(fault, limit=1, fuzzy=False))
 
     def get_errors(self) -> list:
         return self.errors
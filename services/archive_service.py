@@ -0,0 +1,185 @@
+# services/archive_service.py
+from database.db_manager import DBManager, Transaction
+from services.change_notifier import DataChange
+from datetime import date, datetime, timedelta
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveService:
+    """
+    Tier data dingin untuk maintenance_records.
+
+    Event yang lebih tua dari umur tertentu dipindah per bulan ke tabel
+    maintenance_records_archive: satu baris per (crane, fault, bulan) dengan
+    array timestamp dan act. Array besar otomatis dikompres oleh TOAST,
+    dan tabel/index hot hanya berisi data beberapa bulan terakhir.
+
+    RecordQuery memakai source_for() sehingga query yang melewati batas arsip
+    tetap membaca gabungan hot + arsip secara transparan.
+    """
+
+    def __init__(self, db_manager: DBManager, changes=None):
+        self.db_manager = db_manager
+        self.changes = changes
+        self._boundary = None
+        self._boundary_loaded = False
+        if changes is not None:
+            changes.subscribe(self._on_data_change)
+
+    def _on_data_change(self, change) -> None:
+        # Arsip/hapus di proses lain bisa menggeser batas: muat ulang saat dibutuhkan
+        if change.scope != "faults":
+            self._boundary_loaded = False
+
+    def create_table(self):
+        query_archive = """
+        CREATE TABLE IF NOT EXISTS maintenance_records_archive (
+            id SERIAL PRIMARY KEY,
+            crane_id INTEGER,
+            fault_id INTEGER,
+            fault_name TEXT,
+            bulan DATE NOT NULL,
+            ts TIMESTAMP[] NOT NULL,
+            act SMALLINT[] NOT NULL,
+            jumlah INTEGER NOT NULL
+        );
+        """
+        self.db_manager.execute(query_archive)
+        self.db_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_maintenance_archive_bulan_crane "
+            "ON maintenance_records_archive (bulan, crane_id);"
+        )
+
+    # ======================= BATAS HOT / ARSIP =======================
+    def boundary(self) -> Optional[date]:
+        """Tanggal pertama setelah bulan arsip terakhir (None jika arsip kosong)"""
+        if not self._boundary_loaded:
+            self.refresh_boundary()
+        return self._boundary
+
+    def refresh_boundary(self) -> None:
+        row = self.db_manager.fetchone(
+            "SELECT (MAX(bulan) + INTERVAL '1 month')::date FROM maintenance_records_archive;"
+        )
+        self._boundary = row[0] if row else None
+        self._boundary_loaded = True
+
+    def _touches_archive(self, query) -> bool:
+        boundary = self.boundary()
+        return boundary is not None and query.start_date < boundary.isoformat()
+
+    def _archive_where(self, query):
+        """Filter level baris arsip: bulan yang overlap + crane/fault"""
+        month_ranges = [(self._month_start(start), end) for start, end in query.date_ranges]
+        return query._where(alias="a", date_expr="a.bulan", date_ranges=month_ranges)
+
+    @staticmethod
+    def _month_start(date_str: str) -> str:
+        return datetime.strptime(date_str, "%Y-%m-%d").date().replace(day=1).isoformat()
+
+    def source_for(self, query):
+        """
+        FROM clause (dan parameternya) untuk RecordQuery. Kolomnya sama dengan
+        maintenance_records; record dari arsip memiliki id NULL.
+        """
+        if not self._touches_archive(query):
+            return "maintenance_records", []
+
+        where, params = self._archive_where(query)
+        source = f"""(
+            SELECT id, tanggal, waktu, act, fault_name, crane_id, fault_id
+            FROM maintenance_records
+            UNION ALL
+            SELECT NULL::INTEGER, u.ts::date, u.ts::time, u.act::INTEGER, a.fault_name, a.crane_id, a.fault_id
+            FROM maintenance_records_archive a
+            CROSS JOIN LATERAL unnest(a.ts, a.act) AS u(ts, act)
+            WHERE {where}
+        )"""
+        return source, params
+
+    # ======================= TULIS =======================
+    def delete_matching(self, query, tx: Transaction) -> int:
+        """Buang event arsip yang cocok dengan filter query, kembalikan jumlahnya"""
+        if not self._touches_archive(query):
+            return 0
+
+        where, where_params = self._archive_where(query)
+        match, match_params = query._where(alias="a", date_expr="u.ts::date")
+        sql = f"""
+        WITH kept AS (
+            SELECT a.id,
+                   array_agg(u.ts ORDER BY u.ord) FILTER (WHERE NOT COALESCE(({match}), FALSE)) AS ts,
+                   array_agg(u.act ORDER BY u.ord) FILTER (WHERE NOT COALESCE(({match}), FALSE)) AS act,
+                   COUNT(*) FILTER (WHERE {match}) AS removed
+            FROM maintenance_records_archive a
+            CROSS JOIN LATERAL unnest(a.ts, a.act) WITH ORDINALITY AS u(ts, act, ord)
+            WHERE {where}
+            GROUP BY a.id
+        )
+        UPDATE maintenance_records_archive a
+        SET ts = COALESCE(kept.ts, ARRAY[]::TIMESTAMP[]),
+            act = COALESCE(kept.act, ARRAY[]::SMALLINT[]),
+            jumlah = COALESCE(cardinality(kept.ts), 0)
+        FROM kept
+        WHERE a.id = kept.id AND kept.removed > 0
+        RETURNING kept.removed;
+        """
+        params = match_params * 3 + where_params
+        removed = sum(row[0] for row in tx.fetchall(sql, tuple(params)))
+        tx.execute("DELETE FROM maintenance_records_archive WHERE jumlah = 0;")
+        return removed
+
+    def archive_older_than(self, days: int, tx: Optional[Transaction] = None) -> dict:
+        """
+        Pindahkan semua event sebelum awal bulan (hari ini - days) ke arsip.
+        Hanya bulan penuh yang diarsip agar satu bulan = satu baris per crane/fault.
+        """
+        if tx is None:
+            with self.db_manager.transaction() as own_tx:
+                return self.archive_older_than(days, own_tx)
+
+        cutoff = (date.today() - timedelta(days=days)).replace(day=1)
+        insert_query = """
+        INSERT INTO maintenance_records_archive (crane_id, fault_id, fault_name, bulan, ts, act, jumlah)
+        SELECT crane_id, fault_id, fault_name, date_trunc('month', tanggal)::date,
+               array_agg(tanggal + COALESCE(waktu, '00:00'::time) ORDER BY tanggal, waktu),
+               array_agg(COALESCE(act, 0)::SMALLINT ORDER BY tanggal, waktu),
+               COUNT(*)
+        FROM maintenance_records
+        WHERE tanggal < %s
+        GROUP BY 1, 2, 3, 4;
+        """
+        groups = tx.execute(insert_query, (cutoff,)).rowcount
+        events = tx.execute("DELETE FROM maintenance_records WHERE tanggal < %s;", (cutoff,)).rowcount
+        if self.changes is not None:
+            # Isi data tidak berubah, hanya lokasinya: cukup beri tahu proses lain soal batas arsip
+            self.changes.publish(tx, DataChange("archive"))
+        else:
+            tx.on_commit(self.refresh_boundary)
+
+        logger.info(f"Arsip: {events} event dipindah ke {groups} baris arsip (sebelum {cutoff})")
+        return {"cutoff": cutoff, "groups": groups, "events": events}
+
+    # ======================= LAPORAN =======================
+    def storage_report(self) -> dict:
+        """Ukuran dan jumlah event di tier hot dan arsip"""
+        query = """
+        SELECT pg_total_relation_size('maintenance_records'),
+               pg_total_relation_size('maintenance_records_archive'),
+               (SELECT GREATEST(reltuples, 0)::BIGINT FROM pg_class WHERE oid = 'maintenance_records'::regclass),
+               (SELECT COALESCE(SUM(jumlah), 0) FROM maintenance_records_archive),
+               (SELECT MIN(bulan) FROM maintenance_records_archive),
+               (SELECT MAX(bulan) FROM maintenance_records_archive);
+        """
+        hot_bytes, cold_bytes, hot_rows, cold_rows, first_month, last_month = self.db_manager.fetchone(query)
+        return {
+            "hot_bytes": hot_bytes,
+            "cold_bytes": cold_bytes,
+            "hot_rows": hot_rows,
+            "cold_rows": int(cold_rows),
+            "first_month": first_month,
+            "last_month": last_month,
+        }
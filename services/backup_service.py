@@ -0,0 +1,225 @@
+# services/backup_service.py
+import calendar
+import contextvars
+import gzip
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Tuple
+from database.db_manager import DBManager
+
+logger = logging.getLogger(__name__)
+
+
+class BackupService:
+    """
+    Backup & restore data maintenance dengan COPY, tanpa pg_dump.
+
+    Export menulis satu file CSV terkompresi gzip per bulan (records/YYYY-MM.csv.gz)
+    plus fault_references.csv.gz dan manifest.json. Record diambil lewat sumber
+    RecordQuery sehingga data hot dan arsip ditulis dalam format yang sama.
+    Semua worker memakai snapshot yang sama (pg_export_snapshot) sehingga hasil
+    export konsisten walaupun berjalan paralel.
+
+    Restore membaca manifest, memulihkan fault_references, lalu memulihkan bulan
+    yang overlap dengan rentang tanggal secara paralel (satu transaksi per bulan).
+    """
+
+    MANIFEST = "manifest.json"
+    FAULTS_FILE = "fault_references.csv.gz"
+    RECORD_COLUMNS = "tanggal, waktu, act, fault_name, crane_id, fault_id"
+    MIN_DATE = "1900-01-01"
+    MAX_DATE = "9999-12-31"
+
+    def __init__(self, maintenance_service, workers: int = 4, compresslevel: int = 6):
+        self.maintenance_service = maintenance_service
+        self.workers = max(1, min(workers, 8))
+        # Pool sendiri (worker + koordinator snapshot): pool bot tidak menunggu jika
+        # habis (PoolError), jadi backup/restore tidak boleh memakai koneksinya
+        shared = maintenance_service.db_manager
+        self.db_manager = DBManager(shared.db_config, shared.statement_timeouts, max_connections=self.workers + 1)
+        self.compresslevel = compresslevel
+
+    # ======================= HELPER =======================
+    @staticmethod
+    def _month_bounds(month_start, start_date: str, end_date: str) -> Tuple[str, str]:
+        """Rentang satu bulan, dipotong oleh rentang tanggal yang diminta"""
+        last_day = calendar.monthrange(month_start.year, month_start.month)[1]
+        month_end = month_start.replace(day=last_day).isoformat()
+        return max(month_start.isoformat(), start_date), min(month_end, end_date)
+
+    def _run_parallel(self, func, jobs: List[tuple]) -> list:
+        # Salin context per task agar QueryScope (statement timeout & cancel) ikut ke worker
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, func, *job) for job in jobs]
+            return [future.result() for future in futures]
+
+    def list_backups(self, backup_dir: str) -> List[str]:
+        if not os.path.isdir(backup_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(backup_dir)
+            if os.path.isfile(os.path.join(backup_dir, name, self.MANIFEST))
+        )
+
+    # ======================= EXPORT =======================
+    def export(self, target_dir: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> dict:
+        start_date = start_date or self.MIN_DATE
+        end_date = end_date or self.MAX_DATE
+        os.makedirs(os.path.join(target_dir, "records"), exist_ok=True)
+        started = time.monotonic()
+
+        coordinator = self.db_manager.get_conn()
+        try:
+            with coordinator.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY;")
+                cursor.execute("SELECT pg_export_snapshot();")
+                snapshot = cursor.fetchone()[0]
+                cursor.execute("""
+                SELECT DISTINCT date_trunc('month', tanggal)::date AS bulan FROM maintenance_records
+                WHERE tanggal BETWEEN %s AND %s
+                UNION
+                SELECT bulan FROM maintenance_records_archive
+                WHERE bulan BETWEEN date_trunc('month', %s::date) AND %s
+                ORDER BY bulan;
+                """, (start_date, end_date, start_date, end_date))
+                months = [row[0] for row in cursor.fetchall() if row[0] is not None]
+
+            jobs = [(snapshot, self.FAULTS_FILE, "SELECT fault_id, code_fault, fault_name FROM fault_references ORDER BY fault_id", [])]
+            parts = []
+            for month in months:
+                lo, hi = self._month_bounds(month, start_date, end_date)
+                source, where, params = self.maintenance_service.query(lo, hi)._base()
+                sql = f"""
+                SELECT mr.tanggal, mr.waktu, mr.act, mr.fault_name, mr.crane_id, mr.fault_id
+                FROM {source} WHERE {where}
+                ORDER BY mr.tanggal, mr.waktu
+                """
+                filename = os.path.join("records", f"{month.strftime('%Y-%m')}.csv.gz")
+                jobs.append((snapshot, filename, sql, params))
+                parts.append({"month": month.strftime("%Y-%m"), "start_date": lo, "end_date": hi, "file": filename})
+
+            results = self._run_parallel(lambda *job: self._export_part(target_dir, *job), jobs)
+        finally:
+            # Snapshot hanya berlaku selama transaksi koordinator terbuka
+            coordinator.rollback()
+            self.db_manager.put_conn(coordinator)
+
+        faults_result, record_results = results[0], results[1:]
+        for part, result in zip(parts, record_results):
+            part.update(result)
+
+        manifest = {
+            "format": 1,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "start_date": start_date,
+            "end_date": end_date,
+            "fault_references": {"file": self.FAULTS_FILE, **faults_result},
+            "records": parts,
+            "total_rows": sum(part["rows"] for part in parts),
+            "seconds": round(time.monotonic() - started, 1),
+        }
+        with open(os.path.join(target_dir, self.MANIFEST), "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=2)
+
+        logger.info(f"Backup {target_dir}: {len(parts)} bulan, {manifest['total_rows']} record, {manifest['seconds']} detik")
+        return manifest
+
+    def _export_part(self, target_dir: str, snapshot: str, filename: str, sql: str, params: list) -> dict:
+        path = os.path.join(target_dir, filename)
+        conn = self.db_manager.get_conn()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY;")
+                cursor.execute("SET TRANSACTION SNAPSHOT %s;", (snapshot,))
+                # COPY tidak menerima parameter: sisipkan lewat mogrify
+                select = cursor.mogrify(sql, params).decode()
+                with gzip.open(path, "wb", compresslevel=self.compresslevel) as out:
+                    cursor.copy_expert(f"COPY ({select}) TO STDOUT WITH (FORMAT csv, HEADER true)", out)
+                rows = cursor.rowcount
+        finally:
+            conn.rollback()
+            self.db_manager.put_conn(conn)
+        return {"rows": rows, "bytes": os.path.getsize(path)}
+
+    # ======================= RESTORE =======================
+    def restore(self, source_dir: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                replace: bool = True) -> dict:
+        """
+        Pulihkan backup di `source_dir`. Hanya bulan yang overlap dengan
+        [start_date, end_date] yang dibaca. Dengan replace=True data yang ada
+        di rentang tersebut dihapus dulu (hot + arsip) agar restore bisa diulang.
+        """
+        with open(os.path.join(source_dir, self.MANIFEST), encoding="utf-8") as file:
+            manifest = json.load(file)
+        start_date = start_date or self.MIN_DATE
+        end_date = end_date or self.MAX_DATE
+        started = time.monotonic()
+
+        faults = self._restore_faults(os.path.join(source_dir, manifest["fault_references"]["file"]))
+
+        jobs = []
+        for part in manifest["records"]:
+            lo, hi = max(part["start_date"], start_date), min(part["end_date"], end_date)
+            if lo > hi:
+                continue
+            path = os.path.join(source_dir, part["file"])
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"File backup tidak ditemukan: {path}")
+            jobs.append((path, lo, hi, replace))
+        results = self._run_parallel(self._restore_month, jobs)
+
+        summary = {
+            "faults": faults,
+            "months": len(results),
+            "rows": sum(results),
+            "seconds": round(time.monotonic() - started, 1),
+        }
+        logger.info(f"Restore {source_dir}: {summary}")
+        return summary
+
+    def _restore_faults(self, path: str) -> int:
+        with self.db_manager.transaction() as tx:
+            tx.execute("CREATE TEMP TABLE restore_faults (fault_id INTEGER, code_fault TEXT, fault_name TEXT) ON COMMIT DROP;")
+            with gzip.open(path, "rb") as file:
+                tx.copy_expert("COPY restore_faults (fault_id, code_fault, fault_name) FROM STDIN WITH (FORMAT csv, HEADER true)", file)
+            inserted = tx.execute("""
+            INSERT INTO fault_references (fault_id, code_fault, fault_name)
+            SELECT fault_id, code_fault, fault_name FROM restore_faults
+            ON CONFLICT DO NOTHING;
+            """).rowcount
+            # fault_id diisi manual: geser sequence agar fault baru tidak bentrok
+            tx.execute("""
+            SELECT setval(pg_get_serial_sequence('fault_references', 'fault_id'),
+                          GREATEST((SELECT MAX(fault_id) FROM fault_references), 1));
+            """)
+            if inserted:
+                self.maintenance_service.mark_faults_changed(tx)
+        return inserted
+
+    def _restore_month(self, path: str, start_date: str, end_date: str, replace: bool) -> int:
+        with self.db_manager.transaction() as tx:
+            if replace:
+                self.maintenance_service.query(start_date, end_date).delete(tx)
+            tx.execute("""
+            CREATE TEMP TABLE restore_records (
+                tanggal DATE, waktu TIME, act INTEGER, fault_name TEXT, crane_id INTEGER, fault_id INTEGER
+            ) ON COMMIT DROP;
+            """)
+            with gzip.open(path, "rb") as file:
+                tx.copy_expert(f"COPY restore_records ({self.RECORD_COLUMNS}) FROM STDIN WITH (FORMAT csv, HEADER true)", file)
+            rows = tx.execute(f"""
+            INSERT INTO maintenance_records ({self.RECORD_COLUMNS})
+            SELECT {self.RECORD_COLUMNS} FROM restore_records
+            WHERE tanggal BETWEEN %s AND %s;
+            """, (start_date, end_date)).rowcount
+            crane_ids = [row[0] for row in tx.fetchall(
+                "SELECT DISTINCT crane_id FROM restore_records WHERE crane_id IS NOT NULL AND tanggal BETWEEN %s AND %s;",
+                (start_date, end_date),
+            )]
+            if crane_ids:
+                self.maintenance_service.mark_records_changed(tx, sorted(crane_ids), start_date, end_date)
+        return rows
@@ -0,0 +1,157 @@
+# services/change_notifier.py
+import json
+import logging
+import os
+import select
+import socket
+import threading
+import psycopg2
+from typing import Callable, List, Optional
+from database.db_manager import DBManager, Transaction
+
+logger = logging.getLogger(__name__)
+
+
+class DataChange:
+    """
+    Satu perubahan data yang dikirim lewat NOTIFY.
+    scope:
+    - "records" : maintenance_records berubah untuk crane_ids (None = semua) di [start_date, end_date]
+    - "faults"  : fault_references berubah
+    - "archive" : batas arsip berubah (isi data tetap sama)
+    - "all"     : tidak diketahui apa yang berubah (mis. listener baru tersambung ulang)
+    """
+
+    def __init__(self, scope: str, crane_ids: Optional[List[int]] = None, start_date: Optional[str] = None,
+                 end_date: Optional[str] = None, version: Optional[int] = None, origin: Optional[str] = None):
+        self.scope = scope
+        self.crane_ids = crane_ids
+        self.start_date = start_date
+        self.end_date = end_date
+        self.version = version
+        self.origin = origin
+
+    def affects(self, crane_id=None, start_date: Optional[str] = None, end_date: Optional[str] = None) -> bool:
+        """Apakah perubahan ini menyentuh crane dan rentang tanggal tertentu"""
+        if self.scope == "all":
+            return True
+        if self.scope != "records":
+            return False
+        if crane_id is not None and self.crane_ids is not None and int(crane_id) not in self.crane_ids:
+            return False
+        if start_date and self.end_date and str(start_date) > self.end_date:
+            return False
+        if end_date and self.start_date and str(end_date) < self.start_date:
+            return False
+        return True
+
+    def to_payload(self) -> str:
+        return json.dumps({
+            "scope": self.scope,
+            "cranes": self.crane_ids,
+            "start": self.start_date,
+            "end": self.end_date,
+            "v": self.version,
+            "origin": self.origin,
+        })
+
+    @classmethod
+    def from_payload(cls, payload: str) -> "DataChange":
+        data = json.loads(payload)
+        return cls(data.get("scope", "all"), data.get("cranes"), data.get("start"), data.get("end"),
+                   data.get("v"), data.get("origin"))
+
+    def __repr__(self):
+        return (f"DataChange(scope='{self.scope}', crane_ids={self.crane_ids}, start_date={self.start_date}, "
+                f"end_date={self.end_date}, version={self.version}, origin='{self.origin}')")
+
+
+class ChangeNotifier:
+    """
+    Kanal notifikasi perubahan data antar proses (bot, skrip backfill/maintenance).
+
+    Penulis memanggil publish() di dalam transaksinya: NOTIFY baru terkirim saat
+    commit. Setiap proses menjalankan listener di background thread dengan
+    koneksi LISTEN sendiri dan meneruskan perubahan ke callback yang terdaftar,
+    sehingga cache hanya membuang entri yang terdampak. Perubahan dari proses
+    sendiri langsung di-dispatch saat commit (tanpa menunggu listener).
+    """
+
+    CHANNEL = "crane_data_changed"
+
+    def __init__(self, db_manager: DBManager, reconnect_delay: float = 5.0):
+        self.db_manager = db_manager
+        self.reconnect_delay = reconnect_delay
+        self.origin = f"{socket.gethostname()}:{os.getpid()}"
+        self._subscribers: List[Callable[[DataChange], None]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def subscribe(self, callback: Callable[[DataChange], None]) -> None:
+        self._subscribers.append(callback)
+
+    def publish(self, tx: Transaction, change: DataChange) -> None:
+        change.origin = self.origin
+        tx.execute("SELECT pg_notify(%s, %s);", (self.CHANNEL, change.to_payload()))
+        tx.on_commit(lambda: self._dispatch(change))
+
+    def _dispatch(self, change: DataChange) -> None:
+        for callback in list(self._subscribers):
+            try:
+                callback(change)
+            except Exception as e:
+                logger.error(f"Callback invalidasi gagal untuk {change}: {e}")
+
+    # ======================= LISTENER =======================
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen_loop, name="change-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.reconnect_delay + 1)
+
+    def _listen_loop(self) -> None:
+        first_connect = True
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.db_manager.db_config)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.CHANNEL};")
+                logger.info(f"Listener perubahan data aktif ({self.origin})")
+
+                # Notifikasi yang terlewat selama terputus tidak bisa diketahui: buang semua cache
+                if not first_connect:
+                    self._dispatch(DataChange("all"))
+                first_connect = False
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.reconnect_delay) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self._handle_notify(notify.payload)
+            except Exception as e:
+                logger.error(f"Listener perubahan data terputus: {e}")
+                self._stop.wait(self.reconnect_delay)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _handle_notify(self, payload: str) -> None:
+        try:
+            change = DataChange.from_payload(payload)
+        except ValueError:
+            logger.warning(f"Payload notifikasi tidak valid: {payload!r}")
+            change = DataChange("all")
+        if change.origin == self.origin:
+            return  # sudah di-dispatch saat commit
+        logger.info(f"Perubahan data dari proses lain: {change}")
+        self._dispatch(change)
@@ -0,0 +1,255 @@
+# services/chart_cache.py
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from services.change_notifier import DataChange
+
+logger = logging.getLogger(__name__)
+
+
+class ChartCacheEntry:
+    __slots__ = ("key", "crane_id", "fault_name", "start_date", "end_date", "preset",
+                 "filename", "size", "file_id", "last_used")
+
+    def __init__(self, key, crane_id, fault_name, start_date, end_date, preset,
+                 filename, size, file_id=None, last_used=None):
+        self.key = key
+        self.crane_id = crane_id
+        self.fault_name = fault_name
+        self.start_date = start_date
+        self.end_date = end_date
+        self.preset = preset
+        self.filename = filename
+        self.size = size
+        self.file_id = file_id
+        self.last_used = last_used or time.time()
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ChartCache:
+    """
+    Cache grafik yang sudah dirender, dialamatkan dengan isi permintaannya:
+    hash dari (crane, fault, rentang tanggal, preset render, versi data).
+
+    - Bytes gambar disimpan di disk: <cache_dir>/<hash>.<format>, dibatasi
+      `max_bytes` dengan LRU (yang paling lama tidak dipakai dibuang dulu).
+    - file_id Telegram dari pengiriman pertama ikut disimpan, sehingga
+      permintaan yang sama cukup dikirim ulang dengan file_id: tanpa query
+      record, tanpa render, tanpa upload.
+
+    Versi data (data_versions) naik setiap upload/hapus menyentuh crane &
+    bulan itu, jadi key lama otomatis tidak cocok lagi. Entri yang tersentuh
+    perubahan juga langsung dibuang lewat ChangeNotifier agar disk tidak
+    terisi grafik basi. Perubahan saat bot mati tidak terlihat oleh
+    notifier, jadi index dari disk divalidasi ulang terhadap data_versions
+    saat start.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, maintenance_service, cache_dir: str, max_bytes: int = 200 * 1024 * 1024):
+        self.maintenance_service = maintenance_service
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, ChartCacheEntry]" = OrderedDict()  # urut LRU, terbaru di akhir
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.file_id_hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+        maintenance_service.changes.subscribe(self._on_data_change)
+
+    # ======================= KEY =======================
+    @staticmethod
+    def make_key(crane_id, fault_name, start_date: str, end_date: str, preset: str, version: int) -> str:
+        raw = json.dumps([crane_id, fault_name or "", str(start_date), str(end_date), preset, int(version)],
+                         ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def key_for(self, crane_id, fault_name, start_date: str, end_date: str, preset: str) -> str:
+        """Key dengan versi data terbaru crane & rentang tanggal (satu query ringan ke data_versions)"""
+        version = self.maintenance_service.get_data_version([crane_id], start_date, end_date)
+        return self.make_key(crane_id, fault_name, start_date, end_date, preset, version)
+
+    def keys_for(self, requests: list) -> list:
+        """
+        key_for untuk banyak grafik sekaligus: semua versi crane yang diminta
+        diambil dalam satu query. requests: [(crane_id, fault_name, start, end, preset)]
+        """
+        crane_ids = sorted({int(crane_id) for crane_id, *_ in requests})
+        if not crane_ids:
+            return []
+        versions = {}
+        for crane_id, bulan, version in self.maintenance_service.db_manager.fetchall(
+            "SELECT crane_id, bulan, version FROM data_versions WHERE crane_id = ANY(%s);", (crane_ids,)
+        ):
+            versions.setdefault(crane_id, []).append((bulan.isoformat(), version))
+
+        keys = []
+        for crane_id, fault_name, start_date, end_date, preset in requests:
+            # Sama dengan get_data_version: bulan dari awal bulan start_date s/d end_date
+            first_month = str(start_date)[:7] + "-01"
+            version = max((version for bulan, version in versions.get(int(crane_id), [])
+                           if first_month <= bulan <= str(end_date)), default=0)
+            keys.append(self.make_key(crane_id, fault_name, start_date, end_date, preset, version))
+        return keys
+
+    # ======================= INDEX =======================
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, self.INDEX_FILE)
+
+    def _load_index(self) -> None:
+        try:
+            with open(self._index_path(), encoding="utf-8") as file:
+                items = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Index cache grafik rusak, mulai kosong: {e}")
+            return
+        for item in sorted(items, key=lambda item: item.get("last_used", 0)):
+            entry = ChartCacheEntry(**item)
+            if os.path.exists(os.path.join(self.cache_dir, entry.filename)):
+                self._entries[entry.key] = entry
+                self._total_bytes += entry.size
+        stale = self._stale_keys()
+        for key in stale:
+            self._remove(key)
+        if stale:
+            self._save_index()
+        logger.info(f"Cache grafik dimuat: {len(self._entries)} grafik ({self._total_bytes // 1024} KB), "
+                    f"{len(stale)} basi dibuang")
+
+    def _stale_keys(self) -> list:
+        """
+        Key entri yang tidak cocok lagi dengan versi data sekarang (key dihitung
+        ulang dengan keys_for). Jika database tidak bisa dibaca, semua entri
+        dianggap basi.
+        """
+        if not self._entries:
+            return []
+        entries = list(self._entries.values())
+        try:
+            keys = self.keys_for([(entry.crane_id, entry.fault_name, entry.start_date, entry.end_date, entry.preset)
+                                  for entry in entries])
+        except Exception as e:
+            logger.warning(f"Versi data tidak bisa dibaca, index cache grafik dikosongkan: {e}")
+            return list(self._entries)
+        return [entry.key for entry, key in zip(entries, keys) if key != entry.key]
+
+    def _save_index(self) -> None:
+        """Tulis index (dipanggil dengan lock dipegang); file sementara lalu rename"""
+        items = [entry.to_dict() for entry in self._entries.values()]
+        handle, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(handle, "w", encoding="utf-8") as file:
+            json.dump(items, file, ensure_ascii=False)
+        os.replace(temp_path, self._index_path())
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry.size
+        try:
+            os.remove(os.path.join(self.cache_dir, entry.filename))
+        except OSError:
+            pass
+
+    # ======================= BACA / TULIS =======================
+    def get(self, key: str) -> Optional[ChartCacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry.last_used = time.time()
+            self._entries.move_to_end(key)
+            if entry.file_id:
+                self.file_id_hits += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def read(self, entry: ChartCacheEntry) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.cache_dir, entry.filename), "rb") as file:
+                return file.read()
+        except OSError:
+            with self._lock:
+                self._remove(entry.key)
+            return None
+
+    def put(self, key: str, image: bytes, crane_id, fault_name, start_date: str, end_date: str,
+            preset: str, image_format: str) -> ChartCacheEntry:
+        filename = f"{key}.{image_format}"
+        path = os.path.join(self.cache_dir, filename)
+        handle, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(handle, "wb") as file:
+            file.write(image)
+        os.replace(temp_path, path)
+
+        entry = ChartCacheEntry(key, crane_id, fault_name, str(start_date), str(end_date), preset,
+                                filename, len(image))
+        with self._lock:
+            previous = self._entries.pop(key, None)  # file yang sama sudah ditimpa di atas
+            if previous is not None:
+                self._total_bytes -= previous.size
+            self._entries[key] = entry
+            self._total_bytes += entry.size
+            # LRU: buang yang paling lama tidak dipakai sampai muat lagi
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+            self._save_index()
+        return entry
+
+    def set_file_id(self, key: str, file_id: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.file_id != file_id:
+                entry.file_id = file_id
+                self._save_index()
+
+    def forget_file_id(self, key: str) -> None:
+        """file_id ditolak Telegram (mis. bot token diganti): kirim ulang dari bytes"""
+        self.set_file_id(key, None)
+
+    # ======================= INVALIDASI =======================
+    def _on_data_change(self, change: DataChange) -> None:
+        if change.scope not in ("records", "all"):
+            return
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if change.affects(entry.crane_id, entry.start_date, entry.end_date)]
+            for key in stale:
+                self._remove(key)
+            if stale:
+                self._save_index()
+        if stale:
+            logger.info(f"Cache grafik: {len(stale)} grafik dibuang ({change.scope} {change.crane_ids or 'semua crane'} "
+                        f"{change.start_date} s/d {change.end_date})")
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+            self._save_index()
+
+    def report(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "file_id_hits": self.file_id_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,228 @@
+# services/chart_navigator.py
+import calendar
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from services.change_notifier import DataChange
+from services.graph_service import ChartSpec, GraphService, choose_granularity
+from services.record_query import RecordQuery
+
+logger = logging.getLogger(__name__)
+
+# Aksi tombol di bawah grafik
+NAV_ACTIONS = ("in", "out", "prev", "next")
+
+
+class ChartView:
+    """Satu grafik yang bisa dinavigasi: filter grupnya, jendela tanggal saat ini, dan seri harian yang sudah dimuat"""
+
+    __slots__ = ("token", "query", "crane_id", "fault_name", "start_date", "end_date", "series", "last_used")
+
+    def __init__(self, token: str, query: RecordQuery, crane_id, fault_name, start_date: str, end_date: str):
+        self.token = token
+        self.query = query
+        self.crane_id = crane_id
+        self.fault_name = fault_name
+        self.start_date = start_date
+        self.end_date = end_date
+        self.series: Dict[date, int] = {}  # hari -> jumlah fault dedup; hari kosong tersimpan sebagai 0
+        self.last_used = time.time()
+
+
+class ChartNavigator:
+    """
+    Zoom in/out dan geser (sebelumnya/berikutnya) grafik satu crane/fault tanpa
+    mengulang /grafik.
+
+    Setiap grafik yang dikirim mendapat token (dipakai di callback tombol).
+    Per token disimpan seri jumlah fault per hari yang sudah pernah dimuat;
+    jendela baru hanya meng-query hari yang belum ada (satu query
+    daily_series kecil untuk irisan yang kurang), lalu grafiknya dibangun
+    dari seri itu. Zoom in ke dalam rentang yang sudah dimuat tidak
+    menyentuh database sama sekali.
+
+    Seri dibuang sebagian lewat ChangeNotifier jika data crane & hari itu
+    berubah, jadi navigasi tidak menampilkan angka basi.
+    """
+
+    # Grafik navigasi dibangun dari daily_series, bukan dari builder /grafik, jadi
+    # di ChartCache disimpan dengan preset bertanda ini agar key keduanya tidak bercampur
+    CACHE_TAG = "nav"
+
+    def __init__(self, maintenance_service, graph_service: GraphService, max_views: int = 200,
+                 min_span_days: int = 7, max_span_days: int = 1096):
+        self.maintenance_service = maintenance_service
+        self.graph_service = graph_service
+        self.max_views = max_views
+        self.min_span_days = min_span_days
+        self.max_span_days = max_span_days
+        self._views: "OrderedDict[str, ChartView]" = OrderedDict()  # urut LRU, terbaru di akhir
+        self._lock = threading.Lock()
+        self.loaded_days = 0
+        self.reused_days = 0
+        maintenance_service.changes.subscribe(self._on_data_change)
+
+    @classmethod
+    def cache_preset(cls, preset: str) -> str:
+        """Preset untuk key ChartCache grafik navigasi (render tetap memakai `preset`)"""
+        return f"{cls.CACHE_TAG}:{preset}"
+
+    # ======================= VIEW =======================
+    def open(self, query: RecordQuery, crane_id, fault_name, start_date: str, end_date: str) -> str:
+        """Daftarkan grafik yang baru dikirim; kembalikan token untuk callback tombol"""
+        token = uuid.uuid4().hex[:10]
+        with self._lock:
+            self._views[token] = ChartView(token, query, crane_id, fault_name, start_date, end_date)
+            while len(self._views) > self.max_views:
+                self._views.popitem(last=False)
+        return token
+
+    def get(self, token: str) -> Optional[ChartView]:
+        with self._lock:
+            view = self._views.get(token)
+            if view is not None:
+                self._views.move_to_end(token)
+                view.last_used = time.time()
+            return view
+
+    def commit(self, view: ChartView, start_date: str, end_date: str) -> None:
+        """Jendela baru sudah tampil di chat"""
+        view.start_date, view.end_date = start_date, end_date
+
+    # ======================= JENDELA =======================
+    @staticmethod
+    def _is_whole_months(start: date, end: date) -> bool:
+        return start.day == 1 and end.day == calendar.monthrange(end.year, end.month)[1]
+
+    @staticmethod
+    def _add_months(day: date, months: int) -> date:
+        month = day.month - 1 + months
+        return day.replace(year=day.year + month // 12, month=month % 12 + 1, day=1)
+
+    def window(self, start_date: str, end_date: str, action: str) -> Tuple[str, str]:
+        """
+        Jendela tanggal setelah `action`:
+        - in/out  : rentang dibagi/dikali dua di sekitar titik tengah (min/max span)
+        - prev/next: geser sepanjang rentang; jendela bulan penuh digeser per bulan kalender
+        """
+        if action not in NAV_ACTIONS:
+            raise ValueError(f"Aksi navigasi tidak dikenal: {action}")
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        span = (end - start).days + 1
+
+        if action in ("prev", "next"):
+            step = -1 if action == "prev" else 1
+            if self._is_whole_months(start, end):
+                months = (end.year - start.year) * 12 + end.month - start.month + 1
+                start = self._add_months(start, step * months)
+                last = self._add_months(start, months - 1)
+                end = last.replace(day=calendar.monthrange(last.year, last.month)[1])
+            else:
+                start, end = start + timedelta(days=step * span), end + timedelta(days=step * span)
+            return start.isoformat(), end.isoformat()
+
+        new_span = span // 2 if action == "in" else span * 2
+        new_span = max(self.min_span_days, min(self.max_span_days, new_span))
+        if new_span == span:
+            return start_date, end_date
+        middle = start + timedelta(days=(span - 1) // 2)
+        start = middle - timedelta(days=(new_span - 1) // 2)
+        return start.isoformat(), (start + timedelta(days=new_span - 1)).isoformat()
+
+    # ======================= DATA =======================
+    @staticmethod
+    def _missing_ranges(series: Dict[date, int], start: date, end: date) -> List[Tuple[str, str]]:
+        """Rentang hari berurutan di [start, end] yang belum ada di seri"""
+        ranges, range_start = [], None
+        day = start
+        while day <= end:
+            if day not in series:
+                range_start = range_start or day
+            elif range_start is not None:
+                ranges.append((range_start.isoformat(), (day - timedelta(days=1)).isoformat()))
+                range_start = None
+            day += timedelta(days=1)
+        if range_start is not None:
+            ranges.append((range_start.isoformat(), end.isoformat()))
+        return ranges
+
+    def load(self, view: ChartView, start_date: str, end_date: str) -> int:
+        """
+        Pastikan seri harian view mencakup [start_date, end_date]. Hanya hari
+        yang belum dimuat di-query (satu query untuk semua irisan). Kembalikan
+        jumlah hari yang di-query.
+        """
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        with self._lock:
+            missing = self._missing_ranges(view.series, start, end)
+        fetched = sum((datetime.strptime(e, "%Y-%m-%d") - datetime.strptime(s, "%Y-%m-%d")).days + 1
+                      for s, e in missing)
+        self.reused_days += (end - start).days + 1 - fetched
+        if not missing:
+            return 0
+        series = view.query.with_dates(missing).daily_series(dedup_minutes=1)
+        with self._lock:
+            view.series.update(series)
+        self.loaded_days += fetched
+        logger.info(f"Navigasi grafik {view.token}: {fetched} hari di-query ({len(missing)} irisan)")
+        return fetched
+
+    @staticmethod
+    def _bucket_start(day: date, granularity: str) -> date:
+        """Awal bucket hari ini (sama dengan date_trunc / GraphService._bucket_starts)"""
+        if granularity == "week":
+            return day - timedelta(days=day.weekday())
+        if granularity == "month":
+            return day.replace(day=1)
+        if granularity == "quarter":
+            return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+        return day
+
+    def build_spec(self, view: ChartView, start_date: str, end_date: str) -> ChartSpec:
+        """Isi grafik jendela ini dari seri yang sudah dimuat (panggil load() dulu)"""
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        granularity = choose_granularity(start_date, end_date)
+        counts: Dict[date, int] = {}
+        with self._lock:
+            day = start
+            while day <= end:
+                bucket = self._bucket_start(day, granularity)
+                counts[bucket] = counts.get(bucket, 0) + view.series.get(day, 0)
+                day += timedelta(days=1)
+        total = sum(counts.values())
+        return self.graph_service.build_series_spec(
+            view.crane_id, start_date, end_date, granularity, counts,
+            view.fault_name or "-", total if view.fault_name else 0,
+        )
+
+    # ======================= INVALIDASI =======================
+    def _on_data_change(self, change: DataChange) -> None:
+        if change.scope not in ("records", "all"):
+            return
+        with self._lock:
+            for view in self._views.values():
+                if not view.series or not change.affects(view.crane_id):
+                    continue
+                if change.scope == "all" or not change.start_date or not change.end_date:
+                    view.series.clear()
+                    continue
+                start = datetime.strptime(str(change.start_date)[:10], "%Y-%m-%d").date()
+                end = datetime.strptime(str(change.end_date)[:10], "%Y-%m-%d").date()
+                for day in [day for day in view.series if start <= day <= end]:
+                    del view.series[day]
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "views": len(self._views),
+                "days": sum(len(view.series) for view in self._views.values()),
+                "loaded_days": self.loaded_days,
+                "reused_days": self.reused_days,
+            }
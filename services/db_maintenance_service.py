@@ -0,0 +1,108 @@
+# services/db_maintenance_service.py
+from database.db_manager import DBManager
+from typing import Iterable, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DBMaintenanceService:
+    """
+    Perawatan database setelah operasi bulk:
+    - ANALYZE agar planner memakai statistik terbaru setelah upload/hapus besar
+    - VACUUM jika rasio dead tuple melewati batas
+    - REINDEX CONCURRENTLY jika index jauh lebih besar dari estimasi idealnya
+    """
+
+    # Hanya tabel milik aplikasi yang boleh dirawat (nama tabel tidak bisa jadi parameter SQL)
+    TABLES = ("maintenance_records", "maintenance_records_archive", "fault_references")
+
+    def __init__(self, db_manager: DBManager, dead_tuple_ratio: float = 0.2, min_dead_tuples: int = 10000,
+                 index_bloat_ratio: float = 2.0, min_index_bytes: int = 10 * 1024 * 1024):
+        self.db_manager = db_manager
+        self.dead_tuple_ratio = dead_tuple_ratio
+        self.min_dead_tuples = min_dead_tuples
+        self.index_bloat_ratio = index_bloat_ratio
+        self.min_index_bytes = min_index_bytes
+
+    def _check_table(self, table: str) -> str:
+        if table not in self.TABLES:
+            raise ValueError(f"Tabel tidak dikenal untuk maintenance: {table}")
+        return table
+
+    def analyze(self, tables: Iterable[str] = TABLES) -> List[str]:
+        analyzed = []
+        for table in tables:
+            self.db_manager.execute_autocommit(f"ANALYZE {self._check_table(table)};")
+            analyzed.append(table)
+        logger.info(f"ANALYZE selesai: {', '.join(analyzed)}")
+        return analyzed
+
+    def table_stats(self) -> List[dict]:
+        query = """
+        SELECT relname AS table_name, n_live_tup, n_dead_tup,
+               pg_total_relation_size(relid) AS total_bytes,
+               last_vacuum, last_autovacuum, last_analyze, last_autoanalyze
+        FROM pg_stat_user_tables
+        WHERE relname = ANY(%s);
+        """
+        return self.db_manager.fetchall_dict(query, (list(self.TABLES),))
+
+    def index_stats(self) -> List[dict]:
+        """
+        Ukuran index dibandingkan estimasi ukuran idealnya:
+        jumlah tuple x (lebar key dari pg_stats + 16 byte header/item pointer) / fillfactor 0.9.
+        """
+        query = """
+        SELECT ic.relname AS index_name, c.relname AS table_name,
+               pg_relation_size(i.indexrelid) AS index_bytes,
+               GREATEST(c.reltuples, 0) AS tuples,
+               COALESCE((
+                   SELECT SUM(s.avg_width)
+                   FROM pg_attribute a
+                   JOIN pg_stats s ON s.tablename = c.relname AND s.attname = a.attname
+                                  AND s.schemaname = current_schema()
+                   WHERE a.attrelid = c.oid AND a.attnum = ANY(i.indkey)
+               ), 8) AS key_width
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indrelid
+        JOIN pg_class ic ON ic.oid = i.indexrelid
+        WHERE c.relname = ANY(%s);
+        """
+        rows = self.db_manager.fetchall_dict(query, (list(self.TABLES),))
+        for row in rows:
+            estimated = row['tuples'] * (float(row['key_width']) + 16) / 0.9
+            row['bloat_ratio'] = row['index_bytes'] / max(estimated, 8192)
+        return rows
+
+    def check_and_repair(self) -> List[str]:
+        """Cek bloat tabel & index, jalankan VACUUM/REINDEX bila perlu. Kembalikan daftar aksi."""
+        actions = []
+
+        for row in self.table_stats():
+            live, dead = row['n_live_tup'] or 0, row['n_dead_tup'] or 0
+            ratio = dead / (live + dead) if live + dead else 0
+            if dead >= self.min_dead_tuples and ratio >= self.dead_tuple_ratio:
+                table = self._check_table(row['table_name'])
+                try:
+                    self.db_manager.execute_autocommit(f"VACUUM (ANALYZE) {table};")
+                    actions.append(f"VACUUM {table}: {dead} dead tuple ({ratio:.0%})")
+                except Exception as e:
+                    logger.error(f"VACUUM {table} gagal: {e}")
+                    actions.append(f"VACUUM {table} GAGAL: {e}")
+
+        for row in self.index_stats():
+            if row['index_bytes'] >= self.min_index_bytes and row['bloat_ratio'] >= self.index_bloat_ratio:
+                self._check_table(row['table_name'])
+                index_name = row['index_name']
+                try:
+                    # Nama index berasal dari katalog, tetap di-quote sebagai identifier
+                    self.db_manager.execute_autocommit(f'REINDEX INDEX CONCURRENTLY "{index_name}";')
+                    actions.append(f"REINDEX {index_name}: {row['index_bytes'] // (1024 * 1024)} MB, bloat {row['bloat_ratio']:.1f}x")
+                except Exception as e:
+                    logger.error(f"REINDEX {index_name} gagal: {e}")
+                    actions.append(f"REINDEX {index_name} GAGAL: {e}")
+
+        if actions:
+            logger.info("Maintenance database: " + "; ".join(actions))
+        return actions
@@ -0,0 +1,194 @@
+# services/fast_chart_renderer.py
+import math
+import os
+import logging
+from typing import List, Tuple
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+# Warna & ukuran mengikuti default Matplotlib yang dipakai GraphService.render_chart
+BAR_COLOR = (255, 127, 80)            # 'coral'
+TEXT_COLOR = (0, 0, 0)
+SUBTITLE_COLOR = (128, 128, 128)      # 'gray'
+GRID_COLOR = (176, 176, 176, 178)     # '#b0b0b0', alpha 0.7
+FIGURE_SIZE = (12, 7)                 # inci, sama dengan Figure(figsize=(12, 7))
+
+
+class FastChartRenderer:
+    """
+    Renderer grafik batang fault per hari langsung dengan Pillow.
+
+    Isi sama dengan versi Matplotlib (bar, label nilai, label tanggal miring
+    45°, judul, subjudul abu-abu, grid putus-putus, font Cina dan watermark),
+    tetapi tanpa layout engine Matplotlib: posisi dihitung sekali dari ukuran
+    teks. Hasilnya gambar PIL yang di-encode oleh GraphService.
+    """
+
+    def __init__(self, font_path: str, watermark_files: List[Tuple[str, Tuple[float, float]]]):
+        self.font_path = font_path
+        self._fonts = {}
+        self._watermarks = []
+        for path, position in watermark_files:
+            if os.path.exists(path):
+                self._watermarks.append((Image.open(path).convert("RGBA"), position))
+        self._scaled_watermarks = {}
+
+    # ======================= ASET =======================
+    def _font(self, size_px: int) -> ImageFont.FreeTypeFont:
+        font = self._fonts.get(size_px)
+        if font is None:
+            try:
+                font = ImageFont.truetype(self.font_path, size_px)
+            except OSError:
+                logger.warning(f"Font {self.font_path} tidak bisa dibuka, pakai font bawaan Pillow")
+                font = ImageFont.load_default(size_px)
+            self._fonts[size_px] = font
+        return font
+
+    def _watermark(self, index: int, dpi: int, alpha: float = 0.15, scale: float = 0.33) -> Image.Image:
+        """Watermark diskalakan seperti OffsetImage(zoom=scale) dan transparansinya dikalikan alpha"""
+        key = (index, dpi)
+        image = self._scaled_watermarks.get(key)
+        if image is None:
+            source = self._watermarks[index][0]
+            zoom = scale * dpi / 72
+            image = source.resize((max(1, round(source.width * zoom)), max(1, round(source.height * zoom))),
+                                  Image.LANCZOS)
+            image.putalpha(image.getchannel("A").point(lambda value: round(value * alpha)))
+            self._scaled_watermarks[key] = image
+        return image
+
+    # ======================= HELPER =======================
+    @staticmethod
+    def _nice_ticks(top: float, max_ticks: int = 9) -> List[float]:
+        """Tick sumbu Y 0..top dengan langkah 1/2/2.5/5 x 10^n (seperti MaxNLocator)"""
+        if top <= 0:
+            return [0]
+        raw_step = top / max_ticks
+        magnitude = 10 ** math.floor(math.log10(raw_step))
+        step = magnitude * 10
+        for multiplier in (1, 2, 2.5, 5, 10):
+            if top / (multiplier * magnitude) <= max_ticks:
+                step = multiplier * magnitude
+                break
+        count = int(math.floor(top / step + 1e-9))
+        return [round(i * step, 10) for i in range(count + 1)]
+
+    @staticmethod
+    def _format_tick(value: float) -> str:
+        return str(int(value)) if float(value).is_integer() else f"{value:g}"
+
+    @staticmethod
+    def _text_size(draw: ImageDraw.ImageDraw, text: str, font) -> Tuple[int, int]:
+        left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+        return right - left, bottom - top
+
+    def _rotated_text(self, text: str, font, angle: float, fill=TEXT_COLOR) -> Image.Image:
+        left, top, right, bottom = font.getbbox(text)
+        label = Image.new("RGBA", (right - left + 2, bottom - top + 2), (0, 0, 0, 0))
+        ImageDraw.Draw(label).text((1 - left, 1 - top), text, font=font, fill=fill)
+        return label.rotate(angle, resample=Image.BICUBIC, expand=True)
+
+    @staticmethod
+    def _dashed_hline(draw, x0: int, x1: int, y: int, dash: int, gap: int, width: int, fill) -> None:
+        x = x0
+        while x < x1:
+            draw.line([(x, y), (min(x + dash, x1), y)], fill=fill, width=width)
+            x += dash + gap
+
+    # ======================= RENDER =======================
+    def render(self, spec, dpi: int = 100) -> Image.Image:
+        width, height = round(FIGURE_SIZE[0] * dpi), round(FIGURE_SIZE[1] * dpi)
+        pt = dpi / 72  # piksel per point
+        # fontproperties=font di Matplotlib membuat judul & label memakai ukuran default 10pt
+        tick_font = label_font = title_font = self._font(round(10 * pt))
+        bar_font = self._font(round(8 * pt))
+        pad = round(1.08 * 10 * pt)     # padding tight_layout
+        tick_length = round(3.5 * pt)
+        line_width = max(1, round(0.8 * pt))
+
+        image = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(image, "RGBA")
+
+        labels, values = spec.labels, spec.values
+        n = max(1, len(values))
+        max_val = max(values) if any(v > 0 for v in values) else 1
+        y_top = max_val + 2 if max_val < 5 else max_val * 1.15
+        text_offset = 0.1 if max_val < 5 else max_val * 0.015
+        ticks = self._nice_ticks(y_top)
+
+        # --- Teks judul & subjudul (ukuran menentukan tinggi area atas) ---
+        subtitle = (f"Crane: {spec.crane_id}, Total: {spec.total_faults} fault • "
+                    f"Rata-rata: {spec.average_per_day:.2f}/hari • "
+                    f"Fault terbanyak: '{spec.most_common_fault}' ({spec.most_common_count}x)")
+        title = spec.title
+        subtitle_top = round(height * 0.025)
+        subtitle_height = self._text_size(draw, subtitle, tick_font)[1]
+        title_box = draw.multiline_textbbox((0, 0), title, font=title_font, align="center")
+        title_height = title_box[3] - title_box[1]
+
+        # --- Label miring di bawah sumbu X ---
+        rotated = [self._rotated_text(label, tick_font, 45) for label in labels]
+        rotated_height = max((label.height for label in rotated), default=0)
+        xlabel_height = self._text_size(draw, spec.x_label, label_font)[1]
+        tick_label_width = max(self._text_size(draw, self._format_tick(t), tick_font)[0] for t in ticks)
+        ylabel_width = self._text_size(draw, "Jumlah Fault", label_font)[1]
+
+        left = pad + ylabel_width + pad + tick_label_width + tick_length + round(3.5 * pt)
+        right = width - pad
+        top = subtitle_top + subtitle_height + pad + title_height + round(6 * pt)
+        bottom = height - round(height * 0.03) - pad - xlabel_height - pad - rotated_height - tick_length
+        axes_width, axes_height = right - left, bottom - top
+
+        # Koordinat data -> piksel (bar kategori di 0..n-1, lebar 0.8, margin 5%)
+        data_min, data_max = -0.4, n - 1 + 0.4
+        margin = 0.05 * (data_max - data_min)
+        x_min, x_max = data_min - margin, data_max + margin
+
+        def to_x(value):
+            return left + (value - x_min) / (x_max - x_min) * axes_width
+
+        def to_y(value):
+            return bottom - value / y_top * axes_height
+
+        # --- Bar & label nilai ---
+        for i, value in enumerate(values):
+            if value > 0:
+                draw.rectangle([round(to_x(i - 0.4)), round(to_y(value)), round(to_x(i + 0.4)) - 1, bottom],
+                               fill=BAR_COLOR)
+                draw.text((to_x(i), to_y(value + text_offset)), str(value), font=bar_font, fill=TEXT_COLOR, anchor="md")
+
+        # --- Grid Y (di atas bar, seperti axisbelow='line'), tick & label sumbu ---
+        dash, gap = max(2, round(3.7 * 0.8 * pt)), max(1, round(1.6 * 0.8 * pt))
+        for tick in ticks:
+            y = round(to_y(tick))
+            self._dashed_hline(draw, left, right, y, dash, gap, line_width, GRID_COLOR)
+            draw.line([(left - tick_length, y), (left, y)], fill=TEXT_COLOR, width=line_width)
+            draw.text((left - tick_length - round(3.5 * pt), y), self._format_tick(tick),
+                      font=tick_font, fill=TEXT_COLOR, anchor="rm")
+        draw.rectangle([left, top, right, bottom], outline=TEXT_COLOR, width=line_width)
+
+        label_top = bottom + tick_length + round(3.5 * pt)
+        for i, label in enumerate(rotated):
+            x = round(to_x(i))
+            draw.line([(x, bottom), (x, bottom + tick_length)], fill=TEXT_COLOR, width=line_width)
+            # rotation=45, ha='right': sisi kanan kotak label tepat di bawah tick
+            image.paste(label, (x - label.width, label_top), label)
+
+        draw.text(((left + right) / 2, height - round(height * 0.03) - pad), spec.x_label,
+                  font=label_font, fill=TEXT_COLOR, anchor="md")
+        ylabel = self._rotated_text("Jumlah Fault", label_font, 90)
+        image.paste(ylabel, (pad, round((top + bottom - ylabel.height) / 2)), ylabel)
+
+        # --- Judul & subjudul ---
+        draw.multiline_text(((left + right) / 2, top - round(6 * pt)), title, font=title_font,
+                            fill=TEXT_COLOR, anchor="md", align="center")
+        draw.text((width / 2, subtitle_top), subtitle, font=tick_font, fill=SUBTITLE_COLOR, anchor="mt")
+
+        # --- Watermark (paling atas, di tengah axes) ---
+        for index, (_, (fx, fy)) in enumerate(self._watermarks):
+            mark = self._watermark(index, dpi)
+            cx, cy = left + fx * axes_width, bottom - fy * axes_height
+            image.paste(mark, (round(cx - mark.width / 2), round(cy - mark.height / 2)), mark)
+        return image
@@ -0,0 +1,162 @@
+# services/fault_index.py
+import bisect
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+from database.models import FaultReference
+from services.change_notifier import DataChange
+
+logger = logging.getLogger(__name__)
+
+
+class FaultSearchIndex:
+    """
+    Index pencarian fault di memori (kode, nama, id) dengan hasil berperingkat:
+
+    0. persis   : id, kode atau nama sama persis (tanpa beda huruf besar/kecil)
+    1. prefix   : kode atau nama diawali keyword
+    2. substring: keyword ada di kode / nama / id (sama dengan ILIKE '%kw%' lama)
+    3. fuzzy    : kemiripan trigram >= MIN_SIMILARITY (salah ketik)
+
+    fault_references kecil (ratusan baris), jadi index dibangun ulang penuh
+    saat ChangeNotifier melaporkan perubahan fault.
+    """
+
+    MIN_SIMILARITY = 0.3
+
+    def __init__(self, maintenance_service):
+        self.maintenance_service = maintenance_service
+        self._state = None
+        self._lock = threading.Lock()
+        maintenance_service.changes.subscribe(self._on_data_change)
+
+    # ======================= BANGUN INDEX =======================
+    @staticmethod
+    def _normalize(text) -> str:
+        return " ".join(str(text or "").lower().split())
+
+    @staticmethod
+    def _trigrams(text: str) -> set:
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def load(self) -> None:
+        rows = self.maintenance_service.db_manager.fetchall(
+            "SELECT fault_id, code_fault, fault_name FROM fault_references ORDER BY fault_id;"
+        )
+        by_id: Dict[int, FaultReference] = {}
+        exact = defaultdict(set)    # teks persis -> fault_id
+        prefix_keys = []            # (teks, fault_id) urut, untuk bisect prefix
+        haystack = {}               # fault_id -> "kode nama id" untuk substring
+        trigram_index = defaultdict(set)
+        trigram_sets = {}
+
+        for fault_id, code_fault, fault_name in rows:
+            by_id[fault_id] = FaultReference(fault_id=fault_id, code_fault=code_fault, fault_name=fault_name)
+            code, name = self._normalize(code_fault), self._normalize(fault_name)
+            for key in (code, name, str(fault_id)):
+                if key:
+                    exact[key].add(fault_id)
+            for key in (code, name):
+                if key:
+                    prefix_keys.append((key, fault_id))
+            haystack[fault_id] = f"{code}\n{name}\n{fault_id}"
+            grams = self._trigrams(f"{code} {name}".strip())
+            trigram_sets[fault_id] = grams
+            for gram in grams:
+                trigram_index[gram].add(fault_id)
+
+        prefix_keys.sort()
+        state = {
+            "by_id": by_id,
+            "exact": dict(exact),
+            "prefix_keys": prefix_keys,
+            "haystack": haystack,
+            "trigram_index": dict(trigram_index),
+            "trigram_sets": trigram_sets,
+        }
+        with self._lock:
+            self._state = state
+        logger.info(f"Index fault dimuat: {len(by_id)} fault")
+
+    def _get_state(self):
+        if self._state is None:
+            self.load()
+        return self._state
+
+    def _on_data_change(self, change: DataChange) -> None:
+        if self._state is None or change.scope not in ("faults", "all"):
+            return
+        try:
+            self.load()
+        except Exception as e:
+            logger.error(f"Gagal memuat ulang index fault: {e}")
+            with self._lock:
+                self._state = None  # muat ulang saat pencarian berikutnya
+
+    # ======================= CARI =======================
+    def get(self, fault_id: int) -> Optional[FaultReference]:
+        return self._get_state()["by_id"].get(int(fault_id))
+
+    def _ranked(self, keyword: str, fuzzy: bool) -> List[tuple]:
+        """[(peringkat, -skor, fault_id)] untuk semua fault yang cocok"""
+        state = self._get_state()
+        kw = self._normalize(keyword)
+        if not kw:
+            return []
+        ranks = {}
+
+        def offer(fault_id, rank, score=1.0):
+            current = ranks.get(fault_id)
+            if current is None or (rank, -score) < current:
+                ranks[fault_id] = (rank, -score)
+
+        for fault_id in state["exact"].get(kw, ()):
+            offer(fault_id, 0)
+
+        keys = state["prefix_keys"]
+        position = bisect.bisect_left(keys, (kw, -1))
+        while position < len(keys) and keys[position][0].startswith(kw):
+            key, fault_id = keys[position]
+            offer(fault_id, 1, len(kw) / len(key))
+            position += 1
+
+        for fault_id, text in state["haystack"].items():
+            if fault_id not in ranks and kw in text:
+                offer(fault_id, 2)
+
+        if fuzzy:
+            query_grams = self._trigrams(kw)
+            shared = defaultdict(int)
+            for gram in query_grams:
+                for fault_id in state["trigram_index"].get(gram, ()):
+                    shared[fault_id] += 1
+            for fault_id, count in shared.items():
+                if fault_id in ranks:
+                    continue
+                grams = state["trigram_sets"][fault_id]
+                similarity = count / (len(query_grams) + len(grams) - count)
+                if similarity >= self.MIN_SIMILARITY:
+                    offer(fault_id, 3, similarity)
+
+        return sorted((rank, score, fault_id) for fault_id, (rank, score) in ranks.items())
+
+    def search(self, keyword: str, limit: int = 50, fuzzy: bool = True) -> List[FaultReference]:
+        """Fault yang cocok dengan keyword, yang paling cocok di urutan pertama"""
+        by_id = self._get_state()["by_id"]
+        return [by_id[fault_id] for _, _, fault_id in self._ranked(keyword, fuzzy)[:limit]]
+
+    def best_match(self, keyword: str) -> Optional[FaultReference]:
+        """
+        Satu fault yang jelas dimaksud keyword, atau None jika ambigu / tidak ada:
+        satu-satunya yang cocok persis, atau satu-satunya yang cocok tanpa fuzzy.
+        """
+        ranked = self._ranked(keyword, fuzzy=False)
+        by_id = self._get_state()["by_id"]
+        exact = [fault_id for rank, _, fault_id in ranked if rank == 0]
+        if len(exact) == 1:
+            return by_id[exact[0]]
+        if len(ranked) == 1:
+            return by_id[ranked[0][2]]
+        return None
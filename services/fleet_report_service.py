@@ -0,0 +1,237 @@
+# services/fleet_report_service.py
+import io
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Optional
+from matplotlib.font_manager import findfont
+from PIL import Image, ImageDraw, ImageFont
+from services.graph_service import ChartSpec, GraphService, HeatmapSpec, RENDER_PRESETS, choose_granularity
+
+logger = logging.getLogger(__name__)
+
+# Ukuran halaman ringkasan = ukuran grafik preset 'report' (12x7 inci) agar semua halaman PDF seragam
+PAGE_SIZE_INCHES = (12, 7)
+SUMMARY_ROWS_PER_PAGE = 25
+HEADER_FILL = (255, 127, 80)      # 'coral', sama dengan warna bar grafik
+STRIPE_FILL = (245, 245, 245)
+# Kualitas JPEG halaman PDF (teks grafik tetap tajam di 90)
+JPEG_QUALITY = 90
+# Heatmap mode fault: hanya fault terbanyak di seluruh armada yang dijadikan kolom
+HEATMAP_MAX_FAULTS = 30
+
+
+class FleetReport:
+    """Hasil agregasi laporan armada: ringkasan per crane + isi grafik per crane"""
+
+    __slots__ = ("start_date", "end_date", "granularity", "rows", "specs")
+
+    def __init__(self, start_date: str, end_date: str, granularity: str, rows: List[dict], specs: List[ChartSpec]):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.granularity = granularity
+        self.rows = rows
+        self.specs = specs
+
+    @property
+    def total_faults(self) -> int:
+        return sum(row["total"] for row in self.rows)
+
+
+class FleetReportService:
+    """
+    Laporan PDF seluruh armada (/laporan): satu halaman ringkasan (tabel per
+    crane) dan satu halaman grafik per crane.
+
+    Datanya hanya dua query agregat untuk semua crane sekaligus:
+    - RecordQuery.crane_bucket_counts() -> jumlah fault (dedup) per crane per hari/bucket
+    - RecordQuery.group_counts("crane_id", "fault_ref_name") -> fault teratas per crane
+    Render grafik dikerjakan pemanggil (pool proses), lalu build_pdf()
+    menggabungkan semua halaman menjadi satu dokumen.
+    """
+
+    def __init__(self, maintenance_service, graph_service: GraphService, top_faults: int = 3):
+        self.maintenance_service = maintenance_service
+        self.graph_service = graph_service
+        self.top_faults = top_faults
+        self.font_path = findfont(graph_service.chinese_font)
+        self._fonts = {}
+
+    # ======================= DATA =======================
+    def collect(self, start_date: str, end_date: str, crane_ids="all") -> Optional[FleetReport]:
+        """Agregasi semua crane untuk rentang ini; None jika tidak ada fault"""
+        query = self.maintenance_service.query(start_date, end_date, crane_ids)
+        granularity = choose_granularity(start_date, end_date)
+
+        series = defaultdict(dict)
+        for crane_id, bucket, count in query.crane_bucket_counts(granularity, dedup_minutes=1):
+            if crane_id is not None:
+                series[crane_id][bucket] = int(count)
+        if not series:
+            return None
+
+        faults = defaultdict(list)
+        for row in query.group_counts("crane_id", "fault_ref_name"):
+            # Sudah urut jumlah terbanyak, cukup ambil beberapa yang pertama per crane
+            if row["crane_id"] in series and len(faults[row["crane_id"]]) < self.top_faults:
+                faults[row["crane_id"]].append((row["fault_ref_name"] or "-", int(row["jumlah"])))
+
+        rows, specs = [], []
+        for crane_id in sorted(series):
+            counts = series[crane_id]
+            top = faults.get(crane_id) or [("-", 0)]
+            spec = self.graph_service.build_series_spec(
+                crane_id, start_date, end_date, granularity, counts, top[0][0], top[0][1]
+            )
+            peak_bucket = max(counts, key=counts.get)
+            rows.append({
+                "crane_id": crane_id,
+                "total": spec.total_faults,
+                "average": spec.average_per_day,
+                "peak": (peak_bucket, counts[peak_bucket]),
+                "top_faults": top,
+            })
+            specs.append(spec)
+        logger.info(f"Laporan armada {start_date} - {end_date}: {len(rows)} crane, per {granularity}")
+        return FleetReport(start_date, end_date, granularity, rows, specs)
+
+    def heatmap(self, start_date: str, end_date: str, mode: str = "day", crane_ids="all") -> Optional[HeatmapSpec]:
+        """
+        Heatmap armada dari SATU query agregat: crane x hari (minggu/bulan untuk
+        rentang panjang, lihat choose_granularity) atau crane x fault
+        (HEATMAP_MAX_FAULTS fault terbanyak). None jika tidak ada fault.
+        """
+        if mode not in HeatmapSpec.MODES:
+            raise ValueError(f"Mode heatmap tidak dikenal: {mode}")
+        query = self.maintenance_service.query(start_date, end_date, crane_ids)
+        granularity = choose_granularity(start_date, end_date)
+
+        cells = defaultdict(dict)
+        if mode == "day":
+            for crane_id, bucket, count in query.crane_bucket_counts(granularity, dedup_minutes=1):
+                if crane_id is not None:
+                    cells[crane_id][bucket] = int(count)
+            starts = self.graph_service._bucket_starts(start_date, end_date, granularity)
+            keys = starts
+            columns = [self.graph_service._bucket_label(start, granularity) for start in starts]
+        else:
+            totals = defaultdict(int)
+            for crane_id, fault, count in query.crane_fault_counts(dedup_minutes=1):
+                if crane_id is not None:
+                    cells[crane_id][fault or "-"] = int(count)
+                    totals[fault or "-"] += int(count)
+            keys = sorted(totals, key=lambda fault: (-totals[fault], fault))[:HEATMAP_MAX_FAULTS]
+            columns = keys
+        if not cells:
+            return None
+
+        cranes = sorted(cells)
+        values = [[cells[crane].get(key, 0) for key in keys] for crane in cranes]
+        return HeatmapSpec(
+            mode, start_date, end_date, cranes, columns, values, granularity,
+            total_faults=sum(sum(row.values()) for row in cells.values()),
+        )
+
+    # ======================= HALAMAN RINGKASAN =======================
+    def _font(self, size_px: int):
+        font = self._fonts.get(size_px)
+        if font is None:
+            try:
+                font = ImageFont.truetype(self.font_path, size_px)
+            except OSError:
+                font = ImageFont.load_default(size_px)
+            self._fonts[size_px] = font
+        return font
+
+    @staticmethod
+    def _fit(draw: ImageDraw.ImageDraw, text: str, font, width: int) -> str:
+        """Potong teks dengan '…' agar muat di kolom"""
+        if draw.textlength(text, font=font) <= width:
+            return text
+        while text and draw.textlength(text + "…", font=font) > width:
+            text = text[:-1]
+        return text + "…"
+
+    def summary_pages(self, report: FleetReport, dpi: int) -> List[Image.Image]:
+        """Tabel ringkasan per crane, `SUMMARY_ROWS_PER_PAGE` crane per halaman"""
+        width, height = round(PAGE_SIZE_INCHES[0] * dpi), round(PAGE_SIZE_INCHES[1] * dpi)
+        pt = dpi / 72
+        title_font, text_font, small_font = self._font(round(16 * pt)), self._font(round(9 * pt)), self._font(round(8 * pt))
+        margin = round(0.4 * dpi)
+        row_height = round(14 * pt)
+        peak_label = "Hari" if report.granularity == "day" else report.specs[0].x_label
+        # (judul kolom, lebar relatif)
+        columns = [("Crane", 0.08), ("Total fault", 0.11), ("Rata-rata/hari", 0.12),
+                   (f"{peak_label} terbanyak", 0.17), (f"{self.top_faults} fault teratas (jumlah event)", 0.52)]
+        table_width = width - 2 * margin
+        xs = [margin]
+        for _, share in columns:
+            xs.append(xs[-1] + round(share * table_width))
+
+        chunks = [report.rows[i:i + SUMMARY_ROWS_PER_PAGE] for i in range(0, len(report.rows), SUMMARY_ROWS_PER_PAGE)]
+        pages = []
+        for number, chunk in enumerate(chunks, start=1):
+            image = Image.new("RGB", (width, height), "white")
+            draw = ImageDraw.Draw(image)
+            page = f" ({number}/{len(chunks)})" if len(chunks) > 1 else ""
+            draw.text((margin, margin), f"Laporan Fault Armada{page}", font=title_font, fill=(0, 0, 0))
+            draw.text(
+                (margin, margin + round(22 * pt)),
+                f"Periode {report.start_date} s/d {report.end_date} • {len(report.rows)} crane • "
+                f"Total {report.total_faults} fault (dedup 1 menit) • "
+                f"Dibuat {datetime.now().strftime('%d-%m-%Y %H:%M')}",
+                font=small_font, fill=(128, 128, 128),
+            )
+
+            y = margin + round(40 * pt)
+            draw.rectangle([margin, y, width - margin, y + row_height], fill=HEADER_FILL)
+            for (title, _), x in zip(columns, xs):
+                draw.text((x + round(3 * pt), y + row_height / 2), title, font=text_font, fill=(0, 0, 0), anchor="lm")
+            y += row_height
+
+            for index, row in enumerate(chunk):
+                if index % 2:
+                    draw.rectangle([margin, y, width - margin, y + row_height], fill=STRIPE_FILL)
+                peak_bucket, peak_count = row["peak"]
+                cells = [
+                    str(row["crane_id"]),
+                    str(row["total"]),
+                    f"{row['average']:.2f}",
+                    f"{self.graph_service._bucket_label(peak_bucket, report.granularity)} ({peak_count})",
+                ]
+                # Kolom fault dibagi rata; nama dipotong, jumlahnya selalu terlihat
+                fault_width = (xs[-1] - xs[-2]) // self.top_faults - round(6 * pt)
+                cells.append("  ".join(
+                    f"{self._fit(draw, name, text_font, fault_width - round(draw.textlength(f' ({count})', font=text_font)))} ({count})"
+                    for name, count in row["top_faults"]
+                ))
+                for cell, x, x_next in zip(cells, xs, xs[1:]):
+                    text = self._fit(draw, cell, text_font, x_next - x - round(6 * pt))
+                    draw.text((x + round(3 * pt), y + row_height / 2), text, font=text_font, fill=(0, 0, 0), anchor="lm")
+                y += row_height
+            draw.line([(margin, y), (width - margin, y)], fill=(176, 176, 176), width=max(1, round(0.8 * pt)))
+            pages.append(image)
+        return pages
+
+    # ======================= PDF =======================
+    def build_pdf(self, report: FleetReport, charts: List[Optional[bytes]], preset: str = "report") -> bytes:
+        """
+        Gabungkan halaman ringkasan + grafik per crane (bytes hasil render, urutan
+        sama dengan report.specs) menjadi satu PDF. Worker mengirim PNG palet
+        (lossless, kecil); di PDF setiap halaman disimpan sekali sebagai JPEG,
+        karena Pillow menulis gambar palet ke PDF tanpa kompresi (hex).
+        """
+        dpi = RENDER_PRESETS[preset]["dpi"]
+        pages = self.summary_pages(report, dpi)
+        for spec, chart in zip(report.specs, charts):
+            if not chart:
+                logger.warning(f"Grafik crane {spec.crane_id} gagal dirender, halaman dilewati")
+                continue
+            pages.append(Image.open(io.BytesIO(chart)).convert("RGB"))
+
+        output = io.BytesIO()
+        pages[0].save(
+            output, format="PDF", save_all=True, append_images=pages[1:], resolution=dpi, quality=JPEG_QUALITY,
+            title=f"Laporan Fault Armada {report.start_date} - {report.end_date}",
+        )
+        return output.getvalue()
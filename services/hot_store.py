@@ -0,0 +1,133 @@
+# services/hot_store.py
+import logging
+import threading
+import time
+from datetime import date, timedelta
+from typing import Optional
+import numpy as np
+from database.record_batch import RecordBatch
+from services.change_notifier import DataChange
+
+logger = logging.getLogger(__name__)
+
+
+class HotWindowStore:
+    """
+    Event N hari terakhir di memori proses, dalam bentuk RecordBatch (kolom NumPy).
+
+    Sebagian besar permintaan hanya untuk bulan ini / bulan lalu. Query yang
+    rentang tanggalnya seluruhnya berada di dalam jendela dijawab dari memori
+    (count, daily_series, batch) tanpa round trip ke Postgres.
+
+    Isi store diperbarui per potongan (crane x rentang tanggal) setiap kali
+    ChangeNotifier melaporkan upload/hapus, baik dari proses ini maupun proses lain.
+    """
+
+    FAR_FUTURE = "9999-12-31"
+
+    def __init__(self, maintenance_service, days: int):
+        if days <= 0:
+            raise ValueError("Jendela hot store minimal 1 hari")
+        self.maintenance_service = maintenance_service
+        self.days = days
+        self._batch: Optional[RecordBatch] = None
+        self._window_start: Optional[str] = None
+        self._lock = threading.Lock()
+        self.loaded_at = None
+        self.hits = 0
+        maintenance_service.changes.subscribe(self._on_data_change)
+
+    def _current_window_start(self) -> str:
+        return (date.today() - timedelta(days=self.days - 1)).isoformat()
+
+    def load(self) -> None:
+        started = time.monotonic()
+        window_start = self._current_window_start()
+        batch = self.maintenance_service.query(window_start, self.FAR_FUTURE).batch(use_hot_store=False, use_month_cache=False)
+        with self._lock:
+            self._batch, self._window_start = batch, window_start
+            self.loaded_at = time.time()
+        logger.info(f"Hot store dimuat: {len(batch)} event sejak {window_start} "
+                    f"({batch.nbytes / 1024 / 1024:.1f} MB, {time.monotonic() - started:.1f} detik)")
+
+    @property
+    def loaded(self) -> bool:
+        return self._batch is not None
+
+    def _roll_window(self) -> None:
+        """Buang hari yang sudah keluar dari jendela (saat tanggal berganti)"""
+        window_start = self._current_window_start()
+        if self._window_start is None or window_start <= self._window_start:
+            return
+        with self._lock:
+            batch = self._batch
+            self._batch = batch.take(batch.mask(start_date=window_start))
+            self._window_start = window_start
+
+    # ======================= BACA =======================
+    def covers(self, query) -> bool:
+        """Query bisa dijawab dari memori: rentangnya di dalam jendela dan tanpa filter nama fault mentah"""
+        if not self.loaded or query.fault_name is not None:
+            return False
+        self._roll_window()
+        return query.start_date >= self._window_start
+
+    def select(self, query) -> Optional[RecordBatch]:
+        """Subset batch untuk filter query, atau None jika query di luar jendela"""
+        if not self.covers(query):
+            return None
+        batch = self._batch
+        in_ranges = np.zeros(len(batch), dtype=bool)
+        for start_date, end_date in query.date_ranges:
+            in_ranges |= batch.mask(start_date, end_date)
+        mask = in_ranges & batch.mask(crane_ids=query.crane_ids, fault_ids=query.fault_ids)
+        self.hits += 1
+        return batch.take(mask)
+
+    def memory_report(self) -> dict:
+        batch = self._batch
+        return {
+            "days": self.days,
+            "window_start": self._window_start,
+            "rows": len(batch) if batch is not None else 0,
+            "bytes": batch.nbytes if batch is not None else 0,
+            "faults": len(batch.fault_names) if batch is not None else 0,
+            "hits": self.hits,
+        }
+
+    # ======================= UPDATE INKREMENTAL =======================
+    def _on_data_change(self, change: DataChange) -> None:
+        if self.loaded_at is None:
+            return  # belum pernah dimuat
+        try:
+            if change.scope == "all" or not self.loaded:
+                self.load()
+            elif change.scope == "faults":
+                self._refresh_fault_names()
+            elif change.scope == "records":
+                self._reload_slice(change)
+        except Exception as e:
+            # Store yang mungkin basi lebih berbahaya daripada tidak ada store
+            logger.error(f"Gagal memperbarui hot store ({change}): {e}; hot store dinonaktifkan sampai dimuat ulang")
+            with self._lock:
+                self._batch = None
+
+    def _refresh_fault_names(self) -> None:
+        with self._lock:
+            batch = self._batch
+            batch.fault_names = self.maintenance_service.get_fault_names(np.unique(batch.fault_ids))
+
+    def _reload_slice(self, change: DataChange) -> None:
+        """Ganti event untuk crane & rentang tanggal yang berubah dengan isi terbaru dari database"""
+        self._roll_window()
+        start_date = max(change.start_date or self._window_start, self._window_start)
+        end_date = change.end_date or self.FAR_FUTURE
+        if start_date > end_date:
+            return  # perubahan sepenuhnya di luar jendela
+        fresh = self.maintenance_service.query(start_date, end_date, change.crane_ids or "all").batch(use_hot_store=False, use_month_cache=False)
+        with self._lock:
+            batch = self._batch
+            stale = batch.mask(start_date, end_date, crane_ids=change.crane_ids)
+            self._batch = RecordBatch.concat([batch.take(~stale), fresh])
+        logger.info(f"Hot store diperbarui: {change.crane_ids or 'semua crane'} {start_date} s/d {end_date} "
+                    f"({int(stale.sum())} -> {len(fresh)} event)")
@@ -1,10 +1,17 @@
 # services/maintenance_service.py
-from database.db_manager import DBManager
+from database.db_manager import DBManager, Transaction
 from database.models import MaintenanceRecord, FaultReference
+from services.record_query import RecordQuery, normalize_ids
+from services.archive_service import ArchiveService
+from services.change_notifier import ChangeNotifier, DataChange
+from services.hot_store import HotWindowStore
+from services.month_cache import MonthCache
+from services.fault_index import FaultSearchIndex
 from datetime import datetime, timedelta, date
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import logging
 import re
+import sys
 import csv
 import calendar
 
@@ -13,6 +20,18 @@ logger = logging.getLogger(__name__)
 class MaintenanceService:
     def __init__(self, db_manager: DBManager):
         self.db_manager = db_manager
+        # Notifikasi perubahan data antar proses; listener dijalankan lewat self.changes.start()
+        self.changes = ChangeNotifier(db_manager)
+        self.archive = ArchiveService(db_manager, self.changes)
+        # Jendela event terbaru di memori (opsional, lihat enable_hot_store)
+        self.hot_store = None
+        # File cache kolom per crane per bulan (opsional, lihat enable_month_cache)
+        self.month_cache = None
+        # Pencarian fault di memori, dimuat saat pertama dipakai
+        self.fault_index = FaultSearchIndex(self)
+        # Satu FaultReference bersama per fault (lihat _intern_fault_reference)
+        self._fault_refs = {}
+        self.changes.subscribe(self._on_data_change)
         self.create_table()
         
     def create_table(self):
@@ -38,58 +57,208 @@ class MaintenanceService:
         );
         """
         self.db_manager.execute(query_faults)
-        
-    def add_record(self, record: MaintenanceRecord):
+
+        # Index untuk filter rentang tanggal (+ crane) yang dipakai RecordQuery
+        self.db_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_maintenance_records_tanggal ON maintenance_records (tanggal, waktu);"
+        )
+        self.db_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_maintenance_records_crane_tanggal ON maintenance_records (crane_id, tanggal);"
+        )
+
+        # Versi data per (crane, bulan): naik setiap kali data di bulan itu berubah.
+        # Dipakai cache untuk memvalidasi isinya, dan dikirim di payload NOTIFY.
+        self.db_manager.execute("CREATE SEQUENCE IF NOT EXISTS data_version_seq;")
+        query_versions = """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            crane_id INTEGER NOT NULL,
+            bulan DATE NOT NULL,
+            version BIGINT NOT NULL,
+            PRIMARY KEY (crane_id, bulan)
+        );
+        """
+        self.db_manager.execute(query_versions)
+
+        self.archive.create_table()
+
+    # ======================= HELPER TRANSAKSI =======================
+    # Semua helper di bawah memakai `tx` jika diberikan (statement ikut
+    # commit milik pemanggil), atau DBManager biasa (autocommit per statement).
+    def _execute(self, query: str, params=(), tx: Optional[Transaction] = None):
+        if tx is not None:
+            return tx.execute(query, params)
+        return self.db_manager.execute(query, params)
+
+    def _fetchone(self, query: str, params=(), tx: Optional[Transaction] = None):
+        if tx is not None:
+            return tx.fetchone(query, params)
+        return self.db_manager.fetchone(query, params)
+
+    def _fetchall_dict(self, query: str, params=(), tx: Optional[Transaction] = None) -> List[dict]:
+        if tx is not None:
+            return tx.fetchall_dict(query, params)
+        return self.db_manager.fetchall_dict(query, params)
+
+    def add_record(self, record: MaintenanceRecord, tx: Optional[Transaction] = None):
         query = """
         INSERT INTO maintenance_records (tanggal, waktu, act, fault_name, crane_id, fault_id)
         VALUES (%s, %s, %s, %s, %s, %s);
         """
-        self.db_manager.execute(query, record.to_tuple())
+        self._execute(query, record.to_tuple(), tx)
+
+    def add_records(self, records: List[MaintenanceRecord], tx: Optional[Transaction] = None) -> int:
+        """Insert banyak record sekaligus (execute_values) dalam satu commit"""
+        if not records:
+            return 0
+        if tx is None:
+            with self.db_manager.transaction() as own_tx:
+                return self.add_records(records, own_tx)
+
+        query = """
+        INSERT INTO maintenance_records (tanggal, waktu, act, fault_name, crane_id, fault_id)
+        VALUES %s;
+        """
+        tx.execute_values(query, [record.to_tuple() for record in records])
+
+        crane_ids = sorted({int(record.crane_id) for record in records if record.crane_id is not None})
+        dates = [str(record.tanggal)[:10] for record in records if record.tanggal]
+        if crane_ids and dates:
+            self.mark_records_changed(tx, crane_ids, min(dates), max(dates))
+        return len(records)
     
+    # ======================= VERSI DATA =======================
+    def mark_records_changed(self, tx: Transaction, crane_ids: Optional[List[int]],
+                             start_date: str, end_date: str) -> int:
+        """
+        Naikkan versi data untuk crane (None = semua) dan bulan di rentang
+        tanggal, lalu kirim NOTIFY yang terkirim saat `tx` di-commit.
+        """
+        version = tx.fetchone("SELECT nextval('data_version_seq');")[0]
+        if crane_ids is None:
+            # Crane tidak diketahui: semua crane yang punya versi atau data di rentang.
+            # Baris baru perlu dibuat juga, karena bulan tanpa baris dibaca cache sebagai versi 0
+            query = """
+            INSERT INTO data_versions (crane_id, bulan, version)
+            SELECT c.crane_id, m::date, %s
+            FROM (
+                SELECT crane_id FROM data_versions
+                WHERE bulan BETWEEN date_trunc('month', %s::date) AND %s::date
+                UNION
+                SELECT crane_id FROM maintenance_records WHERE tanggal BETWEEN %s AND %s
+                UNION
+                SELECT crane_id FROM maintenance_records_archive
+                WHERE bulan BETWEEN date_trunc('month', %s::date) AND %s::date
+            ) AS c,
+                 generate_series(date_trunc('month', %s::date), %s::date, INTERVAL '1 month') AS m
+            WHERE c.crane_id IS NOT NULL
+            ON CONFLICT (crane_id, bulan) DO UPDATE SET version = EXCLUDED.version;
+            """
+            tx.execute(query, (version,) + (start_date, end_date) * 4)
+        else:
+            query = """
+            INSERT INTO data_versions (crane_id, bulan, version)
+            SELECT c, m::date, %s
+            FROM unnest(%s::INTEGER[]) AS c,
+                 generate_series(date_trunc('month', %s::date), %s::date, INTERVAL '1 month') AS m
+            ON CONFLICT (crane_id, bulan) DO UPDATE SET version = EXCLUDED.version;
+            """
+            tx.execute(query, (version, list(crane_ids), start_date, end_date))
+        self.changes.publish(tx, DataChange("records", crane_ids, start_date, end_date, version))
+        return version
+
+    def mark_faults_changed(self, tx: Transaction) -> None:
+        """fault_references berubah (fault baru dari upload)"""
+        version = tx.fetchone("SELECT nextval('data_version_seq');")[0]
+        self.changes.publish(tx, DataChange("faults", version=version))
+
+    def get_data_version(self, crane_ids, start_date: str, end_date: str) -> int:
+        """Versi tertinggi untuk crane & rentang tanggal (0 jika belum pernah ditulis)"""
+        crane_ids = normalize_ids(crane_ids)
+        query = """
+        SELECT COALESCE(MAX(version), 0) FROM data_versions
+        WHERE bulan BETWEEN date_trunc('month', %s::date) AND %s::date
+        """
+        params = [start_date, end_date]
+        if crane_ids is not None:
+            query += " AND crane_id = ANY(%s)"
+            params.append(crane_ids)
+        return self.db_manager.fetchone(query, tuple(params))[0]
+
     def get_all_records(self):
         query = "SELECT * FROM maintenance_records;"
         return self.db_manager.fetchall_dict(query)
 
-    # ======================= METODE BARU UNTUK BULK OPERATIONS =======================
-    def get_all_records_by_date_range(self, start_date: str, end_date: str) -> List[MaintenanceRecord]:
-        """Mengambil semua record dalam rentang tanggal tertentu"""
-        query = """
-        SELECT mr.*, fr.code_fault, fr.fault_name AS fault_ref_name
-        FROM maintenance_records mr
-        LEFT JOIN fault_references fr ON mr.fault_id = fr.fault_id
-        WHERE mr.tanggal BETWEEN %s AND %s;
+    # ======================= QUERY LAZY =======================
+    def filter(self, date_ranges: List[Tuple[str, str]], crane_ids=None, fault_ids=None) -> RecordQuery:
         """
-        rows = self.db_manager.fetchall_dict(query, (start_date, end_date))
-        return [self._row_to_maintenance_record(row) for row in rows]
-
-    def get_all_records_by_date_and_fault(self, start_date: str, end_date: str, fault_id: int) -> List[MaintenanceRecord]:
-        """Mengambil semua record dalam rentang tanggal untuk fault tertentu"""
-        query = """
-        SELECT mr.*, fr.code_fault, fr.fault_name AS fault_ref_name
-        FROM maintenance_records mr
-        LEFT JOIN fault_references fr ON mr.fault_id = fr.fault_id
-        WHERE mr.tanggal BETWEEN %s AND %s AND mr.fault_id = %s;
+        Satu-satunya pintu untuk filter record: kumpulan crane, kumpulan fault
+        dan satu atau beberapa rentang tanggal ('YYYY-MM-DD', 'YYYY-MM-DD').
+        crane_ids/fault_ids boleh None/'all', satu id, "1,2,5" atau list id.
+        Belum ada query yang dijalankan sampai count()/sample()/iter()/... dipanggil.
         """
-        rows = self.db_manager.fetchall_dict(query, (start_date, end_date, fault_id))
-        return [self._row_to_maintenance_record(row) for row in rows]
+        return RecordQuery(self, date_ranges, crane_ids=crane_ids, fault_ids=fault_ids)
 
-    def get_all_records_by_date_and_crane(self, start_date: str, end_date: str, crane_id: int) -> List[MaintenanceRecord]:
-        """Mengambil semua record dalam rentang tanggal untuk crane tertentu"""
-        query = """
-        SELECT mr.*, fr.code_fault, fr.fault_name AS fault_ref_name
-        FROM maintenance_records mr
-        LEFT JOIN fault_references fr ON mr.fault_id = fr.fault_id
-        WHERE mr.tanggal BETWEEN %s AND %s AND mr.crane_id = %s;
+    def query(self, start_date: str, end_date: str, crane_id="all", fault_id="all") -> RecordQuery:
+        """Shortcut filter() untuk satu rentang tanggal"""
+        return self.filter([(start_date, end_date)], crane_ids=crane_id, fault_ids=fault_id)
+
+    MAX_INTERNED_FAULTS = 10000
+
+    def _on_data_change(self, change: DataChange) -> None:
+        if change.scope in ("faults", "all"):
+            self._fault_refs.clear()
+
+    def _intern_fault_reference(self, fault_id, code_fault, fault_name) -> FaultReference:
         """
-        rows = self.db_manager.fetchall_dict(query, (start_date, end_date, crane_id))
-        return [self._row_to_maintenance_record(row) for row in rows]
+        Range tanggal biasanya hanya berisi puluhan fault berbeda: semua record
+        memakai objek FaultReference yang sama, bukan satu objek per baris.
+        Cache dikosongkan saat fault_references berubah.
+        """
+        key = (fault_id, code_fault, fault_name)
+        fault_ref = self._fault_refs.get(key)
+        if fault_ref is None:
+            if len(self._fault_refs) >= self.MAX_INTERNED_FAULTS:
+                self._fault_refs.clear()
+            fault_ref = FaultReference(fault_id=fault_id, code_fault=code_fault, fault_name=fault_name)
+            self._fault_refs[key] = fault_ref
+        return fault_ref
+
+    def enable_hot_store(self, days: int) -> HotWindowStore:
+        """Muat event `days` hari terakhir ke memori; query di dalam jendela tidak lagi ke database"""
+        hot_store = HotWindowStore(self, days)
+        hot_store.load()
+        self.hot_store = hot_store
+        return hot_store
+
+    def enable_month_cache(self, cache_dir: str) -> MonthCache:
+        """Bulan yang sudah tutup dibaca dari file mmap di `cache_dir`, divalidasi dengan data_versions"""
+        self.month_cache = MonthCache(self, cache_dir)
+        return self.month_cache
+
+    def fetch_batch(self, start_date: str, end_date: str, crane_id="all", fault_id="all", method: str = "copy"):
+        """Record dalam bentuk kolom NumPy (RecordBatch), lihat RecordQuery.batch()"""
+        return self.query(start_date, end_date, crane_id, fault_id).batch(method)
+
+    def get_fault_names(self, fault_ids) -> dict:
+        """{fault_id: fault_name} dari fault_references untuk id yang diberikan"""
+        ids = sorted({int(fault_id) for fault_id in fault_ids if fault_id is not None and int(fault_id) >= 0})
+        if not ids:
+            return {}
+        rows = self.db_manager.fetchall(
+            "SELECT fault_id, fault_name FROM fault_references WHERE fault_id = ANY(%s);", (ids,)
+        )
+        return {fault_id: sys.intern(name) if name else name for fault_id, name in rows}
 
     def _row_to_maintenance_record(self, row: dict) -> MaintenanceRecord:
         """Helper untuk mengkonversi row database ke objek MaintenanceRecord"""
-        fault_ref = FaultReference(
-            fault_id=row['fault_id'],
-            code_fault=row.get('code_fault'),
-            fault_name=row.get('fault_ref_name') or row['fault_name']
+        fault_name = row['fault_name']
+        if isinstance(fault_name, str):
+            # Nama fault berulang di setiap baris: simpan satu string bersama
+            fault_name = sys.intern(fault_name)
+        fault_ref = self._intern_fault_reference(
+            row['fault_id'],
+            row.get('code_fault'),
+            row.get('fault_ref_name') or fault_name
         )
         
         # Gabungkan tanggal dan waktu menjadi satu objek datetime
@@ -99,72 +268,44 @@ class MaintenanceService:
             tanggal=combined_datetime, # Sekarang berisi datetime lengkap
             waktu=row['waktu'],
             act=row['act'],
-            fault_name=row['fault_name'],
+            fault_name=fault_name,
             crane_id=row['crane_id'],
             fault_reference=fault_ref
         )
 
-    # ======================= METODE DELETE BULK =======================
-    def delete_all_records_by_date_range(self, start_date: str, end_date: str) -> int:
-        """Menghapus semua record dalam rentang tanggal"""
-        query = "DELETE FROM maintenance_records WHERE tanggal BETWEEN %s AND %s;"
-        return self.db_manager.execute(query, (start_date, end_date)).rowcount
-
-    def delete_all_records_by_date_and_fault(self, start_date: str, end_date: str, fault_id: int) -> int:
-        """Menghapus semua record dalam rentang tanggal untuk fault tertentu"""
-        query = "DELETE FROM maintenance_records WHERE tanggal BETWEEN %s AND %s AND fault_id = %s;"
-        return self.db_manager.execute(query, (start_date, end_date, fault_id)).rowcount
-
-    def delete_all_records_by_crane_and_date_range(self, crane_id: int, start_date: str, end_date: str) -> int:
-        """Menghapus semua record dalam rentang tanggal untuk crane tertentu"""
-        query = "DELETE FROM maintenance_records WHERE crane_id = %s AND tanggal BETWEEN %s AND %s;"
-        return self.db_manager.execute(query, (crane_id, start_date, end_date)).rowcount
-
     # ======================= METODE LAINNYA =======================
-    def get_records_by_date_and_id_crane_and_id_fault(
-        self, 
-        start_date: str, 
-        end_date: str, 
-        crane_id: int, 
-        fault_id: int
-    ) -> List[MaintenanceRecord]:
-        start_date_obj = datetime.strptime(start_date, "%Y-%m-%d").date()
-        end_date_obj = datetime.strptime(end_date, "%Y-%m-%d").date()
-
-        query = """
-        SELECT mr.*, fr.code_fault, fr.fault_name AS fault_ref_name
-        FROM maintenance_records mr
-        LEFT JOIN fault_references fr ON mr.fault_id = fr.fault_id
-        WHERE mr.tanggal BETWEEN %s AND %s
-            AND mr.crane_id = %s 
-            AND mr.fault_id = %s
-        ORDER BY mr.tanggal, mr.waktu ASC;
-        """
-        rows = self.db_manager.fetchall_dict(query, (start_date_obj, end_date_obj, crane_id, fault_id))
-        return [self._row_to_maintenance_record(row) for row in rows]
-
     def get_all_year(self, crane_id) -> List[dict]:
-        if str(crane_id).lower() == 'all':
+        crane_ids = normalize_ids(crane_id)
+        # Tahun dari data hot + arsip
+        if crane_ids is None:
             query = """
-            SELECT DISTINCT EXTRACT(YEAR FROM tanggal)::INT AS tahun
-            FROM maintenance_records
+            SELECT EXTRACT(YEAR FROM tanggal)::INT AS tahun FROM maintenance_records
+            UNION
+            SELECT EXTRACT(YEAR FROM bulan)::INT FROM maintenance_records_archive
             ORDER BY tahun;
             """
             return self.db_manager.fetchall_dict(query)
         else:
             query = """
-            SELECT DISTINCT EXTRACT(YEAR FROM tanggal)::INT AS tahun
-            FROM maintenance_records
-            WHERE crane_id = %s
+            SELECT EXTRACT(YEAR FROM tanggal)::INT AS tahun FROM maintenance_records
+            WHERE crane_id = ANY(%s)
+            UNION
+            SELECT EXTRACT(YEAR FROM bulan)::INT FROM maintenance_records_archive
+            WHERE crane_id = ANY(%s)
             ORDER BY tahun;
             """
-            return self.db_manager.fetchall_dict(query, (crane_id,))
+            return self.db_manager.fetchall_dict(query, (crane_ids, crane_ids))
     
     def get_all_crane_id(self) -> List[dict]:
-        query = "SELECT DISTINCT crane_id FROM maintenance_records ORDER BY crane_id;"
+        query = """
+        SELECT crane_id FROM maintenance_records
+        UNION
+        SELECT crane_id FROM maintenance_records_archive
+        ORDER BY crane_id;
+        """
         return self.db_manager.fetchall_dict(query)
 
-    def add_fault(self, filename: str):
+    def add_fault(self, filename: str, tx: Optional[Transaction] = None):
         datas = []
         with open(filename, 'r', encoding='utf-16') as file:
             reader = csv.reader(file, delimiter='\t')
@@ -172,6 +313,8 @@ class MaintenanceService:
                 if i >= 2 and len(row) > 6:
                     datas.append(row[6].strip())
 
+        # Kumpulkan pasangan unik dulu, lalu insert sekaligus dalam satu commit
+        faults = {}
         for data in datas:
             match = re.match(r"\((.*?)\)(.+)", data)
             if match:
@@ -180,93 +323,64 @@ class MaintenanceService:
             else:
                 kode_fault = "Nan"
                 fault_name = data
+            faults[(kode_fault, fault_name)] = None
 
-            query = """
-            INSERT INTO fault_references (code_fault, fault_name)
-            VALUES (%s, %s)
-            ON CONFLICT (code_fault, fault_name) DO NOTHING;
-            """
-            self.db_manager.execute(query, (kode_fault, fault_name))
+        if not faults:
+            return
+        if tx is None:
+            with self.db_manager.transaction() as own_tx:
+                return self.add_fault(filename, own_tx)
+
+        query = """
+        INSERT INTO fault_references (code_fault, fault_name)
+        VALUES %s
+        ON CONFLICT (code_fault, fault_name) DO NOTHING
+        RETURNING fault_id;
+        """
+        inserted = tx.execute_values(query, list(faults), fetch=True)
+        if inserted:
+            self.mark_faults_changed(tx)
         
     def get_all_faults(self, crane_id, start_date, end_date) -> List[FaultReference]:
-        start_date_obj = datetime.strptime(start_date, "%Y-%m-%d").date()
-        end_date_obj = datetime.strptime(end_date, "%Y-%m-%d").date()
-        
-        params = [start_date_obj, end_date_obj]
-        
-        if str(crane_id).lower() == 'all':
-            query = """
-            SELECT DISTINCT mr.fault_id, fr.fault_name 
-            FROM maintenance_records mr
-            JOIN fault_references fr ON mr.fault_id = fr.fault_id
-            WHERE mr.tanggal BETWEEN %s AND %s
-            """
-        else:
-            query = """
-            SELECT DISTINCT mr.fault_id, fr.fault_name 
-            FROM maintenance_records mr
-            JOIN fault_references fr ON mr.fault_id = fr.fault_id
-            WHERE mr.tanggal BETWEEN %s AND %s
-            AND mr.crane_id = %s
-            """
-            params.append(crane_id)
-
-        rows = self.db_manager.fetchall_dict(query, params)
+        """Fault yang muncul di rentang tanggal (hot + arsip), urut dari yang tersering"""
+        rows = self.query(start_date, end_date, crane_id).group_counts("fault_id", "fault_ref_name")
         return [
             FaultReference(
                 fault_id=row['fault_id'],
                 code_fault=None, 
-                fault_name=row['fault_name']
-            ) for row in rows
+                fault_name=row['fault_ref_name']
+            ) for row in rows if row['fault_id'] is not None
         ]
         
-    def search_faults_by_keyword(self, keyword: str) -> List[FaultReference]:
+    def search_faults_by_keyword(self, keyword: str, limit: int = 50) -> List[FaultReference]:
+        """Cari fault berdasarkan kode/nama/id; hasil berperingkat (lihat FaultSearchIndex)"""
         if not keyword:
             return []
-        
-        sql = """
-        SELECT fault_id, code_fault, fault_name
-        FROM fault_references
-        WHERE code_fault ILIKE %s
-            OR fault_name ILIKE %s
-            OR CAST(fault_id AS TEXT) ILIKE %s
-        LIMIT 50;
-        """
-        kw = f"%{keyword}%"
-        rows = self.db_manager.fetchall_dict(sql, (kw, kw, kw))
-        return [FaultReference(**row) for row in rows]
+        return self.fault_index.search(keyword, limit=limit)
 
-    def delete_records_by_ids(self, record_ids: List[int]) -> int:
+    def get_fault_by_id(self, fault_id: int) -> Optional[FaultReference]:
+        return self.fault_index.get(fault_id)
+
+    def delete_records_by_ids(self, record_ids: List[int], tx: Optional[Transaction] = None) -> int:
         if not record_ids:
             return 0
 
-        placeholders = ','.join(['%s'] * len(record_ids))
-        query = f"DELETE FROM maintenance_records WHERE id IN ({placeholders});"
-        return self.db_manager.execute(query, record_ids).rowcount
+        if tx is None:
+            with self.db_manager.transaction() as own_tx:
+                return self.delete_records_by_ids(record_ids, own_tx)
+
+        query = "DELETE FROM maintenance_records WHERE id = ANY(%s) RETURNING crane_id, tanggal;"
+        deleted = tx.fetchall(query, (list(record_ids),))
+        crane_ids = sorted({row[0] for row in deleted if row[0] is not None})
+        dates = [row[1].isoformat() for row in deleted if row[1] is not None]
+        if crane_ids and dates:
+            self.mark_records_changed(tx, crane_ids, min(dates), max(dates))
+        return len(deleted)
+
 
-    def delete_records_by_date_and_id_crane_and_id_fault(self, start_date: str, end_date: str, crane_id: int, fault_id: int) -> int:
-        """
-        Menghapus records maintenance berdasarkan tanggal, crane_id, dan fault_id
-        Args:
-            start_date (str): Tanggal mulai dalam format 'YYYY-MM-DD'
-            end_date (str): Tanggal akhir dalam format 'YYYY-MM-DD'
-            crane_id (int): ID crane
-            fault_id (int): ID fault
-        Returns:
-            int: Jumlah record yang berhasil dihapus
-        """
-        query = """
-            DELETE FROM maintenance_records 
-            WHERE tanggal BETWEEN %s AND %s 
-            AND crane_id = %s 
-            AND fault_id = %s;
-        """
-        return self.db_manager.execute(query, (start_date, end_date, crane_id, fault_id)).rowcount
-    
-    
     """ FAULT DATABASE """
     
-    def get_or_create_fault_reference_by_name(self, fault_name: str) -> FaultReference:
+    def get_or_create_fault_reference_by_name(self, fault_name: str, tx: Optional[Transaction] = None) -> FaultReference:
         """
         Mengambil atau membuat FaultReference berdasarkan nama fault.
         Jika tidak ada, maka akan dibuat entri baru.
@@ -275,7 +389,7 @@ class MaintenanceService:
         
         # Coba cari dulu
         find_query = "SELECT fault_id, code_fault, fault_name FROM fault_references WHERE fault_name = %s LIMIT 1"
-        result = self.db_manager.fetchone(find_query, (fault_query,))
+        result = self._fetchone(find_query, (fault_query,), tx)
         
         if result:
             fault_id, code_fault, name = result
@@ -289,10 +403,12 @@ class MaintenanceService:
             RETURNING fault_id, code_fault, fault_name;
             """
             # Gunakan code_fault kosong karena tidak ada data code_fault di sini
-            new_result = self.db_manager.fetchone(insert_query, ('', fault_query))
+            new_result = self._fetchone(insert_query, ('', fault_query), tx)
             if new_result:
                 fault_id, code_fault, name = new_result
+                if tx is not None:
+                    self.mark_faults_changed(tx)
                 return FaultReference(fault_id=fault_id, code_fault=code_fault, fault_name=name)
             else:
                 # Jika ON CONFLICT terjadi, ambil lagi data yang sudah ada
-                return self.get_or_create_fault_reference_by_name(fault_name)
+                return self.get_or_create_fault_reference_by_name(fault_name, tx)
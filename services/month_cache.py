@@ -0,0 +1,147 @@
+# services/month_cache.py
+import calendar
+import logging
+import os
+import shutil
+import tempfile
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from database.record_batch import RecordBatch
+
+logger = logging.getLogger(__name__)
+
+
+class MonthCache:
+    """
+    Cache file kolom per crane per bulan untuk bulan yang sudah tutup.
+
+    Satu file NumPy per (crane, bulan): <cache_dir>/<crane>/<YYYY-MM>.v<versi>.npy
+    berisi array terstruktur (ts, fault_id, act). File dibuka dengan mmap,
+    sehingga membaca satu bulan hampir tanpa salinan dan tanpa round trip SQL.
+
+    Versi di nama file adalah versi data_versions saat file dibuat: jika data
+    bulan itu berubah (upload ulang, hapus, restore) versinya naik dan file
+    lama otomatis tidak terpakai lalu dibuat ulang.
+    """
+
+    DTYPE = np.dtype([("ts", "datetime64[us]"), ("fault_id", "<i4"), ("act", "i1")])
+
+    def __init__(self, maintenance_service, cache_dir: str):
+        self.maintenance_service = maintenance_service
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    # ======================= HELPER =======================
+    @staticmethod
+    def _month_range(month: date) -> Tuple[str, str]:
+        last_day = calendar.monthrange(month.year, month.month)[1]
+        return month.isoformat(), month.replace(day=last_day).isoformat()
+
+    @staticmethod
+    def _months_between(start_date: str, end_date: str) -> List[date]:
+        current = datetime.strptime(start_date, "%Y-%m-%d").date().replace(day=1)
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        months = []
+        while current <= end:
+            months.append(current)
+            current = current.replace(year=current.year + 1, month=1) if current.month == 12 \
+                else current.replace(month=current.month + 1)
+        return months
+
+    def _path(self, crane_id: int, month: date, version: int) -> str:
+        return os.path.join(self.cache_dir, str(crane_id), f"{month.strftime('%Y-%m')}.v{version}.npy")
+
+    def covers(self, query) -> bool:
+        """Hanya bulan yang sudah tutup (sebelum bulan ini) dan tanpa filter nama fault mentah"""
+        current_month = date.today().replace(day=1).isoformat()
+        return query.fault_name is None and query.end_date < current_month
+
+    def _versions(self, crane_ids: List[int], months: List[date]) -> Dict[Tuple[int, date], int]:
+        """Versi data per (crane, bulan) dalam satu query; yang belum pernah ditulis = 0"""
+        rows = self.maintenance_service.db_manager.fetchall(
+            "SELECT crane_id, bulan, version FROM data_versions WHERE crane_id = ANY(%s) AND bulan = ANY(%s);",
+            (crane_ids, months),
+        )
+        return {(crane_id, bulan): version for crane_id, bulan, version in rows}
+
+    # ======================= BACA =======================
+    def load_month(self, crane_id: int, month: date, version: int) -> RecordBatch:
+        """Batch satu crane satu bulan: mmap dari file jika versinya cocok, selain itu dibuat ulang"""
+        path = self._path(crane_id, month, version)
+        if os.path.exists(path):
+            self.hits += 1
+            rows = np.load(path, mmap_mode="r")
+        else:
+            self.misses += 1
+            rows = self._build(crane_id, month, version)
+        crane_ids = np.broadcast_to(np.int16(crane_id), rows.shape)
+        return RecordBatch(rows["ts"], crane_ids, rows["fault_id"], rows["act"])
+
+    def batch(self, query) -> Optional[RecordBatch]:
+        """RecordBatch untuk query dari file cache, atau None jika query tidak bisa dilayani"""
+        if not self.covers(query):
+            return None
+        crane_ids = query.crane_ids
+        if crane_ids is None:
+            crane_ids = [row['crane_id'] for row in self.maintenance_service.get_all_crane_id()
+                         if row['crane_id'] is not None]
+        months = sorted({month for start, end in query.date_ranges for month in self._months_between(start, end)})
+        if not crane_ids or not months:
+            return RecordBatch.empty()
+
+        versions = self._versions(list(crane_ids), months)
+        batches = [self.load_month(crane_id, month, versions.get((crane_id, month), 0))
+                   for crane_id in crane_ids for month in months]
+        batch = batches[0] if len(batches) == 1 else RecordBatch.concat(batches)
+
+        in_ranges = np.zeros(len(batch), dtype=bool)
+        for start_date, end_date in query.date_ranges:
+            in_ranges |= batch.mask(start_date, end_date)
+        mask = in_ranges & batch.mask(fault_ids=query.fault_ids)
+        if not mask.all():
+            batch = batch.take(mask)
+        batch.fault_names = self.maintenance_service.get_fault_names(np.unique(batch.fault_ids))
+        return batch
+
+    # ======================= TULIS =======================
+    def _build(self, crane_id: int, month: date, version: int):
+        start_date, end_date = self._month_range(month)
+        source = self.maintenance_service.query(start_date, end_date, crane_id).batch(use_month_cache=False)
+        rows = np.empty(len(source), dtype=self.DTYPE)
+        rows["ts"], rows["fault_id"], rows["act"] = source.timestamps, source.fault_ids, source.act
+
+        path = self._path(crane_id, month, version)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Tulis ke file sementara lalu rename, agar proses lain tidak membaca file setengah jadi
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, "wb") as file:
+            np.save(file, rows)
+        os.replace(temp_path, path)
+
+        # Buang versi lama bulan yang sama
+        prefix = f"{month.strftime('%Y-%m')}.v"
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name != os.path.basename(path):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+        logger.info(f"Cache bulan dibuat: crane {crane_id} {month.strftime('%Y-%m')} v{version} ({len(rows)} event)")
+        return rows
+
+    def disk_report(self) -> dict:
+        files, total_bytes = 0, 0
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.endswith(".npy"):
+                    files += 1
+                    total_bytes += os.path.getsize(os.path.join(root, name))
+        return {"files": files, "bytes": total_bytes, "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
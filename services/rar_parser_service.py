@@ -94,6 +94,7 @@ class RarParserService:
                 if not header:
                     next(reader, None)  # Lewati header jika bukan DictReader
 
+                rows = []
                 for row in reader:
                     try:
                         fault_name = ''
@@ -109,15 +110,25 @@ class RarParserService:
                             else:
                                 print(f"Baris tidak valid (kurang kolom): {row}")
                                 continue
-
-                        fault_ref = self.maintenance_service.get_or_create_fault_reference_by_name(fault_name)
-                        print(f"Menambahkan record: {waktu}, {act}, {fault_name}, {crane_id}, {fault_ref.fault_id}")
-                        record = MaintenanceRecord(tanggal, waktu, act, fault_name, crane_id, fault_ref)
-                        self.maintenance_service.add_record(record)
+                        rows.append((waktu, act, fault_name))
 
                     except Exception as e:
                         print(f"Kesalahan parsing baris: {row} - {e}")
 
+                # Satu transaksi per file: fault reference + semua record di-commit sekali
+                try:
+                    with self.maintenance_service.db_manager.transaction() as tx:
+                        fault_refs = {}
+                        records = []
+                        for waktu, act, fault_name in rows:
+                            if fault_name not in fault_refs:
+                                fault_refs[fault_name] = self.maintenance_service.get_or_create_fault_reference_by_name(fault_name, tx)
+                            records.append(MaintenanceRecord(tanggal, waktu, act, fault_name, crane_id, fault_refs[fault_name]))
+                        self.maintenance_service.add_records(records, tx)
+                    print(f"Menambahkan {len(records)} record untuk crane {crane_id}, tanggal {tanggal}")
+                except Exception as e:
+                    print(f"Gagal menyimpan file {filename}: {e}")
+
 
 # Contoh penggunaan dengan berbagai pattern dinamis
 """
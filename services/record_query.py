@@ -0,0 +1,430 @@
+# services/record_query.py
+from datetime import datetime, timedelta, date
+from typing import Dict, Iterator, List, Optional, Tuple
+from database.db_manager import Transaction
+from database.models import MaintenanceRecord
+from database.record_batch import RecordBatch, greedy_group_counts
+import io
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_ids(value) -> Optional[List[int]]:
+    """
+    Ubah input filter id menjadi list int, atau None untuk 'all'.
+    Menerima: "all", None, 3, "3", "1,2,5", [1, 2], {1, 2}
+    """
+    if value is None or str(value).lower() == "all":
+        return None
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = value
+    else:
+        items = str(value).split(",")
+    ids = sorted({int(str(item).strip()) for item in items if str(item).strip()})
+    return ids or None
+
+
+class RecordQuery:
+    """
+    Query lazy untuk maintenance_records.
+
+    Objek ini hanya menyimpan filter (kumpulan crane, kumpulan fault, satu atau
+    beberapa rentang tanggal). Crane dan fault dikirim sebagai array
+    (`= ANY(%s)`), sehingga perbandingan banyak crane/fault tetap satu query.
+    SQL baru dijalankan saat salah satu method dipanggil, dan setiap method
+    memakai query paling murah untuk kebutuhannya:
+    - count()         -> SELECT COUNT(*)
+    - sample(n)       -> SELECT ... LIMIT n
+    - group_counts()  -> SELECT ..., COUNT(*) GROUP BY ...
+    - iter()          -> server-side cursor, baris di-stream
+    - daily_series()  -> hanya kolom tanggal & waktu
+    - batch()         -> COPY binary ke RecordBatch (kolom NumPy, tanpa objek per baris)
+    """
+
+    # Kolom yang boleh dipakai di group_counts(): nama -> (ekspresi SQL, butuh join fault_references)
+    GROUP_COLUMNS = {
+        "crane_id": ("mr.crane_id", False),
+        "fault_id": ("mr.fault_id", False),
+        "fault_name": ("mr.fault_name", False),
+        "fault_ref_name": ("COALESCE(fr.fault_name, mr.fault_name)", True),
+        "tanggal": ("mr.tanggal", False),
+        # "periode" = nomor urut rentang tanggal (1, 2, ...), dibangun di _select_column()
+        "periode": (None, False),
+    }
+
+    def __init__(self, maintenance_service, date_ranges: List[Tuple[str, str]],
+                 crane_ids=None, fault_ids=None, fault_name: Optional[str] = None):
+        if not date_ranges:
+            raise ValueError("RecordQuery membutuhkan minimal satu rentang tanggal")
+        self.maintenance_service = maintenance_service
+        self.db_manager = maintenance_service.db_manager
+        self.date_ranges = [(str(start), str(end)) for start, end in date_ranges]
+        self.crane_ids = normalize_ids(crane_ids)
+        self.fault_ids = normalize_ids(fault_ids)
+        self.fault_name = fault_name
+
+    @property
+    def start_date(self) -> str:
+        return min(start for start, _ in self.date_ranges)
+
+    @property
+    def end_date(self) -> str:
+        return max(end for _, end in self.date_ranges)
+
+    def narrow(self, crane_ids=None, fault_ids=None, fault_name=None) -> "RecordQuery":
+        """Buat query baru dengan filter pengganti (filter lain tetap berlaku)"""
+        return RecordQuery(
+            self.maintenance_service,
+            self.date_ranges,
+            crane_ids=self.crane_ids if crane_ids is None else crane_ids,
+            fault_ids=self.fault_ids if fault_ids is None else fault_ids,
+            fault_name=self.fault_name if fault_name is None else fault_name,
+        )
+
+    def with_dates(self, date_ranges: List[Tuple[str, str]]) -> "RecordQuery":
+        """Query baru dengan filter crane/fault yang sama untuk rentang tanggal lain"""
+        return RecordQuery(
+            self.maintenance_service,
+            date_ranges,
+            crane_ids=self.crane_ids,
+            fault_ids=self.fault_ids,
+            fault_name=self.fault_name,
+        )
+
+    def _where(self, alias: str = "mr", date_expr: Optional[str] = None,
+               date_ranges: Optional[List[Tuple[str, str]]] = None):
+        """
+        Kondisi WHERE untuk filter ini. `date_expr`/`date_ranges` dipakai jika
+        tanggal tidak berada di kolom `<alias>.tanggal` (mis. tabel arsip).
+        """
+        date_expr = date_expr or f"{alias}.tanggal"
+        date_ranges = date_ranges or self.date_ranges
+        ranges = " OR ".join(f"{date_expr} BETWEEN %s AND %s" for _ in date_ranges)
+        conditions = [f"({ranges})"]
+        params = [value for date_range in date_ranges for value in date_range]
+        if self.crane_ids is not None:
+            conditions.append(f"{alias}.crane_id = ANY(%s)")
+            params.append(self.crane_ids)
+        if self.fault_ids is not None:
+            conditions.append(f"{alias}.fault_id = ANY(%s)")
+            params.append(self.fault_ids)
+        if self.fault_name is not None:
+            conditions.append(f"{alias}.fault_name = %s")
+            params.append(self.fault_name)
+        return " AND ".join(conditions), params
+
+    def _base(self):
+        """
+        (FROM, WHERE, params) untuk semua query baca. Jika rentang tanggal
+        menyentuh data arsip, sumbernya adalah gabungan tabel hot + arsip
+        sehingga pemanggil tidak perlu tahu di mana datanya disimpan.
+        """
+        source, params = self.maintenance_service.archive.source_for(self)
+        where, where_params = self._where()
+        return f"{source} mr", where, params + where_params
+
+    def _hot_batch(self) -> Optional[RecordBatch]:
+        """Record dari hot store di memori jika query seluruhnya di dalam jendelanya"""
+        hot_store = self.maintenance_service.hot_store
+        return hot_store.select(self) if hot_store is not None else None
+
+    def _select_column(self, column: str):
+        """Ekspresi SQL (dan parameternya) untuk satu kolom group_counts()"""
+        if column == "periode":
+            cases = " ".join(f"WHEN mr.tanggal BETWEEN %s AND %s THEN {i}"
+                             for i in range(1, len(self.date_ranges) + 1))
+            params = [value for date_range in self.date_ranges for value in date_range]
+            return f"CASE {cases} END", params
+        return self.GROUP_COLUMNS[column][0], []
+
+    # ======================= METODE BACA =======================
+    def count(self, tx: Optional[Transaction] = None) -> int:
+        if tx is None:
+            hot = self._hot_batch()
+            if hot is not None:
+                return len(hot)
+        source, where, params = self._base()
+        query = f"SELECT COUNT(*) FROM {source} WHERE {where};"
+        return self.maintenance_service._fetchone(query, tuple(params), tx)[0]
+
+    def sample(self, n: int = 5, tx: Optional[Transaction] = None) -> List[MaintenanceRecord]:
+        """Ambil n record pertama (urut waktu) tanpa memuat sisanya"""
+        source, where, params = self._base()
+        query = f"""
+        SELECT mr.*, fr.code_fault, fr.fault_name AS fault_ref_name
+        FROM {source}
+        LEFT JOIN fault_references fr ON mr.fault_id = fr.fault_id
+        WHERE {where}
+        ORDER BY mr.tanggal, mr.waktu
+        LIMIT %s;
+        """
+        rows = self.maintenance_service._fetchall_dict(query, tuple(params + [n]), tx)
+        return [self.maintenance_service._row_to_maintenance_record(row) for row in rows]
+
+    def group_counts(self, *columns: str, limit: Optional[int] = None) -> List[dict]:
+        """
+        Hitung jumlah record per grup, diurutkan dari yang terbanyak.
+        Contoh: group_counts("crane_id", "fault_name") ->
+            [{"crane_id": 1, "fault_name": "...", "jumlah": 120}, ...]
+        Dengan beberapa rentang tanggal, group_counts("periode", "crane_id")
+        membandingkan semua rentang dalam satu round trip.
+        """
+        if not columns:
+            raise ValueError("group_counts membutuhkan minimal satu kolom")
+        unknown = [c for c in columns if c not in self.GROUP_COLUMNS]
+        if unknown:
+            raise ValueError(f"Kolom group tidak dikenal: {unknown}")
+
+        select_parts, params = [], []
+        for column in columns:
+            expression, column_params = self._select_column(column)
+            select_parts.append(f"{expression} AS {column}")
+            params.extend(column_params)
+        select_cols = ", ".join(select_parts)
+        group_by = ", ".join(str(i) for i in range(1, len(columns) + 1))
+        needs_join = any(self.GROUP_COLUMNS[c][1] for c in columns)
+        join = "LEFT JOIN fault_references fr ON mr.fault_id = fr.fault_id" if needs_join else ""
+
+        source, where, base_params = self._base()
+        params.extend(base_params)
+        query = f"""
+        SELECT {select_cols}, COUNT(*) AS jumlah
+        FROM {source}
+        {join}
+        WHERE {where}
+        GROUP BY {group_by}
+        ORDER BY jumlah DESC, {group_by}
+        """
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+        return self.db_manager.fetchall_dict(query, tuple(params))
+
+    def chart_groups(self, limit: Optional[int] = None) -> List[dict]:
+        """
+        Grup grafik /grafik per (crane, nama fault mentah), urut jumlah terbanyak:
+            [{"crane_id", "fault_name", "jumlah", "group_fault_id"}, ...]
+        Beberapa nama mentah bisa berbagi satu fault_id (nama tanpa "(...)").
+        group_fault_id hanya diisi jika untuk crane itu nama dan fault_id saling
+        1:1, sehingga grup boleh difilter dengan fault_id (lihat hot store &
+        cache bulan yang hanya menyimpan fault_id); selain itu NULL.
+        """
+        source, where, params = self._base()
+        query = f"""
+        WITH pairs AS (
+            SELECT mr.crane_id, mr.fault_id, mr.fault_name, COUNT(*) AS jumlah
+            FROM {source}
+            WHERE {where}
+            GROUP BY 1, 2, 3
+        ), mapped AS (
+            SELECT *,
+                   COUNT(*) OVER (PARTITION BY crane_id, fault_id) AS names_per_fault,
+                   COUNT(*) OVER (PARTITION BY crane_id, fault_name) AS ids_per_name
+            FROM pairs
+        )
+        SELECT crane_id, fault_name, SUM(jumlah)::BIGINT AS jumlah,
+               CASE WHEN MAX(names_per_fault) = 1 AND MAX(ids_per_name) = 1 THEN MIN(fault_id) END AS group_fault_id
+        FROM mapped
+        GROUP BY crane_id, fault_name
+        ORDER BY jumlah DESC, crane_id, fault_name
+        """
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+        return self.db_manager.fetchall_dict(query, tuple(params))
+
+    def iter(self, batch_size: int = 2000) -> Iterator[MaintenanceRecord]:
+        """Stream semua record (urut waktu) tanpa menampung list di memori"""
+        source, where, params = self._base()
+        query = f"""
+        SELECT mr.*, fr.code_fault, fr.fault_name AS fault_ref_name
+        FROM {source}
+        LEFT JOIN fault_references fr ON mr.fault_id = fr.fault_id
+        WHERE {where}
+        ORDER BY mr.tanggal, mr.waktu
+        """
+        for row in self.db_manager.iter_rows(query, tuple(params), batch_size=batch_size, as_dict=True):
+            yield self.maintenance_service._row_to_maintenance_record(row)
+
+    def batch(self, method: str = "copy", use_hot_store: bool = True, use_month_cache: bool = True) -> RecordBatch:
+        """
+        Semua record dalam bentuk kolom (RecordBatch), urut timestamp.
+        Urutan sumber: hot store di memori, file cache bulan yang sudah tutup, database.
+        method="copy" membaca COPY binary langsung ke array NumPy;
+        method="cursor" memakai cursor biasa (tuple, tanpa MaintenanceRecord).
+        """
+        if use_hot_store:
+            hot = self._hot_batch()
+            if hot is not None:
+                return hot
+        month_cache = self.maintenance_service.month_cache
+        if use_month_cache and month_cache is not None:
+            cached = month_cache.batch(self)
+            if cached is not None:
+                return cached
+        source, where, params = self._base()
+        query = f"{RecordBatch.COPY_SELECT} FROM {source} WHERE {where} ORDER BY 1"
+        if method == "copy":
+            buffer = io.BytesIO()
+            self.db_manager.copy_out(query, tuple(params), buffer)
+            batch = RecordBatch.from_copy_binary(buffer.getbuffer())
+        elif method == "cursor":
+            batch = RecordBatch.from_rows(self.db_manager.fetchall(query, tuple(params)))
+        else:
+            raise ValueError(f"Metode batch tidak dikenal: {method}")
+        batch.fault_names = self.maintenance_service.get_fault_names(np.unique(batch.fault_ids))
+        return batch
+
+    def daily_series(self, dedup_minutes: int = 1) -> Dict[date, int]:
+        """
+        Jumlah fault per hari untuk semua rentang tanggal (hari kosong = 0).
+        Fault dalam `dedup_minutes` menit setelah fault terakhir yang dihitung
+        pada hari yang sama tidak dihitung lagi (aturan yang sama dengan grafik).
+        Hanya kolom tanggal & waktu yang diambil dari database.
+        """
+        series = {}
+        for start_date, end_date in sorted(self.date_ranges):
+            current = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end = datetime.strptime(end_date, "%Y-%m-%d").date()
+            while current <= end:
+                series[current] = 0
+                current += timedelta(days=1)
+
+        hot = self._hot_batch()
+        if hot is not None:
+            for start_date, end_date in self.date_ranges:
+                days, counts = hot.daily_counts(start_date, end_date, dedup_minutes)
+                series.update(zip(days.tolist(), counts.tolist()))
+            return series
+
+        source, where, params = self._base()
+        if not dedup_minutes:
+            query = f"""
+            SELECT mr.tanggal, COUNT(*)
+            FROM {source}
+            WHERE {where}
+            GROUP BY mr.tanggal;
+            """
+            for tanggal, jumlah in self.db_manager.fetchall(query, tuple(params)):
+                series[tanggal] = jumlah
+            return series
+
+        for (tanggal,), jumlah in self._dedup_counts([], "day", dedup_minutes).items():
+            series[tanggal] = jumlah
+        return series
+
+    BUCKETS = ("day", "week", "month", "quarter")
+
+    def bucket_counts(self, granularity: str = "day", dedup_minutes: int = 1) -> List[Tuple[date, int]]:
+        """
+        [(awal bucket, jumlah)] per date_trunc(granularity), hanya bucket yang
+        berisi event. Dedup sama dengan grafik harian (RecordBatch.dedup_mask),
+        jadi jumlah bucket = jumlah daily_counts() hari-harinya.
+        """
+        if not dedup_minutes:
+            return self.db_manager.fetchall(*self._count_query(granularity, by_crane=False))
+        counts = self._dedup_counts([], granularity, dedup_minutes)
+        return sorted((bucket, jumlah) for (bucket,), jumlah in counts.items())
+
+    def crane_bucket_counts(self, granularity: str = "day", dedup_minutes: int = 1) -> List[Tuple[int, date, int]]:
+        """
+        [(crane, awal bucket, jumlah)] untuk semua crane dalam SATU query
+        (laporan armada). Dedup seperti bucket_counts(), tetapi per crane per
+        hari sehingga fault crane lain tidak saling menutupi.
+        """
+        if not dedup_minutes:
+            return self.db_manager.fetchall(*self._count_query(granularity, by_crane=True))
+        counts = self._dedup_counts(["mr.crane_id"], granularity, dedup_minutes)
+        rows = [(crane_id, bucket, jumlah) for (crane_id, bucket), jumlah in counts.items()]
+        return sorted(rows, key=lambda row: (row[0] is None, row[0] or 0, row[1]))
+
+    def crane_fault_counts(self, dedup_minutes: int = 1) -> List[Tuple[int, str, int]]:
+        """
+        [(crane, nama fault, jumlah)] untuk semua crane x fault dalam SATU query.
+        Dedup per crane per fault per hari: fault yang sama berulang dalam
+        `dedup_minutes` menit dihitung sekali, fault berbeda tetap dihitung.
+        """
+        counts = self._dedup_counts(
+            ["mr.crane_id", "COALESCE(fr.fault_name, mr.fault_name)"], None, dedup_minutes,
+            join="LEFT JOIN fault_references fr ON mr.fault_id = fr.fault_id",
+        )
+        rows = [(crane_id, fault, jumlah) for (crane_id, fault), jumlah in counts.items()]
+        return sorted(rows, key=lambda row: (-row[2], row[0] is None, row[0] or 0, row[1] is None, row[1] or ""))
+
+    def _dedup_counts(self, group_exprs: List[str], granularity: Optional[str], dedup_minutes: int,
+                      join: str = "") -> Dict[tuple, int]:
+        """
+        {(*kelompok, awal bucket): jumlah} dengan aturan dedup grafik. Database
+        mengirim waktu event per (kelompok, hari) sebagai satu array urut; dedup
+        greedy (event terakhir yang DIHITUNG) dikerjakan di NumPy oleh
+        greedy_group_counts, implementasi yang sama dengan RecordBatch.dedup_mask.
+        granularity None = tanpa bucket, kuncinya hanya kelompok.
+        """
+        if granularity is not None and granularity not in self.BUCKETS:
+            raise ValueError(f"Granularitas tidak dikenal: {granularity}")
+        source, where, params = self._base()
+        select_groups = "".join(f"{expr}, " for expr in group_exprs)
+        group_by = ", ".join([str(i) for i in range(1, len(group_exprs) + 1)] + ["mr.tanggal"])
+        bucket = "date_trunc(%s, mr.tanggal)::date" if granularity else "mr.tanggal"
+        query = f"""
+        SELECT {select_groups}{bucket} AS bucket,
+               array_agg((EXTRACT(EPOCH FROM COALESCE(mr.waktu, '00:00'::time)) * 1000000)::BIGINT
+                         ORDER BY mr.waktu NULLS FIRST) AS waktu
+        FROM {source}
+        {join}
+        WHERE {where}
+        GROUP BY {group_by};
+        """
+        query_params = ([granularity] if granularity else []) + params
+        rows = self.db_manager.fetchall(query, tuple(query_params))
+        counts = {}
+        for row, jumlah in zip(rows, greedy_group_counts([row[-1] for row in rows], dedup_minutes)):
+            key = tuple(row[:-2]) + ((row[-2],) if granularity else ())
+            counts[key] = counts.get(key, 0) + int(jumlah)
+        return counts
+
+    def _count_query(self, granularity: str, by_crane: bool):
+        """(SQL, params) bucket_counts()/crane_bucket_counts() tanpa dedup"""
+        if granularity not in self.BUCKETS:
+            raise ValueError(f"Granularitas tidak dikenal: {granularity}")
+        source, where, params = self._base()
+        group_by = "1, 2" if by_crane else "1"
+        crane_select = "mr.crane_id, " if by_crane else ""
+        query = f"""
+        SELECT {crane_select}date_trunc(%s, mr.tanggal)::date AS bucket, COUNT(*)
+        FROM {source}
+        WHERE {where}
+        GROUP BY {group_by} ORDER BY {group_by};
+        """
+        return query, tuple([granularity] + params)
+
+    # ======================= METODE TULIS =======================
+    def delete(self, tx: Optional[Transaction] = None) -> int:
+        """Hapus semua record yang cocok dengan filter (hot + arsip), kembalikan jumlahnya"""
+        if tx is None:
+            with self.db_manager.transaction() as own_tx:
+                return self.delete(own_tx)
+
+        crane_ids = self.crane_ids
+        if crane_ids is None:
+            # Hapus semua crane: catat crane yang punya data di rentang SEBELUM dihapus,
+            # agar versi (crane, bulan) mereka naik walaupun belum punya baris data_versions
+            source, where, params = self._base()
+            crane_ids = [row[0] for row in tx.fetchall(
+                f"SELECT DISTINCT mr.crane_id FROM {source} WHERE {where} AND mr.crane_id IS NOT NULL;",
+                tuple(params),
+            )]
+
+        where, params = self._where()
+        query = f"DELETE FROM maintenance_records AS mr WHERE {where};"
+        deleted = tx.execute(query, tuple(params)).rowcount
+        deleted += self.maintenance_service.archive.delete_matching(self, tx)
+        if deleted and crane_ids:
+            self.maintenance_service.mark_records_changed(tx, sorted(crane_ids), self.start_date, self.end_date)
+        return deleted
+
+    def __repr__(self):
+        return (f"RecordQuery(crane_ids={self.crane_ids or 'all'}, fault_ids={self.fault_ids or 'all'}, "
+                f"fault_name={self.fault_name!r}, date_ranges={self.date_ranges})")
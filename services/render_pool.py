@@ -0,0 +1,228 @@
+# services/render_pool.py
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from services.graph_service import ChartSpec, GraphService, SPEC_TYPES
+
+logger = logging.getLogger(__name__)
+
+
+class RenderPoolBusy(Exception):
+    """Antrean render penuh lebih lama dari batas tunggu"""
+
+
+class RenderTimeout(Exception):
+    """Worker tidak selesai merender dalam batas waktu (worker sudah diganti)"""
+
+
+# ======================= SISI WORKER =======================
+# Satu GraphService per proses worker: font dan watermark dimuat sekali saat worker start
+_worker_graph_service: Optional[GraphService] = None
+
+
+def _init_worker(renderer: str = "matplotlib"):
+    global _worker_graph_service
+    _worker_graph_service = GraphService(None, renderer=renderer)
+    # Render kosong sekali agar cache glyph font & template figure sudah siap sebelum permintaan pertama
+    _worker_graph_service.render_chart(ChartSpec(None, "", "", ["-"], [0], 0, 0.0, "-", 0))
+    logger.info(f"Worker render siap (pid {os.getpid()})")
+
+
+def _render_in_worker(kind: str, spec: dict, preset: str) -> Optional[bytes]:
+    return _worker_graph_service.render(SPEC_TYPES[kind].from_dict(spec), preset)
+
+
+# ======================= SISI BOT =======================
+class ChartRenderPool:
+    """
+    Proses worker khusus render grafik.
+
+    Render Matplotlib terikat CPU (GIL), jadi grafik dari beberapa chat
+    dikerjakan paralel di proses terpisah. Yang dikirim ke worker hanya
+    ChartSpec/HeatmapSpec dalam bentuk dict kecil (label + nilai + statistik),
+    yang kembali hanya bytes gambar.
+
+    - Antrean terbatas: maksimal `max_pending` render berjalan/menunggu;
+      permintaan berikutnya menunggu slot, paling lama `timeout` detik.
+    - Paling banyak `workers` render dikirim ke executor sekaligus, jadi
+      setiap tugas langsung diambil worker yang menganggur dan batas
+      `timeout` hanya menghitung waktu render, bukan waktu antre.
+    - Timeout: pool yang tugasnya macet dilepas (tugas baru ke pool baru)
+      dan dimatikan setelah render lain di pool itu selesai.
+    - Daur ulang: setelah `tasks_per_worker` x `workers` render, pool diganti
+      baru (render yang sedang berjalan tetap diselesaikan pool lama) agar
+      memori Matplotlib yang bocor tidak menumpuk.
+
+    Worker tidak pernah di-fork dari proses bot (bot sudah multi-thread:
+    pool koneksi, listener, scheduler). Di Linux/macOS worker di-fork dari
+    proses forkserver yang hanya memuat services.graph_service; di Windows
+    dipakai spawn. main.py mengimpor modul bot di dalam main(), jadi worker
+    tidak ikut membuka koneksi database.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 8, timeout: float = 30, tasks_per_worker: int = 200,
+                 renderer: str = "matplotlib"):
+        self.workers = max(1, workers)
+        self.renderer = renderer
+        self.max_pending = max(self.workers, max_pending)
+        self.timeout = timeout
+        self.tasks_per_worker = tasks_per_worker
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_tasks = 0
+        self._lock = threading.Lock()
+        self._slots = None
+        self._running_slots = None
+        self._slots_loop = None
+        # Tugas yang sedang dikerjakan / macet per executor
+        self._running = {}
+        self._hung = {}
+        self.rendered = 0
+        self.timeouts = 0
+        self.recycled = 0
+
+    # ======================= SIKLUS HIDUP =======================
+    @staticmethod
+    def _mp_context():
+        """forkserver jika tersedia (worker baru cepat: Matplotlib sudah dimuat), selain itu spawn"""
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            # Hanya berlaku sebelum proses forkserver pertama kali dijalankan
+            context.set_forkserver_preload(["services.graph_service"])
+            return context
+        return multiprocessing.get_context("spawn")
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._mp_context(),
+            initializer=_init_worker,
+            initargs=(self.renderer,),
+        )
+
+    def start(self) -> None:
+        """Buat worker sekarang (bukan saat grafik pertama diminta)"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+                self._executor_tasks = 0
+            executor = self._executor
+        # Proses worker dibuat saat tugas pertama dikirim
+        executor.submit(os.getpid).result()
+        logger.info(f"Pool render dimulai: {self.workers} worker")
+
+    def stop(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _acquire_executor(self) -> ProcessPoolExecutor:
+        """Executor untuk tugas berikutnya; pool diganti baru jika kuota daur ulang habis"""
+        with self._lock:
+            if self._executor is not None and self._executor_tasks >= self.tasks_per_worker * self.workers:
+                # Pool lama menyelesaikan tugas yang tersisa lalu berhenti sendiri
+                self._executor.shutdown(wait=False)
+                self._executor = None
+                self.recycled += 1
+            if self._executor is None:
+                self._executor = self._new_executor()
+                self._executor_tasks = 0
+            self._executor_tasks += 1
+            self._running[self._executor] = self._running.get(self._executor, 0) + 1
+            return self._executor
+
+    def _release_executor(self, executor: ProcessPoolExecutor, hung: bool = False) -> None:
+        """
+        Tugas di `executor` selesai, atau macet (hung=True). Pool dengan tugas
+        macet tidak menerima tugas baru, dan prosesnya dimatikan begitu yang
+        tersisa di pool itu hanya tugas macet.
+        """
+        with self._lock:
+            if hung:
+                self._hung[executor] = self._hung.get(executor, 0) + 1
+                if self._executor is executor:
+                    self._executor = None
+            else:
+                self._running[executor] = self._running.get(executor, 1) - 1
+            kill = executor in self._hung and self._running.get(executor, 0) <= self._hung[executor]
+            if not kill and not self._running.get(executor) and self._executor is not executor:
+                self._running.pop(executor, None)
+        if kill:
+            self._kill(executor)
+
+    def _kill(self, executor: ProcessPoolExecutor) -> None:
+        """Matikan semua proses executor (worker macet) dan lepaskan dari pool"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+            self._running.pop(executor, None)
+            self._hung.pop(executor, None)
+        # ProcessPoolExecutor tidak punya API untuk mematikan worker yang sedang bekerja
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    def _get_slots(self):
+        """(slot antrean, slot render yang sedang dikirim ke worker)"""
+        # Semaphore terikat ke event loop; main.py membuat loop baru setiap bot restart
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._running_slots = asyncio.Semaphore(self.workers)
+            self._slots_loop = loop
+        return self._slots, self._running_slots
+
+    # ======================= RENDER =======================
+    async def render(self, spec, preset: str = "preview") -> Optional[bytes]:
+        """Bytes gambar untuk `spec`, atau None jika render gagal di worker"""
+        slots, running_slots = self._get_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise RenderPoolBusy(f"Antrean render penuh ({self.max_pending} grafik)")
+        try:
+            payload = spec.to_dict()
+            # Menunggu worker menganggur tidak dihitung ke batas waktu render
+            async with running_slots:
+                # Satu kali coba ulang: pool bisa rusak jika salah satu workernya mati
+                for attempt in (1, 2):
+                    executor = self._acquire_executor()
+                    hung = False
+                    try:
+                        future = executor.submit(_render_in_worker, spec.KIND, payload, preset)
+                        image = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+                    except asyncio.TimeoutError:
+                        self.timeouts += 1
+                        logger.error(f"Render {spec} melewati {self.timeout} detik; pool worker ini diganti")
+                        hung = True
+                        raise RenderTimeout(f"Render grafik melewati {self.timeout:g} detik")
+                    except BrokenProcessPool:
+                        logger.warning(f"Pool render rusak (percobaan {attempt}), membuat pool baru")
+                        self._kill(executor)
+                        if attempt == 2:
+                            raise
+                    else:
+                        self.rendered += 1
+                        return image
+                    finally:
+                        # Setiap jalan keluar (selesai, batal, error dari worker) melepas tugas ini tepat sekali;
+                        # pemanggil yang batal tidak menghentikan worker, tugasnya tetap selesai di sana
+                        self._release_executor(executor, hung=hung)
+        finally:
+            slots.release()
+
+    def report(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "rendered": self.rendered,
+            "timeouts": self.timeouts,
+            "recycled": self.recycled,
+        }
@@ -0,0 +1,86 @@
+# services/subscription_service.py
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+from database.db_manager import DBManager
+
+# Laporan standar: nama -> (judul, fungsi hari ini -> (tanggal mulai, tanggal akhir))
+REPORT_PERIODS = {
+    "kemarin": ("Kemarin", lambda today: (today - timedelta(days=1), today - timedelta(days=1))),
+    "bulan_ini": ("Bulan ini", lambda today: (today.replace(day=1), today)),
+    "7hari": ("7 hari terakhir", lambda today: (today - timedelta(days=7), today - timedelta(days=1))),
+}
+
+
+def report_period(report: str, today: date) -> Tuple[str, str]:
+    """('YYYY-MM-DD', 'YYYY-MM-DD') untuk laporan standar pada hari `today`"""
+    start, end = REPORT_PERIODS[report][1](today)
+    return start.isoformat(), end.isoformat()
+
+
+class SubscriptionService:
+    """
+    Langganan laporan grafik standar per chat.
+    Satu baris = (chat, laporan, crane); crane_id NULL berarti semua crane.
+    """
+
+    def __init__(self, db_manager: DBManager):
+        self.db_manager = db_manager
+        self.create_table()
+
+    def create_table(self):
+        query = """
+        CREATE TABLE IF NOT EXISTS report_subscriptions (
+            chat_id BIGINT NOT NULL,
+            report TEXT NOT NULL,
+            crane_id INTEGER,
+            created_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+        """
+        self.db_manager.execute(query)
+        # crane NULL (semua crane) juga harus unik per chat & laporan
+        self.db_manager.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_report_subscriptions_unique "
+            "ON report_subscriptions (chat_id, report, COALESCE(crane_id, -1));"
+        )
+
+    def subscribe(self, chat_id: int, report: str, crane_id: Optional[int]) -> bool:
+        """True jika langganan baru, False jika sudah ada"""
+        if report not in REPORT_PERIODS:
+            raise ValueError(f"Laporan tidak dikenal: {report}")
+        query = """
+        INSERT INTO report_subscriptions (chat_id, report, crane_id)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (chat_id, report, COALESCE(crane_id, -1)) DO NOTHING
+        RETURNING chat_id;
+        """
+        return self.db_manager.fetchone(query, (chat_id, report, crane_id)) is not None
+
+    def unsubscribe(self, chat_id: int, report: Optional[str] = None, crane_id: Optional[int] = None,
+                    all_cranes: bool = False) -> int:
+        """
+        Hapus langganan chat. report=None -> semua laporan; crane_id=None
+        -> semua crane, kecuali all_cranes=True yang hanya menghapus langganan 'all'.
+        """
+        query = "DELETE FROM report_subscriptions WHERE chat_id = %s"
+        params = [chat_id]
+        if report is not None:
+            query += " AND report = %s"
+            params.append(report)
+        if all_cranes:
+            query += " AND crane_id IS NULL"
+        elif crane_id is not None:
+            query += " AND crane_id = %s"
+            params.append(crane_id)
+        query += " RETURNING chat_id;"
+        return len(self.db_manager.fetchall(query, tuple(params)))
+
+    def list_for_chat(self, chat_id: int) -> List[Tuple[str, Optional[int]]]:
+        query = """
+        SELECT report, crane_id FROM report_subscriptions
+        WHERE chat_id = %s
+        ORDER BY report, crane_id NULLS FIRST;
+        """
+        return self.db_manager.fetchall(query, (chat_id,))
+
+    def all_subscriptions(self) -> List[Tuple[int, str, Optional[int]]]:
+        return self.db_manager.fetchall("SELECT chat_id, report, crane_id FROM report_subscriptions ORDER BY created_at;")
@@ -0,0 +1,134 @@
+# tests/test_bucket_counts.py
+"""
+Jumlah per bucket (bucket_counts, crane_bucket_counts, crane_fault_counts,
+daily_series) harus sama dengan RecordBatch.daily_counts untuk data yang sama.
+
+Database diganti FakeDB yang menjawab query _dedup_counts seperti PostgreSQL:
+satu baris per (kelompok, hari) berisi array waktu event (mikrodetik sejak
+tengah malam, urut, waktu NULL = 00:00).
+"""
+import random
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+import numpy as np
+import pytest
+
+from database.record_batch import RecordBatch
+from services.record_query import RecordQuery
+
+START, END = "2024-01-01", "2024-06-30"
+FAULTS = ["Hoist overload", "Trolley limit", "Gantry skew"]
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    """date_trunc PostgreSQL"""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    if granularity == "quarter":
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    return day
+
+
+class FakeDB:
+    def __init__(self, events):
+        # events: [(crane_id, fault_name, tanggal, waktu)]
+        self.events = events
+
+    def fetchall(self, query, params):
+        assert "array_agg" in query, "hanya query _dedup_counts yang diharapkan"
+        by_crane = "mr.crane_id," in query
+        by_fault = "COALESCE(fr.fault_name, mr.fault_name)" in query
+        granularity = params[0] if "date_trunc(" in query else None
+        groups = defaultdict(list)
+        for crane_id, fault, tanggal, waktu in self.events:
+            key = ((crane_id,) if by_crane else ()) + ((fault,) if by_fault else ())
+            bucket = bucket_start(tanggal, granularity) if granularity else tanggal
+            micros = ((waktu.hour * 60 + waktu.minute) * 60 + waktu.second) * 1_000_000 + waktu.microsecond if waktu else 0
+            groups[(key, tanggal, bucket)].append(micros)
+        return [key + (bucket, sorted(times)) for (key, _, bucket), times in groups.items()]
+
+
+def make_query(events):
+    service = SimpleNamespace(
+        db_manager=FakeDB(events),
+        hot_store=None,
+        month_cache=None,
+        archive=SimpleNamespace(source_for=lambda query: ("maintenance_records", [])),
+    )
+    return RecordQuery(service, [(START, END)])
+
+
+def make_batch(events):
+    events = sorted(events, key=lambda e: datetime.combine(e[2], e[3] or time()))
+    timestamps = [datetime.combine(tanggal, waktu or time()) for _, _, tanggal, waktu in events]
+    fault_ids = [FAULTS.index(fault) for _, fault, _, _ in events]
+    return RecordBatch(timestamps, [crane for crane, _, _, _ in events], fault_ids, [0] * len(events))
+
+
+def random_events(seed: int, n: int = 600):
+    rng = random.Random(seed)
+    events = []
+    first = date.fromisoformat(START)
+    for _ in range(n):
+        day = first + timedelta(days=rng.randint(0, 180))
+        # Rentetan rapat (detik) dan event jarang (jam), kadang waktu NULL
+        base = rng.randint(0, 23 * 3600)
+        burst = [base + rng.randint(0, 300) for _ in range(rng.randint(1, 8))]
+        crane = rng.choice([1, 2, 3])
+        fault = rng.choice(FAULTS)
+        for seconds in burst:
+            waktu = None if rng.random() < 0.03 else time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+            events.append((crane, fault, day, waktu))
+    return events
+
+
+def daily_totals(batch, granularity="day"):
+    days, counts = batch.daily_counts(START, END, dedup_minutes=1)
+    totals = defaultdict(int)
+    for day, count in zip(days.tolist(), counts.tolist()):
+        if count:
+            totals[bucket_start(day, granularity)] += count
+    return dict(totals)
+
+
+def test_burst_every_30_seconds_counts_greedy():
+    # Fault tiap 30 detik selama 5 menit: dihitung di menit 0, 1, 2, 3, 4, 5
+    events = [(1, FAULTS[0], date(2024, 1, 3), time(8, seconds // 60, seconds % 60)) for seconds in range(0, 301, 30)]
+    assert make_query(events).bucket_counts("day") == [(date(2024, 1, 3), 6)]
+    assert int(make_batch(events).dedup_mask().sum()) == 6
+
+
+@pytest.mark.parametrize("granularity", RecordQuery.BUCKETS)
+@pytest.mark.parametrize("seed", range(5))
+def test_bucket_counts_equal_daily_counts(seed, granularity):
+    events = random_events(seed)
+    assert dict(make_query(events).bucket_counts(granularity)) == daily_totals(make_batch(events), granularity)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_daily_series_equals_daily_counts(seed):
+    events = random_events(seed)
+    series = {day: count for day, count in make_query(events).daily_series().items() if count}
+    assert series == daily_totals(make_batch(events))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_crane_bucket_counts_equal_daily_counts_per_crane(seed):
+    events = random_events(seed)
+    rows = make_query(events).crane_bucket_counts("month")
+    for crane in (1, 2, 3):
+        expected = daily_totals(make_batch([e for e in events if e[0] == crane]), "month")
+        assert {bucket: count for crane_id, bucket, count in rows if crane_id == crane} == expected
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_crane_fault_counts_equal_daily_counts_per_cell(seed):
+    events = random_events(seed)
+    rows = make_query(events).crane_fault_counts()
+    assert [row[2] for row in rows] == sorted((row[2] for row in rows), reverse=True)
+    for crane_id, fault, count in rows:
+        cell = make_batch([e for e in events if e[0] == crane_id and e[1] == fault])
+        assert count == int(np.sum(cell.daily_counts(START, END, dedup_minutes=1)[1]))
@@ -0,0 +1,108 @@
+# tests/test_change_notifier.py
+"""
+Integrasi ChangeNotifier dengan PostgreSQL lokal (LISTEN/NOTIFY sungguhan).
+
+Dilewati jika TEST_DATABASE_DSN tidak di-set, contoh:
+    TEST_DATABASE_DSN="dbname=crane_test user=postgres host=localhost" python -m pytest tests
+"""
+import os
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+
+DSN = os.getenv("TEST_DATABASE_DSN")
+pytestmark = pytest.mark.skipif(not DSN, reason="TEST_DATABASE_DSN tidak di-set")
+
+from database.db_manager import DBManager
+from services.change_notifier import ChangeNotifier, DataChange
+from services.chart_cache import ChartCache
+
+WAIT_SECONDS = 10
+
+
+class Received:
+    """Callback yang mencatat perubahan yang diterima listener"""
+
+    def __init__(self):
+        self.changes = []
+        self.event = threading.Event()
+
+    def __call__(self, change: DataChange):
+        self.changes.append(change)
+        self.event.set()
+
+    def wait(self, timeout: float = WAIT_SECONDS) -> bool:
+        received = self.event.wait(timeout)
+        self.event.clear()
+        return received
+
+
+@pytest.fixture
+def db_manager():
+    manager = DBManager({"dsn": DSN}, max_connections=2)
+    if manager.pool is None:
+        pytest.skip("Database test tidak bisa dihubungi")
+    yield manager
+    manager.pool.closeall()
+
+
+@pytest.fixture
+def notifiers(db_manager):
+    """(penulis, listener 'proses lain', callback listener)"""
+    writer = ChangeNotifier(db_manager, reconnect_delay=0.2)
+    listener = ChangeNotifier(db_manager, reconnect_delay=0.2)
+    listener.origin = "proses-lain:1"
+    received = Received()
+    listener.subscribe(received)
+    listener.start()
+
+    # Listener tersambung di background: kirim sampai notifikasi pertama sampai
+    deadline = time.monotonic() + WAIT_SECONDS
+    while not received.wait(0.2):
+        if time.monotonic() > deadline:
+            listener.stop()
+            pytest.fail("Listener tidak menerima notifikasi apa pun")
+        with db_manager.transaction() as tx:
+            writer.publish(tx, DataChange("faults"))
+    time.sleep(0.5)
+    received.changes.clear()
+    received.event.clear()
+
+    yield writer, listener, received
+    listener.stop()
+
+
+def test_commit_reaches_other_listener_and_drops_only_affected_charts(db_manager, notifiers, tmp_path):
+    writer, listener, received = notifiers
+    chart_cache = ChartCache(SimpleNamespace(db_manager=db_manager, changes=listener), str(tmp_path))
+    for crane_id in (1, 2):
+        chart_cache.put(f"key-{crane_id}", b"png", crane_id, "Fault A", "2024-01-01", "2024-01-31", "preview", "png")
+    # Didaftarkan setelah ChartCache: saat ini terpanggil, invalidasi cache sudah selesai
+    after_cache = Received()
+    listener.subscribe(after_cache)
+
+    with db_manager.transaction() as tx:
+        writer.publish(tx, DataChange("records", [1], "2024-01-10", "2024-01-12", version=42))
+
+    assert after_cache.wait()
+    change = after_cache.changes[-1]
+    assert (change.scope, change.crane_ids, change.version) == ("records", [1], 42)
+    assert change.origin == writer.origin
+    assert chart_cache.get("key-1") is None
+    assert chart_cache.get("key-2") is not None
+
+
+def test_rollback_sends_nothing(db_manager, notifiers):
+    writer, listener, received = notifiers
+    dispatched = Received()
+    writer.subscribe(dispatched)
+
+    with pytest.raises(RuntimeError):
+        with db_manager.transaction() as tx:
+            writer.publish(tx, DataChange("records", [1], "2024-01-10", "2024-01-12"))
+            raise RuntimeError("batal")
+
+    assert not received.wait(1.5)
+    assert not dispatched.wait(0)
+    assert received.changes == []
@@ -0,0 +1,102 @@
+# tests/test_graph_service.py
+"""
+build_chart_spec (vektor: daily_counts + _day_bars) harus menghasilkan isi
+grafik yang sama dengan implementasi lama generate_graph (loop per record,
+per hari dan per kelompok hari) untuk data acak.
+"""
+import math
+import random
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+import pytest
+
+from database.models import MaintenanceRecord
+from services.graph_service import GraphService
+
+FAULTS = ["Hoist overload", "Trolley limit", "Gantry skew", "", None]
+
+
+@pytest.fixture(scope="module")
+def graph_service():
+    return GraphService(None)
+
+
+def old_chart(records, start_date, end_date):
+    """Perhitungan generate_graph sebelum divektorkan (tanpa bagian render)"""
+    fault_per_date = defaultdict(int)
+    fault_name_counter = Counter()
+
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    current_date = start
+    while current_date <= end:
+        fault_per_date[current_date] = 0
+        current_date += timedelta(days=1)
+
+    records.sort(key=lambda r: r.tanggal)
+    last_fault_time = {}
+    for record in records:
+        fault_date = record.tanggal.date()
+        fault_time = record.tanggal
+        if hasattr(record, "fault_name") and record.fault_name:
+            fault_name_counter[record.fault_name] += 1
+        if fault_date not in last_fault_time or fault_time >= last_fault_time[fault_date] + timedelta(minutes=1):
+            if fault_date in fault_per_date:
+                fault_per_date[fault_date] += 1
+            last_fault_time[fault_date] = fault_time
+
+    sorted_dates = sorted(fault_per_date.items(), key=lambda x: x[0])
+    total = len(sorted_dates)
+    group_size = max(1, math.ceil(total / 20))
+    chosen_dates = {}
+    for i in range(0, total, group_size):
+        group = sorted_dates[i:i + group_size]
+        if group:
+            top_date = max(group, key=lambda x: x[1])
+            chosen_dates[group[-1][0]] = top_date[1]
+
+    top_dates = sorted(chosen_dates.items(), key=lambda x: x[0])
+    total_faults = sum(fault_per_date.values())
+    return {
+        "labels": [day.strftime("%Y-%m-%d") for day, _ in top_dates],
+        "values": [count for _, count in top_dates],
+        "total_faults": total_faults,
+        "average_per_day": total_faults / len(fault_per_date) if len(fault_per_date) > 0 else 0,
+        "most_common": fault_name_counter.most_common(1)[0] if fault_name_counter else ("-", 0),
+        "crane_id": records[0].crane_id,
+    }
+
+
+def random_case(seed: int):
+    """(records, start_date, end_date): rentetan rapat per detik dan event jarang, sebagian di luar rentang"""
+    rng = random.Random(seed)
+    start = date(2024, 1, 1) + timedelta(days=rng.randint(0, 300))
+    end = start + timedelta(days=rng.choice([0, 1, 6, 19, 20, 21, 30, 45, 90, 365]))
+    crane_id = rng.randint(1, 12)
+    records = []
+    for _ in range(rng.randint(1, 12 if rng.random() < 0.2 else 200)):
+        day = start + timedelta(days=rng.randint(-2, (end - start).days + 2))
+        moment = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randint(0, 86399))
+        fault = rng.choice(FAULTS)
+        for _ in range(rng.choice([1, 1, 2, 5])):
+            records.append(MaintenanceRecord(moment, moment.time(), 0, fault, crane_id))
+            moment += timedelta(seconds=rng.choice([0, 1, 20, 59, 60, 61, 300]))
+    rng.shuffle(records)
+    return records, start.isoformat(), end.isoformat()
+
+
+@pytest.mark.parametrize("seed", range(400))
+def test_build_chart_spec_matches_old_loop(graph_service, seed):
+    records, start_date, end_date = random_case(seed)
+    order = list(records)
+    spec = graph_service.build_chart_spec(records, start_date, end_date)
+    # build_chart_spec tidak boleh mengurutkan list milik pemanggil
+    assert records == order
+
+    expected = old_chart(list(records), start_date, end_date)
+    assert spec.labels == expected["labels"]
+    assert spec.values == expected["values"]
+    assert spec.total_faults == expected["total_faults"]
+    assert spec.average_per_day == pytest.approx(expected["average_per_day"])
+    assert (spec.most_common_fault, spec.most_common_count) == expected["most_common"]
+    assert spec.crane_id == expected["crane_id"]
@@ -0,0 +1,110 @@
+# tests/test_record_batch.py
+"""
+RecordBatch.from_copy_binary: stream COPY binary dibuat di memori persis
+seperti keluaran PostgreSQL untuk COPY_SELECT (waktu/crane_id NULL sudah
+di-COALESCE menjadi 00:00 / -1), lalu kolom hasil parse dan dedup_mask
+dibandingkan dengan aturan greedy 1 menit versi Python biasa.
+"""
+import random
+import struct
+from datetime import date, datetime, time, timedelta
+import pytest
+
+from database.record_batch import COPY_SIGNATURE, RecordBatch
+
+PG_EPOCH = datetime(2000, 1, 1)
+
+
+def copy_select(row):
+    """Satu baris sumber (tanggal, waktu, crane_id, fault_id, act) -> nilai COPY_SELECT"""
+    tanggal, waktu, crane_id, fault_id, act = row
+    return (
+        datetime.combine(tanggal, waktu or time()),
+        -1 if crane_id is None else crane_id,
+        -1 if fault_id is None else fault_id,
+        0 if act is None else act,
+    )
+
+
+def copy_stream(values, extension: bytes = b"", null_crane: bool = False) -> bytes:
+    """Bytes `COPY ... TO STDOUT WITH (FORMAT binary)`: header, tuple (ts, int2, int4, int2), trailer"""
+    parts = [COPY_SIGNATURE, struct.pack(">ii", 0, len(extension)), extension]
+    for ts, crane_id, fault_id, act in values:
+        micros = (ts - PG_EPOCH) // timedelta(microseconds=1)
+        parts.append(struct.pack(">hiq", 4, 8, micros))
+        parts.append(struct.pack(">i", -1) if null_crane else struct.pack(">ih", 2, crane_id))
+        parts.append(struct.pack(">iiih", 4, fault_id, 2, act))
+    parts.append(struct.pack(">h", -1))
+    return b"".join(parts)
+
+
+def greedy_mask(timestamps, dedup_minutes=1):
+    """Aturan grafik apa adanya: per hari, dihitung jika >= 1 menit setelah event terakhir yang dihitung"""
+    mask, last_counted = [], {}
+    for ts in timestamps:
+        last = last_counted.get(ts.date())
+        counted = last is None or ts - last >= timedelta(minutes=dedup_minutes)
+        if counted:
+            last_counted[ts.date()] = ts
+        mask.append(counted)
+    return mask
+
+
+def random_rows(seed: int, n: int = 300):
+    rng = random.Random(seed)
+    rows = []
+    while len(rows) < n:
+        day = date(2024, 3, 1) + timedelta(days=rng.randint(0, 6))
+        moment = datetime.combine(day, time()) + timedelta(seconds=rng.randint(0, 86399), microseconds=rng.randint(0, 999999))
+        for _ in range(rng.randint(1, 6)):
+            # Rentetan rapat, sebagian waktu/crane NULL (waktu NULL = 00:00 di COPY_SELECT)
+            waktu = None if rng.random() < 0.1 else moment.time()
+            crane_id = None if rng.random() < 0.1 else rng.randint(1, 20)
+            rows.append((moment.date(), waktu, crane_id, rng.randint(1, 500), rng.choice([0, 1, None])))
+            moment += timedelta(seconds=rng.choice([0, 1, 30, 59, 60, 61, 600]))
+    # ORDER BY ts seperti query batch
+    return sorted(rows, key=lambda row: copy_select(row)[0])
+
+
+@pytest.mark.parametrize("extension", [b"", b"\x00\x01\x02\x03"])
+@pytest.mark.parametrize("seed", range(20))
+def test_copy_binary_columns_and_dedup_mask(seed, extension):
+    values = [copy_select(row) for row in random_rows(seed)]
+    batch = RecordBatch.from_copy_binary(copy_stream(values, extension), {7: "Hoist overload"})
+
+    assert len(batch) == len(values)
+    assert batch.timestamps.tolist() == [ts for ts, _, _, _ in values]
+    assert batch.crane_ids.tolist() == [crane_id for _, crane_id, _, _ in values]
+    assert batch.fault_ids.tolist() == [fault_id for _, _, fault_id, _ in values]
+    assert batch.act.tolist() == [act for _, _, _, act in values]
+    assert batch.fault_names == {7: "Hoist overload"}
+    assert batch.dedup_mask().tolist() == greedy_mask([ts for ts, _, _, _ in values])
+
+
+def test_null_waktu_and_crane_become_midnight_and_minus_one():
+    rows = [(date(2024, 3, 1), None, None, 5, 1), (date(2024, 3, 1), time(0, 0, 30), 3, 5, None)]
+    batch = RecordBatch.from_copy_binary(copy_stream([copy_select(row) for row in rows]))
+    assert batch.timestamps.tolist() == [datetime(2024, 3, 1), datetime(2024, 3, 1, 0, 0, 30)]
+    assert batch.crane_ids.tolist() == [-1, 3]
+    assert batch.act.tolist() == [1, 0]
+    # 30 detik setelah event 00:00 yang dihitung: tidak dihitung
+    assert batch.dedup_mask().tolist() == [True, False]
+
+
+def test_empty_stream():
+    batch = RecordBatch.from_copy_binary(copy_stream([]))
+    assert len(batch) == 0
+    assert batch.dedup_mask().tolist() == []
+
+
+def test_null_field_is_rejected():
+    # 17 tuple dengan crane NULL (2 byte lebih pendek) = tepat 16 tuple lebar penuh:
+    # lolos cek panjang, harus ditolak oleh cek panjang per kolom
+    values = [copy_select((date(2024, 3, 1), time(8), 1, 5, 0))] * 17
+    with pytest.raises(ValueError):
+        RecordBatch.from_copy_binary(copy_stream(values, null_crane=True))
+
+
+def test_wrong_signature_is_rejected():
+    with pytest.raises(ValueError):
+        RecordBatch.from_copy_binary(b"PGCOPY\n" + bytes(20))